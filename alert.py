@@ -3,6 +3,7 @@ import imaplib
 import email
 from email.header import decode_header
 import time
+STARTED_AT = time.perf_counter() # Awal startup (dilaporkan di mode daemon)
 import datetime # Untuk timestamp
 import subprocess # Tetap dibutuhkan untuk termux-media-player
 import json
@@ -12,28 +13,91 @@ import sys
 import signal # Untuk menangani Ctrl+C
 import traceback # Untuk mencetak traceback error
 import socket # Untuk error koneksi IMAP
+import select # Untuk menunggu data IMAP IDLE
+import re # Untuk parsing respons IMAP
+import ssl # Untuk deteksi data SSL tertunda
+import binascii # Untuk decode base64 bagian email
+import quopri # Untuk decode quoted-printable
+import codecs # Decoder charset bertahap untuk body email
 import shutil # Untuk mendapatkan lebar terminal & cek command
-
-# --- Inquirer Integration ---
-try:
-    import inquirer
-    from inquirer.themes import GreenPassion as InquirerTheme
-    INQUIRER_AVAILABLE = True
-except ImportError:
-    INQUIRER_AVAILABLE = False
-    print("\n!!! WARNING: Library 'inquirer' tidak ditemukan. Menu akan pakai input biasa. !!!")
-    print("!!!          Install dengan: pip install inquirer                              !!!\n")
-    time.sleep(3)
-    class InquirerTheme: pass
+import threading # Untuk worker audio di background
+import dataclasses # Model Settings (frozen, slots)
+from dataclasses import dataclass, field
+
+if sys.version_info < (3, 10): # Sebelum @dataclass(slots=True), yang gagal saat import di Python lama
+    print("Error: Butuh Python 3.10+"); sys.exit(1)
+
+# --- Inquirer Integration (lazy, hanya untuk menu) ---
+inquirer = None
+INQUIRER_AVAILABLE = None # None = belum dicoba import
+class InquirerTheme: pass # Diganti tema asli oleh load_inquirer()
+
+def load_inquirer():
+    """Import inquirer sekali (hanya untuk menu). Return True jika tersedia."""
+    global inquirer, InquirerTheme, INQUIRER_AVAILABLE
+    if INQUIRER_AVAILABLE is None:
+        try:
+            import inquirer
+            from inquirer.themes import GreenPassion as InquirerTheme
+            INQUIRER_AVAILABLE = True
+        except ImportError:
+            INQUIRER_AVAILABLE = False # Menu memakai input teks biasa (info ditampilkan di menu)
+    return INQUIRER_AVAILABLE
 
 # --- Konfigurasi & Variabel Global ---
 CONFIG_FILE = "config.json"
-DEFAULT_SETTINGS = {
-    "email_address": "", "app_password": "", "imap_server": "imap.gmail.com",
-    "check_interval_seconds": 10, "target_keyword": "Exora AI", "trigger_keyword": "order",
-    "play_mp3_on_signal": True
-}
+STATE_FILE = "alert_state.json" # UIDVALIDITY + UID terakhir yang sudah diproses
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Pengaturan yang sudah divalidasi (lihat Settings.from_dict). Immutable: ubah lewat replace() / simpan ulang.
+
+    Keyword lowercase dihitung sekali saat dibuat, bukan di tiap batch email.
+    """
+    email_address: str = ""
+    app_password: str = ""
+    imap_server: str = "imap.gmail.com"
+    check_interval_seconds: int = 10
+    target_keyword: str = "Exora AI"
+    trigger_keyword: str = "order"
+    use_imap_idle: bool = True
+    use_partial_fetch: bool = True
+    body_fetch_max_bytes: int = 0 # 0 = tanpa batas
+    header_match_include_sender: bool = False
+    # Filter SEARCH di server (kosong = semua UNSEEN). Email yang tidak cocok tidak diunduh & tetap belum dibaca.
+    imap_search_from: str = ""
+    imap_search_subject: str = ""
+    imap_search_headers: dict = field(default_factory=dict) # {"Nama-Header": "isi"}
+    imap_search_gmail_raw: str = "" # Query Gmail (X-GM-RAW), mis. "from:tradingview newer_than:1d"; diabaikan jika server bukan Gmail
+    play_mp3_on_signal: bool = True
+    config_reload_seconds: float = 2.0 # Interval cek perubahan config.json saat listener jalan (0 = hanya via SIGHUP)
+    # Nilai turunan
+    target_keyword_lower: str = field(init=False, repr=False, compare=False)
+    trigger_keyword_lower: str = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'config_reload_seconds', float(self.config_reload_seconds))
+        object.__setattr__(self, 'imap_search_headers', dict(self.imap_search_headers))
+        object.__setattr__(self, 'target_keyword_lower', self.target_keyword.lower())
+        object.__setattr__(self, 'trigger_keyword_lower', self.trigger_keyword.lower())
+
+    @classmethod
+    def from_dict(cls, raw):
+        """Validasi dict mentah (isi config.json / hasil edit menu) lalu buat Settings."""
+        return cls(**validate_settings(raw))
+
+    def to_dict(self):
+        """Dict siap-JSON berisi semua kunci config (tanpa nilai turunan)."""
+        data = {}
+        for f in dataclasses.fields(self):
+            if not f.init: continue
+            value = getattr(self, f.name)
+            data[f.name] = dict(value) if isinstance(value, dict) else value
+        return data
+
+DEFAULT_SETTINGS = Settings().to_dict() # Kunci & nilai default config.json
 running = True
+DAEMON_MODE = False # True saat dijalankan via `alert.py run` / --daemon (tanpa menu & jeda tampilan)
+MATCH_PATH_STATS = {"subject": 0, "body": 0, "none": 0} # Statistik jalur keputusan sinyal
 
 # --- Kode Warna ANSI ---
 RESET = "\033[0m"
@@ -87,20 +151,44 @@ def print_separator(char='─', color=DIM):
     print(f"{color}{char * width}{RESET}")
 
 # --- Fungsi Konfigurasi ---
+def validate_settings(loaded_settings):
+    """Gabungkan isi config dengan default & koreksi nilainya (tanpa menyimpan)."""
+    settings = dict(DEFAULT_SETTINGS)
+    for key in DEFAULT_SETTINGS:
+        if key in loaded_settings:
+            settings[key] = loaded_settings[key]
+
+    def reject(key, expected): # Hanya kunci ini yang kembali ke default, sisa config tetap dipakai
+        print(f"{YELLOW}[!] '{key}' di '{CONFIG_FILE}' harus {expected} & diabaikan (pakai default {DEFAULT_SETTINGS[key]!r}).{RESET}")
+        settings[key] = DEFAULT_SETTINGS[key]
+    is_number = lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    for key in ("email_address", "app_password", "imap_server", "target_keyword", "trigger_keyword"):
+        if not isinstance(settings.get(key), str): reject(key, "teks")
+    for key in ("play_mp3_on_signal", "use_imap_idle", "use_partial_fetch", "header_match_include_sender"):
+        if not isinstance(settings.get(key), bool): reject(key, "true/false")
+    for key in ("check_interval_seconds", "body_fetch_max_bytes"):
+        if not isinstance(settings.get(key), int) or isinstance(settings.get(key), bool): reject(key, "bilangan bulat")
+    if not is_number(settings.get("config_reload_seconds")): reject("config_reload_seconds", "angka")
+    if settings["check_interval_seconds"] < 5: settings["check_interval_seconds"] = 5
+    settings["body_fetch_max_bytes"] = max(0, settings["body_fetch_max_bytes"]) # 0 = tanpa batas
+    settings["config_reload_seconds"] = max(0.0, float(settings["config_reload_seconds"]))
+    for key in SEARCH_FILTER_KEYS:
+        if not is_valid_search_filter({key: settings.get(key)}):
+            print(f"{YELLOW}[!] '{key}' di '{CONFIG_FILE}' tidak valid (harus teks ASCII satu baris) & diabaikan.{RESET}")
+            settings[key] = DEFAULT_SETTINGS[key]
+    return settings
+
 def load_settings():
-    settings = DEFAULT_SETTINGS.copy()
+    """Memuat config.json jadi Settings tervalidasi, menyimpan ulang jika ada koreksi / kunci baru."""
+    settings = Settings()
     if os.path.exists(CONFIG_FILE):
         try:
             with open(CONFIG_FILE, 'r') as f:
                 loaded_settings = json.load(f)
-                for key in DEFAULT_SETTINGS:
-                    if key in loaded_settings:
-                        settings[key] = loaded_settings[key]
-
-                settings["check_interval_seconds"] = int(settings.get("check_interval_seconds", 10))
-                if settings["check_interval_seconds"] < 5: settings["check_interval_seconds"] = 5
-                settings["play_mp3_on_signal"] = bool(settings.get("play_mp3_on_signal", True))
+            settings = Settings.from_dict(loaded_settings)
 
+            if {k: v for k, v in loaded_settings.items() if k in DEFAULT_SETTINGS} != settings.to_dict():
                 save_settings(settings)
 
         except json.JSONDecodeError:
@@ -114,17 +202,13 @@ def load_settings():
     return settings
 
 def save_settings(settings):
+    """Validasi lalu simpan pengaturan (Settings / dict hasil edit) secara atomik. Return Settings yang disimpan."""
+    if not isinstance(settings, Settings): settings = Settings.from_dict(settings)
     try:
-        settings_to_save = {}
-        for key in DEFAULT_SETTINGS:
-            settings_to_save[key] = settings.get(key, DEFAULT_SETTINGS[key])
-            if key == 'check_interval_seconds': settings_to_save[key] = int(settings_to_save[key])
-            elif key == 'play_mp3_on_signal': settings_to_save[key] = bool(settings_to_save[key])
-
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(settings_to_save, f, indent=2, sort_keys=True)
+        write_json_atomic(CONFIG_FILE, settings.to_dict())
     except Exception as e:
         print(f"{RED}[ERROR] Gagal menyimpan konfigurasi: {e}{RESET}")
+    return settings
 
 # --- Fungsi Utilitas Email & Beep ---
 def decode_mime_words(s):
@@ -141,185 +225,793 @@ def decode_mime_words(s):
         return "".join(result)
     except Exception: return str(s) if isinstance(s, str) else "[DecodeErr]"
 
+def iter_email_text(msg):
+    """Potongan teks semua bagian text/plain (bukan attachment), di-decode bertahap per bagian."""
+    multipart = msg.is_multipart()
+    for part in (msg.walk() if multipart else (msg,)):
+        if part.get_content_type() != "text/plain": continue
+        if multipart and "attachment" in str(part.get("Content-Disposition")).lower(): continue
+        try:
+            charset = part.get_content_charset() or 'utf-8'
+            payload = part.get_payload(decode=True)
+        except Exception: continue
+        if not payload: continue
+        yield from iter_body_chunks(payload, None, charset)
+        if multipart: yield "\n" # Pemisah antar bagian
+
+class TextNormalizer:
+    """Padanan bertahap " ".join(teks.split()).lower() untuk potongan teks berurutan."""
+    def __init__(self):
+        self.started = False # Sudah ada kata yang dikeluarkan
+        self.gap = False # Ada spasi tertunda sebelum kata berikutnya
+
+    def feed(self, text):
+        words = text.split()
+        if not words:
+            if text: self.gap = True
+            return ""
+        sep = " " if self.started and (self.gap or text[0].isspace()) else ""
+        self.started, self.gap = True, text[-1].isspace()
+        return sep + " ".join(words).lower()
+
 def get_text_from_email(msg):
-    # ... (fungsi sama) ...
-    text_content = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            ctype = part.get_content_type()
-            cdisp = str(part.get("Content-Disposition"))
-            if ctype == "text/plain" and "attachment" not in cdisp.lower():
-                try:
-                    charset = part.get_content_charset() or 'utf-8'
-                    payload = part.get_payload(decode=True)
-                    if payload: text_content += payload.decode(charset, errors='replace') + "\n"
-                except Exception: pass
-    else:
-        if msg.get_content_type() == "text/plain":
-            try:
-                charset = msg.get_content_charset() or 'utf-8'
-                payload = msg.get_payload(decode=True)
-                if payload: text_content = payload.decode(charset, errors='replace')
-            except Exception: pass
-    return " ".join(text_content.split()).lower()
-
-def trigger_beep(action):
-    # ... (fungsi sama, opsional) ...
+    normalizer = TextNormalizer()
+    return "".join(normalizer.feed(chunk) for chunk in iter_email_text(msg))
+
+# --- Subsistem Audio (Beep & MP3 via Termux:API) ---
+BEEP_PATTERNS = {"buy": [("1000", "300"), ("1200", "200")], "sell": [("700", "500")]} # (frekuensi, durasi ms)
+
+class AudioPlayer:
+    """Putar beep & MP3 sinyal di thread background, tidak pernah memblokir loop IMAP.
+
+    Binary (beep, termux-media-player) & file buy.mp3/sell.mp3 di-resolve
+    sekali saat dibuat. Sinyal beruntun digabung: selama jendela COALESCE_SECONDS
+    setiap aksi hanya diputar sekali (mis. 10 sinyal BUY -> 1 suara BUY).
+    """
+    COALESCE_SECONDS = 0.5
+    MP3_TIMEOUT = 10
+
+    def __init__(self, settings):
+        self.beep_bin = shutil.which("beep")
+        self.player_bin = shutil.which("termux-media-player")
+        self.play_mp3 = settings.play_mp3_on_signal
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        self.sound_files = {}
+        self.missing_files = []
+        for action in ("buy", "sell"):
+            filepath = os.path.join(script_dir, f"{action}.mp3")
+            if os.path.exists(filepath): self.sound_files[action] = filepath
+            else: self.missing_files.append(f"{action}.mp3")
+        self.script_dir = script_dir
+        self.pending = {} # aksi -> jumlah sinyal yang digabung (urutan masuk terjaga)
+        self.cond = threading.Condition()
+        self.stopping = False
+        self.thread = threading.Thread(target=self._worker, name="audio-player", daemon=True)
+        self.thread.start()
+
+    def report(self):
+        """Tampilkan sekali saat start apa saja yang tidak tersedia (pengganti cek per sinyal)."""
+        if not self.beep_bin:
+            print(f"{YELLOW}[WARN] Perintah 'beep' tidak ditemukan. {DIM}(Opsional: pkg install beep){RESET}")
+        if not self.play_mp3: return
+        if not self.player_bin:
+            print(f"{RED}{BOLD}[X] MP3 tidak akan diputar!{RESET}")
+            print(f"{RED}    └─ Perintah 'termux-media-player' tidak ditemukan!{RESET}")
+            print(f"{YELLOW}       Pastikan sudah install dengan menjalankan:{RESET}")
+            print(f"{YELLOW}       pkg install termux-api{RESET}")
+            print(f"{DIM}       (Mungkin juga perlu install aplikasi Termux:API dari store){RESET}")
+        if self.missing_files:
+            print(f"{RED}{BOLD}[X] File MP3 tidak lengkap!{RESET}")
+            print(f"{RED}    └─ {', '.join(self.missing_files)} tidak ditemukan di direktori script!{RESET}")
+            print(f"{DIM}       Lokasi: {self.script_dir}{RESET}")
+
+    def play(self, action):
+        """Antrekan suara untuk aksi ini lalu langsung kembali (fire-and-forget)."""
+        action = action.lower()
+        if action not in BEEP_PATTERNS:
+            print(f"{YELLOW}[WARN] Aksi audio '{action}' tidak dikenal.{RESET}")
+            return
+        with self.cond:
+            self.pending[action] = self.pending.get(action, 0) + 1
+            self.cond.notify()
+
+    def stop(self, timeout=2):
+        with self.cond:
+            self.stopping = True
+            self.cond.notify()
+        self.thread.join(timeout)
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.stopping: self.cond.wait()
+                if self.stopping: return
+            time.sleep(self.COALESCE_SECONDS) # Kumpulkan sinyal lain dalam burst yang sama
+            with self.cond:
+                batch, self.pending = self.pending, {}
+            for action, count in batch.items():
+                merged_desc = f" {DIM}({count} sinyal digabung){RESET}" if count > 1 else ""
+                print(f"{MAGENTA}{BOLD}[AUDIO]{RESET} {action.upper()}{merged_desc}")
+                self._beep(action)
+                self._play_mp3(action)
+
+    def _beep(self, action):
+        if not self.beep_bin: return
+        try:
+            for idx, (freq, length) in enumerate(BEEP_PATTERNS[action]):
+                if idx: time.sleep(0.1)
+                subprocess.run([self.beep_bin, "-f", freq, "-l", length], check=True, capture_output=True, timeout=5)
+        except Exception: pass
+
+    def _play_mp3(self, action):
+        filepath = self.sound_files.get(action)
+        if not self.play_mp3 or not self.player_bin or not filepath: return
+        try:
+            subprocess.run([self.player_bin, "play", filepath], check=True, capture_output=True, text=True, timeout=self.MP3_TIMEOUT)
+            print(f"{GREEN}{BOLD}[MP3]{RESET} Perintah play '{os.path.basename(filepath)}' dikirim ke Termux:API.")
+        except subprocess.TimeoutExpired:
+            print(f"{RED}{BOLD}[X] Gagal memainkan MP3 via termux-media-player!{RESET}")
+            print(f"{RED}    └─ Perintah timed out. Termux:API mungkin tidak responsif.{RESET}")
+        except subprocess.CalledProcessError as e:
+            print(f"{RED}{BOLD}[X] Gagal memainkan MP3 via termux-media-player!{RESET}")
+            print(f"{RED}    └─ termux-media-player keluar dengan error (code: {e.returncode}).{RESET}")
+            if e.stderr:
+                print(f"{DIM}       Pesan error:\n{e.stderr.strip()}{RESET}")
+            print(f"{DIM}       (Cek apakah file MP3 valid dan Termux:API berfungsi?){RESET}")
+        except Exception as e:
+            print(f"{RED}{BOLD}[X] Error tak terduga saat mencoba memainkan MP3 via Termux:API:{RESET}")
+            print(f"{RED}    └─ {e}{RESET}")
+
+# --- Fungsi State Listener (High-Water Mark UID) ---
+def write_json_atomic(path, data):
+    """Tulis JSON via file sementara + fsync + rename agar tidak pernah setengah jadi."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_uid_state(state_key, uidvalidity):
+    """Muat UID terakhir yang sudah diproses. Reset ke 0 jika UIDVALIDITY berubah."""
+    uid_state = {'key': state_key, 'uidvalidity': uidvalidity, 'last_uid': 0}
+    if uidvalidity is None: return uid_state # Server tidak kirim UIDVALIDITY, tidak bisa dipercaya
+    try:
+        with open(STATE_FILE, 'r') as f:
+            saved = json.load(f).get(state_key) or {}
+        if saved.get('uidvalidity') == uidvalidity:
+            uid_state['last_uid'] = int(saved.get('last_uid', 0))
+        elif saved:
+            print(f"{YELLOW}[i] UIDVALIDITY mailbox berubah. State UID direset.{RESET}")
+    except FileNotFoundError: pass
+    except (ValueError, OSError) as e:
+        print(f"{YELLOW}[!] State listener '{STATE_FILE}' tidak bisa dibaca ({e}). Mulai dari awal.{RESET}")
+    return uid_state
+
+def save_uid_state(uid_state, uid):
+    """Majukan high-water mark ke UID ini lalu simpan atomik ke disk."""
+    uid = int(uid)
+    if uid <= uid_state['last_uid']: return
+    uid_state['last_uid'] = uid
+    if uid_state['uidvalidity'] is None: return
+    try:
+        try:
+            with open(STATE_FILE, 'r') as f: all_state = json.load(f)
+        except (FileNotFoundError, ValueError): all_state = {}
+        all_state[uid_state['key']] = {'uidvalidity': uid_state['uidvalidity'], 'last_uid': uid}
+        write_json_atomic(STATE_FILE, all_state)
+    except OSError as e:
+        print(f"{RED}[X] Gagal menyimpan state listener: {e}{RESET}")
+
+def get_uidvalidity(mail):
+    """Ambil UIDVALIDITY dari respons SELECT terakhir."""
+    try:
+        typ, data = mail.response('UIDVALIDITY')
+        if data and data[0]: return int(data[0])
+    except (ValueError, TypeError): pass
+    return None
+
+# --- Filter SEARCH di Server ---
+SEARCH_FILTER_KEYS = ("imap_search_from", "imap_search_subject", "imap_search_headers", "imap_search_gmail_raw")
+HEADER_NAME_RE = re.compile(r'^[!-9;-~]+$') # Nama field RFC 5322: ASCII tampak, tanpa ':'
+
+def _is_search_text(value):
+    return isinstance(value, str) and value.isascii() and not any(c in value for c in "\r\n\0")
+
+def is_valid_search_filter(source):
+    """Cek nilai imap_search_* (jika ada). Hanya ASCII: non-ASCII butuh literal + CHARSET di SEARCH."""
+    for key in ("imap_search_from", "imap_search_subject", "imap_search_gmail_raw"):
+        if key in source and not _is_search_text(source[key]): return False
+    headers = source.get("imap_search_headers", {})
+    if not isinstance(headers, dict): return False
+    return all(isinstance(name, str) and HEADER_NAME_RE.match(name) and _is_search_text(value) for name, value in headers.items())
+
+def imap_quote(value):
+    """String IMAP bertanda kutip (escape \\ dan ")."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def build_search_filter(settings, capabilities=()):
+    """Kriteria SEARCH tambahan dari imap_search_*. X-GM-RAW hanya jika server mengiklankan X-GM-EXT-1.
+
+    Return (kriteria, gmail_raw_diabaikan); kriteria kosong = tanpa filter.
+    """
+    terms = []
+    if settings.imap_search_from: terms.append(f"FROM {imap_quote(settings.imap_search_from)}")
+    if settings.imap_search_subject: terms.append(f"SUBJECT {imap_quote(settings.imap_search_subject)}")
+    for name, value in settings.imap_search_headers.items():
+        terms.append(f"HEADER {name} {imap_quote(value)}")
+    gmail_raw = settings.imap_search_gmail_raw
+    raw_ignored = bool(gmail_raw) and 'X-GM-EXT-1' not in capabilities
+    if gmail_raw and not raw_ignored: terms.append(f"X-GM-RAW {imap_quote(gmail_raw)}")
+    return " ".join(terms), raw_ignored
+
+def build_search_criteria(last_uid, search_filter=""):
+    """Kriteria UID SEARCH: email UNSEEN setelah high-water mark, ditambah filter server."""
+    criteria = f"UID {last_uid + 1}:* UNSEEN" if last_uid else "UNSEEN"
+    return f"({criteria} {search_filter})" if search_filter else f"({criteria})"
+
+# --- Fungsi IMAP IDLE (RFC 2177) ---
+IDLE_REFRESH_SECONDS = 25 * 60 # Server boleh memutus IDLE setelah 29 menit, perbarui sebelum itu
+IDLE_NEW_MAIL_RE = re.compile(rb'^\* \d+ (EXISTS|RECENT)\b', re.IGNORECASE)
+IDLE_ABORT_TIMEOUT = 2 # Detik menunggu balasan DONE saat listener dihentikan di tengah IDLE
+
+def imap_capabilities(mail):
+    """Kapabilitas yang diiklankan server setelah login (set string huruf besar)."""
     try:
-        prefix = f"{MAGENTA}{BOLD}[BEEP]{RESET}"
-        if action == "buy":
-            print(f"{prefix} Beep 'BUY'")
-            subprocess.run(["beep", "-f", "1000", "-l", "300"], check=True, capture_output=True)
-            time.sleep(0.1)
-            subprocess.run(["beep", "-f", "1200", "-l", "200"], check=True, capture_output=True)
-        elif action == "sell":
-            print(f"{prefix} Beep 'SELL'")
-            subprocess.run(["beep", "-f", "700", "-l", "500"], check=True, capture_output=True)
-        else: print(f"{YELLOW}[WARN] Aksi beep '{action}' tidak dikenal.{RESET}")
-    except FileNotFoundError:
-        print(f"{YELLOW}[WARN] Perintah 'beep' tidak ditemukan. {DIM}(Opsional: pkg install beep){RESET}")
+        typ, data = mail.capability()
+        if typ == 'OK' and data and data[-1]:
+            return set(data[-1].decode('ascii', errors='replace').upper().split())
     except Exception: pass
+    return set(getattr(mail, 'capabilities', ()))
 
-# --- Fungsi Pemutaran MP3 (Menggunakan Termux:API) ---
-def play_action_sound(action, settings):
-    """Memainkan file buy.mp3 atau sell.mp3 menggunakan termux-media-player."""
-    if not settings.get("play_mp3_on_signal", False):
-        return # Fitur MP3 dinonaktifkan
+def imap_supports_idle(mail):
+    """Cek apakah server mengiklankan kapabilitas IDLE (setelah login)."""
+    return 'IDLE' in imap_capabilities(mail)
 
-    action_lower = action.lower()
-    if action_lower not in ["buy", "sell"]:
-        print(f"{RED}[ERROR] Aksi '{action}' tidak valid untuk play sound.{RESET}")
-        return
-
-    filename = f"{action_lower}.mp3"
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    filepath = os.path.join(script_dir, filename)
-
-    prefix = f"{GREEN}{BOLD}[MP3]{RESET}"
-    print(f"{prefix} Mencoba memainkan: {filename} (via termux-media-player)...")
-
-    # 1. Cek file MP3 ada
-    if not os.path.exists(filepath):
-        print(f"{RED}{BOLD}[X] Gagal memainkan MP3!{RESET}")
-        print(f"{RED}    └─ File '{filename}' tidak ditemukan di direktori script!{RESET}")
-        print(f"{DIM}       Lokasi: {script_dir}{RESET}")
+def imap_data_ready(mail, timeout):
+    """Tunggu sampai ada data dari server (termasuk yg sudah ada di buffer)."""
+    sock = mail.sock
+    old_timeout = sock.gettimeout()
+    try:
+        sock.settimeout(0.0)
+        try:
+            if mail.file.peek(1): return True # Sudah ada di buffer / socket
+        except (BlockingIOError, ssl.SSLWantReadError): pass
+        if isinstance(sock, ssl.SSLSocket) and sock.pending(): return True
+        readable, _, _ = select.select([sock], [], [], timeout)
+        return bool(readable)
+    finally:
+        sock.settimeout(old_timeout)
+
+def imap_idle_wait(mail, max_wait):
+    """Masuk mode IDLE sampai server mengirim EXISTS/RECENT atau max_wait habis.
+
+    Return True jika ada email baru. Raise IMAP4.abort jika koneksi putus,
+    IMAP4.error jika server menolak perintah IDLE.
+    """
+    tag = mail._new_tag()
+    got_new_mail = False
+    idling = False
+    try:
+        mail.send(tag + b' IDLE\r\n')
+        while True: # Tunggu continuation '+ idling'
+            line = mail.readline()
+            if not line: raise imaplib.IMAP4.abort("EOF saat memulai IDLE")
+            if line.startswith(b'+'): idling = True; break
+            if line.startswith(tag + b' '):
+                raise imaplib.IMAP4.error(f"IDLE ditolak server: {line.decode(errors='replace').strip()}")
+            if IDLE_NEW_MAIL_RE.match(line): got_new_mail = True
+
+        deadline = time.time() + max_wait
+        while running and not got_new_mail:
+            remaining = deadline - time.time()
+            if remaining <= 0: break
+            if not imap_data_ready(mail, min(1.0, remaining)): continue # Cek 'running' tiap detik
+            line = mail.readline()
+            if not line: raise imaplib.IMAP4.abort("EOF saat IDLE")
+            if IDLE_NEW_MAIL_RE.match(line): got_new_mail = True
+
+        idling = False
+        mail.send(b'DONE\r\n')
+        while True: # Tunggu respons bertag untuk IDLE
+            line = mail.readline()
+            if not line: raise imaplib.IMAP4.abort("EOF saat mengakhiri IDLE")
+            if line.startswith(tag + b' '):
+                if not line[len(tag) + 1:].upper().startswith(b'OK'):
+                    raise imaplib.IMAP4.abort(f"IDLE diakhiri dengan error: {line.decode(errors='replace').strip()}")
+                break
+            if IDLE_NEW_MAIL_RE.match(line): got_new_mail = True
+    except (KeyboardInterrupt, SystemExit):
+        if idling: imap_idle_abort(mail, tag)
+        raise
+    finally:
+        mail.tagged_commands.pop(tag, None)
+    return got_new_mail
+
+def imap_idle_abort(mail, tag):
+    """Akhiri IDLE yang terpotong (Ctrl+C/exit): DONE dengan batas waktu singkat, socket ditutup jika gagal.
+
+    Tanpa ini logout() berikutnya menunggu balasan yang tidak pernah datang
+    (server masih menunggu DONE) sampai timeout socket.
+    """
+    try:
+        mail.sock.settimeout(IDLE_ABORT_TIMEOUT)
+        mail.send(b'DONE\r\n')
+        while True: # Buang sisa untagged sampai respons bertag IDLE
+            line = mail.readline()
+            if not line or line.startswith(tag + b' '): break
+    except Exception:
+        try: mail.sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+
+# --- Fungsi Fetch Parsial IMAP ---
+HEADER_FETCH_ITEMS = "(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (SUBJECT FROM)])"
+IMAP_TOKEN_RE = re.compile(rb'''
+    (?P<open>\() | (?P<close>\)) |
+    "(?P<quoted>(?:[^"\\]|\\.)*)" |
+    (?P<atom>(?:[^\s()"\[]|\[[^\]]*\])+)
+''', re.VERBOSE)
+IMAP_LITERAL_RE = re.compile(rb'\{\d+\}\s*$')
+
+def imap_parse_response(data):
+    """Ubah data respons imaplib (bytes & tuple literal) menjadi list bersarang."""
+    root = []
+    stack = [root]
+    for item in data:
+        if isinstance(item, tuple):
+            head, literal = item[0], item[1]
+            _imap_tokenize_into(IMAP_LITERAL_RE.sub(b'', head), stack)
+            stack[-1].append(literal)
+        elif isinstance(item, bytes):
+            _imap_tokenize_into(item, stack)
+    return root
+
+def _imap_tokenize_into(text, stack):
+    for m in IMAP_TOKEN_RE.finditer(text):
+        if m.group('open'):
+            new_list = []
+            stack[-1].append(new_list)
+            stack.append(new_list)
+        elif m.group('close'):
+            if len(stack) > 1: stack.pop()
+        elif m.group('quoted') is not None:
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', m.group('quoted')))
+        else:
+            atom = m.group('atom')
+            stack[-1].append(None if atom.upper() == b'NIL' else atom)
+
+def imap_fetch_messages(data):
+    """Kelompokkan respons FETCH per pesan: list (seq, {ITEM: nilai})."""
+    parsed = imap_parse_response(data)
+    messages = []
+    for i in range(len(parsed) - 1):
+        if isinstance(parsed[i], bytes) and isinstance(parsed[i + 1], list):
+            pairs = parsed[i + 1]
+            items = {}
+            for k in range(0, len(pairs) - 1, 2):
+                if isinstance(pairs[k], bytes): items[pairs[k].upper()] = pairs[k + 1]
+            messages.append((parsed[i], items))
+    return messages
+
+def imap_find_item(items, prefix):
+    """Cari nilai item FETCH berdasarkan awalan nama (mis. b'BODY[HEADER')."""
+    for key, value in items.items():
+        if key.startswith(prefix): return value
+    return None
+
+def find_text_plain_part(bodystructure, section=""):
+    """Cari bagian text/plain pertama (bukan attachment) di BODYSTRUCTURE.
+
+    Return (section, encoding, charset) atau None jika tidak ada.
+    """
+    if not isinstance(bodystructure, list) or not bodystructure: return None
+    if isinstance(bodystructure[0], list): # Multipart: anak bernomor 1..n
+        for idx, part in enumerate(bodystructure, start=1):
+            if not isinstance(part, list): break
+            found = find_text_plain_part(part, f"{section}.{idx}" if section else str(idx))
+            if found: return found
+        return None
+
+    ctype = (bodystructure[0] or b'').lower()
+    subtype = (bodystructure[1] or b'').lower() if len(bodystructure) > 1 else b''
+    if ctype != b'text' or subtype != b'plain': return None
+    disposition = bodystructure[9] if len(bodystructure) > 9 else None
+    if isinstance(disposition, list) and disposition and (disposition[0] or b'').lower() == b'attachment':
+        return None
+
+    charset = 'utf-8'
+    params = bodystructure[2] if isinstance(bodystructure[2], list) else []
+    for key, value in zip(params[::2], params[1::2]):
+        if isinstance(key, bytes) and key.lower() == b'charset' and value:
+            charset = value.decode('ascii', errors='replace')
+    encoding = (bodystructure[5] or b'7bit').decode('ascii', errors='replace').lower() if len(bodystructure) > 5 else '7bit'
+    return (section or "1", encoding, charset)
+
+def parse_header_fetch(items):
+    """Ambil (subject, sender, part_info) dari item FETCH header+BODYSTRUCTURE."""
+    header = imap_find_item(items, b'BODY[HEADER')
+    bodystructure = items.get(b'BODYSTRUCTURE')
+    if header is None or bodystructure is None: return None
+    msg = email.message_from_bytes(header)
+    return decode_mime_words(msg["Subject"]), decode_mime_words(msg["From"]), find_text_plain_part(bodystructure)
+
+BODY_SCAN_CHUNK = 16384 # Byte per potongan saat decode body bertahap
+BASE64_JUNK_RE = re.compile(rb'[^A-Za-z0-9+/=]')
+
+def _iter_transfer_decoded(payload, encoding, chunk_size):
+    """Decode Content-Transfer-Encoding per potongan tanpa memutus kuartet base64 / escape =XX."""
+    carry = b''
+    for start in range(0, len(payload), chunk_size):
+        raw = carry + payload[start:start + chunk_size]
+        if encoding == 'base64':
+            raw = BASE64_JUNK_RE.sub(b'', raw)
+            cut = len(raw) - len(raw) % 4
+        elif encoding == 'quoted-printable':
+            cut = raw.rfind(b'\n') + 1
+            if not cut: # Baris sangat panjang: potong asal tidak di tengah escape
+                eq = raw.rfind(b'=', max(len(raw) - 2, 0))
+                cut = eq if eq != -1 else len(raw)
+        else:
+            yield raw; continue
+        carry, raw = raw[cut:], raw[:cut]
+        try:
+            yield binascii.a2b_base64(raw) if encoding == 'base64' else quopri.decodestring(raw)
+        except (binascii.Error, ValueError): yield raw # Pakai apa adanya
+    if carry and encoding == 'quoted-printable': yield quopri.decodestring(carry)
+    # Sisa base64 < 4 karakter dibuang: fetch terpotong <0.N> bisa memutus kuartet base64
+
+def iter_body_chunks(payload, encoding, charset, chunk_size=BODY_SCAN_CHUNK):
+    """Decode bagian MIME (base64/quoted-printable lalu charset) sebagai potongan teks berurutan."""
+    if not payload: return
+    if len(payload) <= chunk_size: # Body kecil: cukup sekali decode
+        raw = b"".join(_iter_transfer_decoded(payload, encoding, chunk_size))
+        try: text = raw.decode(charset, errors='replace')
+        except LookupError: text = raw.decode('utf-8', errors='replace')
+        if text: yield text
         return
-
-    # 2. Coba jalankan termux-media-player
     try:
-        # Cek dulu apakah command `termux-media-player` ada
-        if not shutil.which("termux-media-player"):
-            raise FileNotFoundError("Perintah 'termux-media-player' tidak ditemukan.")
-
-        # Perintahnya simpel: termux-media-player play <namafile>
-        result = subprocess.run(
-            ["termux-media-player", "play", filepath],
-            check=True,          # Raise error jika command gagal
-            capture_output=True, # Tangkap output
-            text=True,
-            timeout=10 # Tambahkan timeout agar tidak hang jika API bermasalah
-        )
-        # Jika berhasil, termux-media-player biasanya tidak banyak output
-        print(f"{prefix} Perintah play '{filename}' dikirim ke Termux:API.")
-        # Catatan: Playback mungkin berjalan di background, script lanjut
-
-    except FileNotFoundError:
-        # Error jika perintah 'termux-media-player' tidak ada
-        print(f"{RED}{BOLD}[X] Gagal memainkan MP3!{RESET}")
-        print(f"{RED}    └─ Perintah 'termux-media-player' tidak ditemukan!{RESET}")
-        print(f"{YELLOW}       Pastikan sudah install dengan menjalankan:{RESET}")
-        print(f"{YELLOW}       pkg install termux-api{RESET}")
-        print(f"{DIM}       (Mungkin juga perlu install aplikasi Termux:API dari store){RESET}")
-
-    except subprocess.TimeoutExpired:
-         print(f"{RED}{BOLD}[X] Gagal memainkan MP3 via termux-media-player!{RESET}")
-         print(f"{RED}    └─ Perintah timed out. Termux:API mungkin tidak responsif.{RESET}")
-
-    except subprocess.CalledProcessError as e:
-        # Error jika termux-media-player jalan tapi gagal
-        print(f"{RED}{BOLD}[X] Gagal memainkan MP3 via termux-media-player!{RESET}")
-        print(f"{RED}    └─ termux-media-player keluar dengan error (code: {e.returncode}).{RESET}")
-        if e.stderr:
-            print(f"{DIM}       Pesan error:\n{e.stderr.strip()}{RESET}")
-        if e.stdout:
-            print(f"{DIM}       Output:\n{e.stdout.strip()}{RESET}")
-        print(f"{DIM}       (Cek apakah file MP3 valid dan Termux:API berfungsi?){RESET}")
-
-    except Exception as e:
-        # Error tak terduga lainnya
-        print(f"{RED}{BOLD}[X] Error tak terduga saat mencoba memainkan MP3 via Termux:API:{RESET}")
-        print(f"{RED}    └─ {e}{RESET}")
-        traceback.print_exc()
+        decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for raw in _iter_transfer_decoded(payload, encoding, chunk_size):
+        text = decoder.decode(raw)
+        if text: yield text
+    text = decoder.decode(b'', final=True)
+    if text: yield text
+
+def decode_body_part(payload, encoding, charset):
+    """Decode isi bagian MIME (base64/quoted-printable) lalu charset-nya."""
+    return "".join(iter_body_chunks(payload, encoding, charset))
+
+def imap_message_set(uids):
+    """Ringkas daftar UID jadi message set IMAP, mis. [1, 2, 3, 7] -> '1:3,7'."""
+    nums = sorted({int(uid) for uid in uids})
+    if not nums: return ""
+    ranges = []
+    start = prev = nums[0]
+    for num in nums[1:]:
+        if num != prev + 1:
+            ranges.append((start, prev))
+            start = num
+        prev = num
+    ranges.append((start, prev))
+    return ",".join(f"{a}:{b}" if a != b else str(a) for a, b in ranges)
+
+def imap_fetch_by_uid(mail, uids, items):
+    """Satu UID FETCH untuk banyak pesan. Return (status, {uid: {ITEM: nilai}})."""
+    if not uids: return 'OK', {}
+    status, data = mail.uid('FETCH', imap_message_set(uids), items)
+    if status != 'OK': return status, {}
+    wanted = set(uids)
+    result = {}
+    for seq, fetched in imap_fetch_messages(data):
+        uid = fetched.get(b'UID')
+        if uid in wanted: result.setdefault(uid, {}).update(fetched)
+    return 'OK', result
+
+def fetch_headers_batch(mail, uids):
+    """Tahap 1 massal: BODYSTRUCTURE + Subject/From. Return (status, {uid: (subject, sender, part_info)})."""
+    status, fetched = imap_fetch_by_uid(mail, uids, HEADER_FETCH_ITEMS)
+    headers = {}
+    for uid, items in fetched.items():
+        try: parsed = parse_header_fetch(items)
+        except Exception: parsed = None # BODYSTRUCTURE aneh, nanti pakai RFC822
+        if parsed: headers[uid] = parsed
+    return status, headers
+
+def fetch_bodies_batch(mail, parts, settings):
+    """Tahap 2 massal: fetch text/plain, satu UID FETCH per section yang sama.
+
+    parts: {uid: part_info}. Return (status, {uid: iterator potongan teks body}).
+    Body baru di-decode saat iterator dibaca (lihat scan_signal_body).
+    """
+    bodies = {}
+    by_section = {}
+    for uid, part_info in parts.items():
+        if part_info: by_section.setdefault(part_info[0], []).append(uid)
+        else: bodies[uid] = iter(()) # Tidak ada text/plain
+    max_bytes = settings.body_fetch_max_bytes
+    for section, uids in by_section.items():
+        spec = f"BODY.PEEK[{section}]" + (f"<0.{max_bytes}>" if max_bytes > 0 else "")
+        status, fetched = imap_fetch_by_uid(mail, uids, f"({spec})")
+        if status != 'OK': return status, bodies
+        for uid in uids:
+            if uid not in fetched: continue
+            _, encoding, charset = parts[uid]
+            payload = imap_find_item(fetched[uid], b'BODY[') or b''
+            bodies[uid] = iter_body_chunks(payload, encoding, charset)
+    return 'OK', bodies
+
+def fetch_full_batch(mail, uids):
+    """Fetch RFC822 penuh massal (mode lama / fallback). Return (status, {uid: (subject, sender, body)}).
+
+    body berupa iterator potongan teks (lazy), sama seperti fetch_bodies_batch.
+    """
+    status, fetched = imap_fetch_by_uid(mail, uids, "(RFC822)")
+    contents = {}
+    for uid, items in fetched.items():
+        raw = items.get(b'RFC822')
+        if not raw: continue
+        msg = email.message_from_bytes(raw)
+        contents[uid] = (decode_mime_words(msg["Subject"]), decode_mime_words(msg["From"]), iter_email_text(msg))
+    return status, contents
+
+def mark_seen_batch(mail, uids):
+    """Satu UID STORE +FLAGS (\\Seen) untuk semua email yang sudah diproses."""
+    if not uids: return 'OK'
+    status, _ = mail.uid('STORE', imap_message_set(uids), '+FLAGS', '(\\Seen)')
+    return status
+
+def format_match_stats():
+    """Ringkasan berapa kali sinyal diputuskan dari Subjek vs Body."""
+    return f"Jalur: Subjek {MATCH_PATH_STATS['subject']}x | Body {MATCH_PATH_STATS['body']}x | Tanpa sinyal {MATCH_PATH_STATS['none']}x"
+
+def parse_signal(content, target_kw, trigger_kw):
+    """Cari pola target -> trigger -> kata aksi di teks (sudah lowercase).
+
+    Return (hasil, kata_aksi). hasil: 'ok', 'no_target', 'no_trigger',
+    'no_action' atau 'invalid_action'.
+    """
+    target_idx = content.find(target_kw)
+    if target_idx == -1: return 'no_target', ""
+    trigger_idx = content.find(trigger_kw, target_idx + len(target_kw))
+    if trigger_idx == -1: return 'no_trigger', ""
+    text_after = content[trigger_idx + len(trigger_kw):].lstrip()
+    action_word = text_after.split(maxsplit=1)[0].strip('.,!?:;()[]{}').lower() if text_after else ""
+    if action_word in ("buy", "sell"): return 'ok', action_word
+    return ('invalid_action' if action_word else 'no_action'), action_word
+
+class SignalStreamParser:
+    """parse_signal bertahap untuk teks yang datang potong demi potong (sudah dinormalisasi).
+
+    Buffer hanya menyimpan ekor yang mungkin memuat awal keyword berikutnya,
+    dan kata aksi baru diputuskan setelah katanya lengkap.
+    """
+    def __init__(self, target_kw, trigger_kw):
+        self.target_kw, self.trigger_kw = target_kw, trigger_kw
+        self.stage = 'target' # target -> trigger -> action
+        self.buffer = ""
+        self.result = None
+
+    def feed(self, text, final=False):
+        """Tambah teks. Return True jika hasil sudah pasti (decode sisa body tidak perlu)."""
+        if self.result: return True
+        buf = self.buffer + text
+        while self.stage != 'action':
+            kw = self.target_kw if self.stage == 'target' else self.trigger_kw
+            idx = buf.find(kw)
+            if idx == -1:
+                if final:
+                    self.result = ('no_target' if self.stage == 'target' else 'no_trigger'), ""
+                    return True
+                self.buffer = buf[max(0, len(buf) - len(kw) + 1):]
+                return False
+            buf = buf[idx + len(kw):]
+            self.stage = 'trigger' if self.stage == 'target' else 'action'
+        text_after = buf.lstrip()
+        first_word = text_after.split(maxsplit=1)[0] if text_after else ""
+        if not final and len(first_word) == len(text_after): # Belum ada spasi setelah kata aksi: mungkin masih terpotong
+            self.buffer = buf
+            return False
+        action_word = first_word.strip('.,!?:;()[]{}').lower()
+        self.result = ('ok', action_word) if action_word in ("buy", "sell") else (('invalid_action' if action_word else 'no_action'), action_word)
+        return True
+
+    def finish(self):
+        if not self.result: self.feed("", final=True)
+        return self.result
+
+def scan_signal_body(subject, chunks, target_kw, trigger_kw):
+    """parse_signal atas Subjek + potongan body, normalisasi sambil jalan.
+
+    Decode berhenti begitu target -> trigger -> aksi terputuskan, jadi
+    newsletter besar tidak di-decode utuh. Return (hasil, kata_aksi).
+    """
+    parser = SignalStreamParser(target_kw, trigger_kw)
+    if not parser.feed(subject.lower() + " "):
+        normalizer = TextNormalizer()
+        for chunk in chunks:
+            text = normalizer.feed(chunk)
+            if text and parser.feed(text): break
+    return parser.finish()
 
 # --- Fungsi Pemrosesan Email ---
-def process_email(mail, email_id, settings):
-    # ... (fungsi sama, panggil play_action_sound yg baru) ...
+def process_email_batch(mail, uids, settings, uid_state=None, audio=None):
+    """Cocokkan sekumpulan email baru (berdasarkan UID) dengan keyword Target/Trigger & bunyikan alert.
+
+    1x UID FETCH header untuk semua; jika Subjek belum memberi BUY/SELL, body
+    diambil (massal) dan discan. Lalu 1x UID STORE \\Seen di akhir.
+    uid_state (opsional) dimajukan setelah tiap email agar restart tidak
+    membunyikan ulang alert email lama. audio (AudioPlayer, opsional)
+    memutar beep + MP3 sinyal di background tanpa menahan loop ini.
+    """
     global running
-    if not running: return
+    if not running or not uids: return
 
-    target_kw = settings['target_keyword'].lower()
-    trigger_kw = settings['trigger_keyword'].lower()
-    email_id_str = email_id.decode('utf-8')
-    log_prefix = f"[{BLUE}EMAIL {email_id_str}{RESET}]"
+    target_kw = settings.target_keyword_lower # Sudah lowercase sejak Settings dibuat
+    trigger_kw = settings.trigger_keyword_lower
+    contents = {} # uid -> [subject, sender, part_info, iterator potongan body]
 
-    try:
-        status, data = mail.fetch(email_id, "(RFC822)")
+    # Tahap 1: header saja (Subject/From + BODYSTRUCTURE), satu round trip
+    if settings.use_partial_fetch:
+        status, headers = fetch_headers_batch(mail, uids)
         if status != 'OK':
-            print(f"{log_prefix} {RED}Gagal fetch: {status}{RESET}")
+            print(f"{RED}[X] Gagal fetch header {len(uids)} email: {status}{RESET}")
             return
+        for uid, (subject, sender, part_info) in headers.items():
+            contents[uid] = [subject, sender, part_info, None]
+    missing = [uid for uid in uids if uid not in contents]
+    if missing:
+        status, full = fetch_full_batch(mail, missing)
+        if status != 'OK': print(f"{RED}[X] Gagal fetch {len(missing)} email: {status}{RESET}")
+        for uid, (subject, sender, body) in full.items():
+            contents[uid] = [subject, sender, None, body]
+
+    # Fast path: putuskan dari Subject (opsional + From) tanpa menyentuh body
+    subject_results = {}
+    for uid, (subject, sender, part_info, body) in contents.items():
+        if body is None:
+            header_text = subject.lower()
+            if settings.header_match_include_sender: header_text += " " + sender.lower()
+            subject_results[uid] = parse_signal(header_text, target_kw, trigger_kw)
+
+    processed = []
+    bodies_loaded = False
+    in_order = True # High-water mark hanya maju selama belum ada email yang gagal
+    pending_uid = None
+    for idx, uid in enumerate(uids):
+        if not running: break
+        uid_str = uid.decode('utf-8')
+        if uid not in contents:
+            print(f"[{BLUE}EMAIL {uid_str}{RESET}] {RED}Gagal fetch, dicoba lagi nanti.{RESET}")
+            in_order = False
+            continue
+        try:
+            subject, sender, part_info, body = contents[uid]
+            timestamp = datetime.datetime.now().strftime("%H:%M") # Waktu lebih ringkas
+
+            print(f"\n{CYAN}╭─ Email Baru [{timestamp}] {'─'*(get_terminal_width() - 22)}{RESET}")
+            print(f"{CYAN}│{RESET} {DIM}UID   :{RESET} {uid_str}")
+            print(f"{CYAN}│{RESET} {DIM}Dari  :{RESET} {sender[:40]}{'...' if len(sender)>40 else ''}") # Batasi panjang sender
+            print(f"{CYAN}│{RESET} {DIM}Subjek:{RESET} {subject[:50]}{'...' if len(subject)>50 else ''}") # Batasi panjang subjek
+
+            result, action_word = subject_results.get(uid, ('no_target', ""))
+            match_path = 'subject' if result == 'ok' else None
+
+            # Tahap 2: body hanya jika Subject belum meyakinkan
+            if match_path is None:
+                if body is None:
+                    if not bodies_loaded:
+                        # Ambil body massal untuk semua email tersisa yg Subjeknya belum meyakinkan
+                        pending = {u: contents[u][2] for u in uids[idx:]
+                                   if u in subject_results and subject_results[u][0] != 'ok'}
+                        status, bodies = fetch_bodies_batch(mail, pending, settings)
+                        if status != 'OK': print(f"{CYAN}│{RESET} {RED}Gagal fetch body: {status}{RESET}")
+                        for u, b in bodies.items(): contents[u][3] = b
+                        bodies_loaded = True
+                    body = contents[uid][3]
+                    if body is None:
+                        print(f"{CYAN}│{RESET} {RED}[X] Body tidak terambil, dicoba lagi nanti.{RESET}")
+                        print(f"{CYAN}╰{'─' * (get_terminal_width() - 1)}{RESET}")
+                        in_order = False
+                        continue
+                result, action_word = scan_signal_body(subject, body, target_kw, trigger_kw)
+                match_path = 'body' if result == 'ok' else 'none'
+            MATCH_PATH_STATS[match_path] += 1
+
+            if result != 'no_target':
+                print(f"{CYAN}│{RESET} {GREEN}[✓] Target '{settings.target_keyword}' ditemukan.{RESET}")
+            if result == 'ok':
+                path_desc = "Subjek" if match_path == 'subject' else "Body"
+                print(f"{CYAN}│{RESET} {GREEN}[✓] Trigger '{settings.trigger_keyword}' -> Aksi: {BOLD}{action_word.upper()}{RESET} {DIM}(via {path_desc}){RESET}")
+                if audio: audio.play(action_word) # Beep + MP3 di background, langsung lanjut
+            elif result == 'invalid_action':
+                print(f"{CYAN}│{RESET} {YELLOW}[?] Trigger ditemukan, tapi kata '{action_word}' bukan 'buy'/'sell'.{RESET}")
+            elif result == 'no_action':
+                print(f"{CYAN}│{RESET} {YELLOW}[?] Trigger ditemukan, tapi tidak ada kata aksi setelahnya.{RESET}")
+            elif result == 'no_trigger':
+                print(f"{CYAN}│{RESET} {YELLOW}[?] Target ditemukan, tapi trigger '{settings.trigger_keyword}' tidak ada SETELAHNYA.{RESET}")
+            else:
+                print(f"{CYAN}│{RESET} {BLUE}[-] Target '{settings.target_keyword}' tidak ditemukan.{RESET}")
+            processed.append(uid)
+            if uid_state is not None and in_order:
+                if result == 'ok': save_uid_state(uid_state, uid) # Simpan segera setelah aksi
+                else: pending_uid = uid # Cukup disimpan sekali di akhir batch
+            print(f"{CYAN}╰{'─' * (get_terminal_width() - 1)}{RESET}") # Footer akhir
+        except (imaplib.IMAP4.abort, OSError):
+            raise # Koneksi putus, biarkan listener reconnect
+        except Exception:
+            print(f"[{BLUE}EMAIL {uid_str}{RESET}] {RED}{BOLD}FATAL Error proses email:{RESET}")
+            traceback.print_exc()
+            in_order = False
+
+    if uid_state is not None and pending_uid: save_uid_state(uid_state, pending_uid)
+
+    # Tandai sudah dibaca sekaligus
+    try:
+        status = mark_seen_batch(mail, processed)
+        if status == 'OK':
+            if processed: print(f"{DIM}[i] {len(processed)} email ditandai sudah dibaca.{RESET}")
+        else: print(f"{RED}[X] Gagal tandai dibaca: {status}{RESET}")
+    except (imaplib.IMAP4.abort, OSError):
+        raise
+    except Exception as e:
+        print(f"{RED}[X] Gagal tandai dibaca: {e}{RESET}")
 
-        msg = email.message_from_bytes(data[0][1])
-        subject = decode_mime_words(msg["Subject"])
-        sender = decode_mime_words(msg["From"])
-        timestamp = datetime.datetime.now().strftime("%H:%M")
-
-        print(f"\n{CYAN}╭─ Email Baru [{timestamp}] {'─'*(get_terminal_width() - 22)}{RESET}")
-        print(f"{CYAN}│{RESET} {DIM}ID    :{RESET} {email_id_str}")
-        print(f"{CYAN}│{RESET} {DIM}Dari  :{RESET} {sender[:40]}{'...' if len(sender)>40 else ''}")
-        print(f"{CYAN}│{RESET} {DIM}Subjek:{RESET} {subject[:50]}{'...' if len(subject)>50 else ''}")
-
-        body = get_text_from_email(msg)
-        full_content = (subject.lower() + " " + body)
 
-        if target_kw in full_content:
-            print(f"{CYAN}│{RESET} {GREEN}[✓] Target '{settings['target_keyword']}' ditemukan.{RESET}")
-            try:
-                target_idx = full_content.find(target_kw)
-                trigger_idx = full_content.find(trigger_kw, target_idx + len(target_kw))
+# --- Muat Ulang Konfigurasi (Hot Reload) ---
+class ConfigWatcher:
+    """Cek perubahan config.json (mtime tiap config_reload_seconds, atau SIGHUP) di sela loop listener.
 
-                if trigger_idx != -1:
-                    text_after = full_content[trigger_idx + len(trigger_kw):].lstrip()
-                    action_word = text_after.split(maxsplit=1)[0].strip('.,!?:;()[]{}').lower() if text_after else ""
+    Config baru dipasang sebelum SEARCH berikutnya tanpa memutus koneksi IMAP.
+    Kunci koneksi & audio tetap memakai nilai lama sampai listener di-restart.
+    """
+    RESTART_KEYS = ("email_address", "app_password", "imap_server", "use_imap_idle", "play_mp3_on_signal", "config_reload_seconds")
 
-                    if action_word in ["buy", "sell"]:
-                        print(f"{CYAN}│{RESET} {GREEN}[✓] Trigger '{settings['trigger_keyword']}' -> Aksi: {BOLD}{action_word.upper()}{RESET}")
-                        trigger_beep(action_word) # Panggil beep (opsional)
-                        play_action_sound(action_word, settings) # Panggil fungsi MP3 (yg pakai Termux:API)
-
-                    elif action_word:
-                        print(f"{CYAN}│{RESET} {YELLOW}[?] Trigger ditemukan, tapi kata '{action_word}' bukan 'buy'/'sell'.{RESET}")
-                    else:
-                        print(f"{CYAN}│{RESET} {YELLOW}[?] Trigger ditemukan, tapi tidak ada kata aksi setelahnya.{RESET}")
-                else:
-                     print(f"{CYAN}│{RESET} {YELLOW}[?] Target ditemukan, tapi trigger '{settings['trigger_keyword']}' tidak ada SETELAHNYA.{RESET}")
-            except Exception as e:
-                 print(f"{CYAN}│{RESET} {RED}[X] Error parsing setelah trigger: {e}{RESET}")
-                 traceback.print_exc()
-        else:
-             print(f"{CYAN}│{RESET} {BLUE}[-] Target '{settings['target_keyword']}' tidak ditemukan.{RESET}")
+    def __init__(self, settings):
+        self.settings = settings
+        self.interval = settings.config_reload_seconds
+        self.stamp = self._stamp()
+        self.requested = False
+        self.next_check = time.time() + self.interval
 
+    @staticmethod
+    def _stamp():
         try:
-            mail.store(email_id, '+FLAGS', '\\Seen')
-            print(f"{CYAN}│{RESET} {DIM}Email ditandai sudah dibaca.{RESET}")
-        except Exception as e:
-            print(f"{CYAN}│{RESET} {RED}[X] Gagal tandai dibaca: {e}{RESET}")
-
-        print(f"{CYAN}╰{'─' * (get_terminal_width() - 1)}{RESET}")
-
-    except Exception as e:
-        print(f"{log_prefix} {RED}{BOLD}FATAL Error proses email:{RESET}")
-        traceback.print_exc()
-
+            st = os.stat(CONFIG_FILE)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def request(self):
+        """Handler SIGHUP: muat ulang di putaran loop berikutnya."""
+        self.requested = True
+
+    def poll(self):
+        """Return settings baru jika config berubah & valid, selain itu None."""
+        forced, now = self.requested, time.time()
+        if not forced and (not self.interval or now < self.next_check): return None
+        self.requested, self.next_check = False, now + self.interval
+        stamp = self._stamp()
+        if not forced and (stamp is None or stamp == self.stamp): return None
+        self.stamp = stamp
+        try:
+            with open(CONFIG_FILE, 'r') as f:
+                loaded_settings = json.load(f)
+            if not isinstance(loaded_settings, dict): raise ValueError("isi config bukan objek JSON")
+            new_settings = Settings.from_dict(loaded_settings)
+        except (OSError, ValueError, TypeError) as e: # Termasuk file yang sedang setengah ditulis editor
+            print(f"\n{RED}[X] Gagal memuat ulang {CONFIG_FILE}: {e}. Pengaturan lama tetap dipakai.{RESET}")
+            return None
+        changed = [k for k in DEFAULT_SETTINGS if getattr(new_settings, k) != getattr(self.settings, k)]
+        if not changed: return None
+        restart_needed = [k for k in changed if k in self.RESTART_KEYS]
+        self.settings = dataclasses.replace(new_settings, **{k: getattr(self.settings, k) for k in restart_needed})
+        print(f"\n{GREEN}[OK] {CONFIG_FILE} dimuat ulang{' (SIGHUP)' if forced else ''}: {', '.join(changed)}. "
+              f"{DIM}(berlaku untuk email berikutnya, koneksi tetap){RESET}")
+        if restart_needed:
+            print(f"{YELLOW}[!] Perlu restart listener agar berlaku: {', '.join(restart_needed)}.{RESET}")
+        return self.settings
 
 # --- Fungsi Listening Utama ---
 def start_listening(settings):
@@ -332,8 +1024,9 @@ def start_listening(settings):
     wait_time = 2
     long_wait = 60
 
-    mp3_active = settings.get("play_mp3_on_signal", True)
-    termux_api_ok = shutil.which("termux-media-player") is not None
+    mp3_active = settings.play_mp3_on_signal
+    audio = AudioPlayer(settings) # Resolve binary & file MP3 sekali di sini
+    termux_api_ok = audio.player_bin is not None
 
     print_separator('─', GREEN if mp3_active else YELLOW)
     if mp3_active:
@@ -344,24 +1037,29 @@ def start_listening(settings):
             print(f"{YELLOW}{DIM}   (WARNING: Termux:API command tidak terdeteksi! Install: pkg install termux-api){RESET}")
     else:
         print_centered("Mode Pemutaran MP3: NONAKTIF", YELLOW, BOLD)
+    audio.report()
     print_separator('─', GREEN if mp3_active else YELLOW)
-    time.sleep(1)
+    if not DAEMON_MODE: time.sleep(1)
 
-    print(f"\n{GREEN}{BOLD}Memulai listener... (Ctrl+C untuk berhenti){RESET}")
+    startup_desc = f" {DIM}(startup {(time.perf_counter() - STARTED_AT) * 1000:.0f} ms){RESET}" if DAEMON_MODE else ""
+    print(f"\n{GREEN}{BOLD}Memulai listener... (Ctrl+C untuk berhenti){RESET}{startup_desc}")
     wait_indicator_chars = ['∙', '·', '˙', ' ']
     indicator_idx = 0
+    watcher = ConfigWatcher(settings)
+    sighup = getattr(signal, 'SIGHUP', None) # Tidak ada di Windows
+    previous_sighup = signal.signal(sighup, lambda sig, frame: watcher.request()) if sighup else None
 
     while running:
         try:
             if not mail or mail.state != 'SELECTED':
-                print(f"\n{CYAN}[...] Menghubungkan ke IMAP {settings['imap_server']}...{RESET}")
+                print(f"\n{CYAN}[...] Menghubungkan ke IMAP {settings.imap_server}...{RESET}")
                 try:
-                    mail = imaplib.IMAP4_SSL(settings['imap_server'], timeout=20)
-                    rv, desc = mail.login(settings['email_address'], settings['app_password'])
+                    mail = imaplib.IMAP4_SSL(settings.imap_server, timeout=20)
+                    rv, desc = mail.login(settings.email_address, settings.app_password)
                     if rv != 'OK': raise imaplib.IMAP4.error(f"Login gagal: {desc}")
                     rv, data = mail.select("inbox")
                     if rv != 'OK': raise imaplib.IMAP4.error(f"Gagal select inbox: {data}")
-                    print(f"{GREEN}[OK] Terhubung & Login ke {settings['email_address']}. Mendengarkan...{RESET}")
+                    print(f"{GREEN}[OK] Terhubung & Login ke {settings.email_address}. Mendengarkan...{RESET}")
                     consecutive_errors = 0; wait_time = 2
                 except (imaplib.IMAP4.error, OSError, socket.error, socket.timeout) as login_err:
                     print(f"{RED}{BOLD}[X] Gagal koneksi/login IMAP!{RESET}")
@@ -379,26 +1077,47 @@ def start_listening(settings):
                     mail = None
 
             if mail and mail.state == 'SELECTED':
+                uid_state = load_uid_state(f"{settings.email_address}|{settings.imap_server}|inbox", get_uidvalidity(mail))
+                if uid_state['last_uid']:
+                    print(f"{DIM}[i] Lanjut dari UID {uid_state['last_uid']} (email lama tidak discan ulang).{RESET}")
+                capabilities = imap_capabilities(mail)
+                use_idle = settings.use_imap_idle and 'IDLE' in capabilities
+                if use_idle:
+                    print(f"{GREEN}[OK] Server mendukung IDLE. Mode push aktif.{RESET}")
+                elif settings.use_imap_idle:
+                    print(f"{YELLOW}[i] Server tidak mendukung IDLE. Kembali ke mode polling.{RESET}")
+                search_filter, raw_ignored = build_search_filter(settings, capabilities)
+                if raw_ignored:
+                    print(f"{YELLOW}[!] Server bukan Gmail (tanpa X-GM-EXT-1). 'imap_search_gmail_raw' diabaikan.{RESET}")
+                if search_filter:
+                    print(f"{DIM}[i] Filter SEARCH server: {search_filter} (email lain dibiarkan belum dibaca).{RESET}")
+
                 while running:
+                    reloaded = watcher.poll()
+                    if reloaded:
+                        settings = reloaded
+                        search_filter, _ = build_search_filter(settings, capabilities)
                     current_time = time.time()
-                    if current_time - last_check_time < settings['check_interval_seconds']:
+                    if not use_idle and current_time - last_check_time < settings.check_interval_seconds:
                         time.sleep(0.5)
                         continue
 
-                    try:
-                        status, _ = mail.noop()
-                        if status != 'OK':
-                            raise imaplib.IMAP4.abort(f"NOOP gagal, status: {status}")
-                    except (imaplib.IMAP4.abort, imaplib.IMAP4.readonly, BrokenPipeError, OSError, socket.error, socket.timeout) as noop_err:
-                        print(f"\n{YELLOW}[!] Koneksi IMAP terputus ({type(noop_err).__name__}). Mencoba reconnect...{RESET}")
-                        try: mail.logout()
-                        except Exception: pass
-                        mail = None
-                        consecutive_errors += 1
-                        break
+                    if not use_idle:
+                        try:
+                            status, _ = mail.noop()
+                            if status != 'OK':
+                                raise imaplib.IMAP4.abort(f"NOOP gagal, status: {status}")
+                        except (imaplib.IMAP4.abort, imaplib.IMAP4.readonly, BrokenPipeError, OSError, socket.error, socket.timeout) as noop_err:
+                            print(f"\n{YELLOW}[!] Koneksi IMAP terputus ({type(noop_err).__name__}). Mencoba reconnect...{RESET}")
+                            try: mail.logout()
+                            except Exception: pass
+                            mail = None
+                            consecutive_errors += 1
+                            break
 
                     try:
-                        status, messages = mail.search(None, '(UNSEEN)')
+                        # Filter server menyaring email non-sinyal sebelum diunduh
+                        status, messages = mail.uid('SEARCH', None, build_search_criteria(uid_state['last_uid'], search_filter))
                         if status != 'OK':
                             print(f"\n{RED}[X] Gagal cari email UNSEEN: {status}. Reconnecting...{RESET}")
                             try: mail.logout()
@@ -406,20 +1125,19 @@ def start_listening(settings):
                             mail = None; consecutive_errors += 1
                             break
 
-                        email_ids = messages[0].split()
+                        # 'UID n:*' selalu memuat UID terbesar walau < n, saring ulang di sini
+                        email_ids = [uid for uid in messages[0].split() if int(uid) > uid_state['last_uid']]
                         if email_ids:
                             num = len(email_ids)
                             print(f"\n{GREEN}{BOLD}[!] {num} email baru ditemukan! Memproses...{RESET}")
-                            for i, eid in enumerate(email_ids):
-                                if not running: break
-                                print(f"{DIM}--- Proses email {i+1}/{num} (ID: {eid.decode()}) ---{RESET}")
-                                process_email(mail, eid, settings)
+                            process_email_batch(mail, email_ids, settings, uid_state, audio)
                             if not running: break
-                            print(f"{GREEN}[OK] Selesai proses {num} email. Mendengarkan lagi...{RESET}")
+                            print(f"{GREEN}[OK] Selesai proses {num} email. Mendengarkan lagi... {DIM}({format_match_stats()}){RESET}")
                         else:
                             indicator_idx = (indicator_idx + 1) % len(wait_indicator_chars)
                             wait_char = wait_indicator_chars[indicator_idx]
-                            print(f"{BLUE}[{wait_char}] Menunggu email baru... {DIM}(Interval: {settings['check_interval_seconds']}s){RESET}   ", end='\r', flush=True)
+                            wait_mode = "IDLE" if use_idle else f"Interval: {settings.check_interval_seconds}s"
+                            print(f"{BLUE}[{wait_char}] Menunggu email baru... {DIM}({wait_mode}){RESET}   ", end='\r', flush=True)
 
                     except (imaplib.IMAP4.error, OSError, socket.error, socket.timeout) as search_err:
                          print(f"\n{RED}[X] Error saat mencari email: {search_err}. Reconnecting...{RESET}")
@@ -431,6 +1149,19 @@ def start_listening(settings):
                     last_check_time = current_time
                     if not running: break
 
+                    if use_idle:
+                        try:
+                            imap_idle_wait(mail, IDLE_REFRESH_SECONDS)
+                        except (imaplib.IMAP4.abort, BrokenPipeError, OSError, socket.error, socket.timeout) as idle_err:
+                            print(f"\n{YELLOW}[!] Koneksi IMAP terputus saat IDLE ({type(idle_err).__name__}). Mencoba reconnect...{RESET}")
+                            try: mail.logout()
+                            except Exception: pass
+                            mail = None; consecutive_errors += 1
+                            break
+                        except imaplib.IMAP4.error as idle_err:
+                            print(f"\n{YELLOW}[!] {idle_err}. Kembali ke mode polling.{RESET}")
+                            use_idle = False
+
                 if mail and mail.state == 'SELECTED':
                    try: mail.close()
                    except Exception: pass
@@ -465,7 +1196,9 @@ def start_listening(settings):
             else:
                  pass
 
-    print(f"\n{YELLOW}{BOLD}[INFO] Listener dihentikan.{RESET}")
+    if sighup: signal.signal(sighup, previous_sighup)
+    audio.stop()
+    print(f"\n{YELLOW}{BOLD}[INFO] Listener dihentikan.{RESET} {DIM}({format_match_stats()}){RESET}")
 
 
 # --- Fungsi Menu Pengaturan ---
@@ -477,18 +1210,22 @@ def show_settings(settings):
 
         print(f"\n{BOLD}{CYAN} E M A I L {RESET}")
         print(f"{DIM}─────────────────────────────{RESET}")
-        print(f" {CYAN}1. Alamat Email{RESET}   : {settings['email_address'] or f'{DIM}[Kosong]{RESET}'}")
-        app_pass_disp = f"{GREEN}Terisi{RESET}" if settings['app_password'] else f"{RED}Kosong{RESET}"
+        print(f" {CYAN}1. Alamat Email{RESET}   : {settings.email_address or f'{DIM}[Kosong]{RESET}'}")
+        app_pass_disp = f"{GREEN}Terisi{RESET}" if settings.app_password else f"{RED}Kosong{RESET}"
         print(f" {CYAN}2. App Password{RESET}   : {app_pass_disp}")
-        print(f" {CYAN}3. Server IMAP{RESET}    : {settings['imap_server']}")
-        print(f" {CYAN}4. Interval Cek{RESET}   : {settings['check_interval_seconds']} detik")
-        print(f" {CYAN}5. Keyword Target{RESET} : '{settings['target_keyword']}'")
-        print(f" {CYAN}6. Keyword Trigger{RESET}: '{settings['trigger_keyword']}'")
+        print(f" {CYAN}3. Server IMAP{RESET}    : {settings.imap_server}")
+        print(f" {CYAN}4. Interval Cek{RESET}   : {settings.check_interval_seconds} detik")
+        print(f" {CYAN}5. Keyword Target{RESET} : '{settings.target_keyword}'")
+        print(f" {CYAN}6. Keyword Trigger{RESET}: '{settings.trigger_keyword}'")
+        search_filter, _ = build_search_filter(settings, ('X-GM-EXT-1',)) # Tampilkan semua, termasuk X-GM-RAW
+        print(f" {DIM}   Filter SEARCH   : {search_filter or 'nonaktif (semua UNSEEN)'} (edit 'imap_search_*' di {CONFIG_FILE}){RESET}")
+        idle_status = f"{GREEN}Aktif{RESET}" if settings.use_imap_idle else f"{YELLOW}Nonaktif{RESET}"
+        print(f" {CYAN}7. Mode Push IDLE{RESET} : {idle_status}")
 
         print(f"\n{BOLD}{YELLOW} M P 3   S I G N A L   (via Termux:API) {RESET}")
         print(f"{DIM}─────────────────────────────{RESET}")
-        mp3_status = f"{GREEN}{BOLD}Aktif{RESET}" if settings['play_mp3_on_signal'] else f"{YELLOW}Nonaktif{RESET}"
-        print(f" {YELLOW}7. Mainkan MP3?{RESET}   : {mp3_status}")
+        mp3_status = f"{GREEN}{BOLD}Aktif{RESET}" if settings.play_mp3_on_signal else f"{YELLOW}Nonaktif{RESET}"
+        print(f" {YELLOW}8. Mainkan MP3?{RESET}   : {mp3_status}")
         termux_api_ok = shutil.which("termux-media-player") is not None
         termux_api_stat = f"{GREEN}OK{RESET}" if termux_api_ok else f"{RED}Tidak Ada!{RESET}"
         print(f"   {DIM}└─ Termux:API Cmd : {termux_api_stat} {DIM} (Perlu: buy.mp3 & sell.mp3){RESET}")
@@ -516,36 +1253,45 @@ def show_settings(settings):
         if choice == 'edit':
             print(f"\n{BOLD}{MAGENTA}--- Edit Pengaturan ---{RESET}")
             print(f"{DIM}(Kosongkan input untuk skip / tidak ubah){RESET}")
+            values = settings.to_dict() # Settings immutable: edit salinan dict, divalidasi saat disimpan
 
             print(f"\n{CYAN}--- Email ---{RESET}")
             # ... (input email 1-6 sama) ...
-            if val := input(f" 1. Email [{settings['email_address']}]: ").strip(): settings['email_address'] = val
+            if val := input(f" 1. Email [{values['email_address']}]: ").strip(): values['email_address'] = val
             print(f" 2. App Password (input tersembunyi): ", end='', flush=True)
             try: pwd = getpass.getpass("")
             except Exception: pwd = input(" App Password [***]: ").strip()
-            if pwd: settings['app_password'] = pwd; print(f"{GREEN}OK{RESET}")
+            if pwd: values['app_password'] = pwd; print(f"{GREEN}OK{RESET}")
             else: print(f"{DIM}Skip{RESET}")
-            if val := input(f" 3. IMAP Server [{settings['imap_server']}]: ").strip(): settings['imap_server'] = val
+            if val := input(f" 3. IMAP Server [{values['imap_server']}]: ").strip(): values['imap_server'] = val
             while True:
-                val_str = input(f" 4. Interval (detik) [{settings['check_interval_seconds']}], min 5: ").strip()
+                val_str = input(f" 4. Interval (detik) [{values['check_interval_seconds']}], min 5: ").strip()
                 if not val_str: break
-                try: iv = int(val_str); settings['check_interval_seconds'] = max(5, iv); break
+                try: iv = int(val_str); values['check_interval_seconds'] = max(5, iv); break
                 except ValueError: print(f"{RED}[!] Angka bulat.{RESET}")
-            if val := input(f" 5. Keyword Target [{settings['target_keyword']}]: ").strip(): settings['target_keyword'] = val
-            if val := input(f" 6. Keyword Trigger [{settings['trigger_keyword']}]: ").strip(): settings['trigger_keyword'] = val
+            if val := input(f" 5. Keyword Target [{values['target_keyword']}]: ").strip(): values['target_keyword'] = val
+            if val := input(f" 6. Keyword Trigger [{values['trigger_keyword']}]: ").strip(): values['trigger_keyword'] = val
+            while True:
+                 curr = values['use_imap_idle']
+                 prompt = f"{GREEN}Aktif{RESET}" if curr else f"{YELLOW}Nonaktif{RESET}"
+                 val_str = input(f" 7. Mode Push IDLE? ({prompt}) [y/n]: ").lower().strip()
+                 if not val_str: break
+                 if val_str == 'y': values['use_imap_idle'] = True; break
+                 elif val_str == 'n': values['use_imap_idle'] = False; break
+                 else: print(f"{RED}[!] y/n saja.{RESET}")
 
 
             print(f"\n{YELLOW}--- MP3 Signal (via Termux:API) ---{RESET}")
             while True:
-                 curr = settings['play_mp3_on_signal']
+                 curr = values['play_mp3_on_signal']
                  prompt = f"{GREEN}Aktif{RESET}" if curr else f"{YELLOW}Nonaktif{RESET}"
-                 val_str = input(f" 7. Mainkan MP3? ({prompt}) [y/n]: ").lower().strip()
+                 val_str = input(f" 8. Mainkan MP3? ({prompt}) [y/n]: ").lower().strip()
                  if not val_str: break
-                 if val_str == 'y': settings['play_mp3_on_signal'] = True; break
-                 elif val_str == 'n': settings['play_mp3_on_signal'] = False; break
+                 if val_str == 'y': values['play_mp3_on_signal'] = True; break
+                 elif val_str == 'n': values['play_mp3_on_signal'] = False; break
                  else: print(f"{RED}[!] y/n saja.{RESET}")
 
-            save_settings(settings)
+            settings = save_settings(values)
             print(f"\n{GREEN}{BOLD}[OK] Pengaturan disimpan!{RESET}")
             input(f"{DIM}Tekan Enter untuk kembali...{RESET}")
 
@@ -555,10 +1301,21 @@ def show_settings(settings):
             time.sleep(1.5)
             break
 
+def start_errors(settings):
+    """Daftar alasan listener belum bisa dimulai (kosong = siap)."""
+    errors = []
+    if not settings.email_address or not settings.app_password:
+        errors.append("Email/App Password belum lengkap.")
+    # Validasi Termux:API jika MP3 aktif
+    if settings.play_mp3_on_signal and not shutil.which("termux-media-player"):
+        errors.append("Mode MP3 aktif tapi perintah 'termux-media-player' tidak ditemukan. (Install: pkg install termux-api)")
+    return errors
+
 # --- Fungsi Menu Utama ---
 def main_menu():
     # ... (fungsi sama, update teks MP3) ...
     settings = load_settings()
+    load_inquirer()
 
     while True:
         clear_screen()
@@ -567,14 +1324,15 @@ def main_menu():
         print(f"\n{BOLD}{CYAN} S T A T U S {RESET}")
         print(f"{DIM}─────────────────────────────{RESET}")
 
-        email_ok = bool(settings.get('email_address'))
-        pass_ok = bool(settings.get('app_password'))
+        email_ok = bool(settings.email_address)
+        pass_ok = bool(settings.app_password)
         print(f" {CYAN}Email Listener:{RESET}")
         print(f"   ├─ Config: Email [{GREEN if email_ok else RED}{'✓' if email_ok else 'X'}{RESET}] | App Pass [{GREEN if pass_ok else RED}{'✓' if pass_ok else 'X'}{RESET}]")
-        print(f"   └─ Server: {settings.get('imap_server', '?')}, Interval: {settings.get('check_interval_seconds')}s")
+        listen_mode = "IDLE (push)" if settings.use_imap_idle else f"Interval: {settings.check_interval_seconds}s"
+        print(f"   └─ Server: {settings.imap_server}, {listen_mode}")
 
         print(f" {YELLOW}MP3 Signal (via Termux:API):{RESET}")
-        mp3_active = settings.get("play_mp3_on_signal", True)
+        mp3_active = settings.play_mp3_on_signal
         mp3_status = f"{GREEN}{BOLD}AKTIF{RESET}" if mp3_active else f"{YELLOW}NONAKTIF{RESET}"
         print(f"   ├─ Status  : {mp3_status}")
         termux_api_ok = shutil.which("termux-media-player") is not None
@@ -605,6 +1363,7 @@ def main_menu():
             except Exception as e: print(f"{RED}Menu error: {e}{RESET}"); choice_key = 'exit'
             except KeyboardInterrupt: print(f"\n{YELLOW}Keluar...{RESET}"); choice_key = 'exit'; time.sleep(1)
         else:
+            print(f"\n{DIM}(Library 'inquirer' tidak ada, menu pakai input teks. Install: pip install inquirer){RESET}")
             print(f"\n{menu_prompt}")
             print(f" 1. Mulai Listener")
             print(f" 2. Pengaturan")
@@ -616,14 +1375,8 @@ def main_menu():
 
         if choice_key == 'start':
             print_separator()
-            errors = []
-            if not settings.get('email_address') or not settings.get('app_password'):
-                errors.append("Email/App Password belum lengkap.")
-
-            mp3_active = settings.get("play_mp3_on_signal", True)
-            # Validasi Termux:API jika MP3 aktif
-            if mp3_active and not shutil.which("termux-media-player"):
-                errors.append("Mode MP3 aktif tapi perintah 'termux-media-player' tidak ditemukan. (Install: pkg install termux-api)")
+            errors = start_errors(settings)
+            mp3_active = settings.play_mp3_on_signal
 
             if errors:
                 print(f"\n{BOLD}{RED}--- TIDAK BISA MEMULAI ---{RESET}")
@@ -635,6 +1388,7 @@ def main_menu():
                 mode = "MP3 Mode (via Termux:API)" if mp3_active else "Email Listener Only"
                 print_header(f"Memulai Mode: {mode}")
                 start_listening(settings)
+                settings = load_settings() # config.json mungkin diubah (hot reload) selama listener jalan
                 print(f"\n{YELLOW}[INFO] Kembali ke Menu Utama...{RESET}")
                 time.sleep(2)
 
@@ -650,10 +1404,43 @@ def main_menu():
             print(f"{RED}[!] Pilihan tidak valid.{RESET}")
             time.sleep(1)
 
+# --- Mode Daemon (tanpa menu) ---
+def run_daemon():
+    """Jalankan listener langsung dari config.json, untuk supervisor (Termux:Boot, runit, systemd).
+
+    Tanpa menu, clear screen, tips, maupun jeda tampilan; inquirer tidak di-import.
+    Return kode keluar proses.
+    """
+    global DAEMON_MODE
+    DAEMON_MODE = True
+    if hasattr(signal, 'SIGTERM'): # Stop dari supervisor (SIGTERM) diperlakukan sama dengan Ctrl+C
+        signal.signal(signal.SIGTERM, lambda sig, frame: signal.raise_signal(signal.SIGINT))
+    settings = load_settings()
+    errors = start_errors(settings)
+    if errors:
+        for err in errors: print(f"{RED}[X] {err}{RESET}")
+        print(f"{YELLOW}[!] Perbaiki '{CONFIG_FILE}' (atau lewat menu Pengaturan) lalu jalankan ulang.{RESET}")
+        return 2
+    mode = "MP3 Mode (via Termux:API)" if settings.play_mp3_on_signal else "Email Listener Only"
+    print(f"{CYAN}[i] Mode daemon: {mode}, config '{CONFIG_FILE}'.{RESET}")
+    start_listening(settings)
+    return 0
+
+def parse_args(argv=None):
+    import argparse # Hanya dipakai di entry point
+    parser = argparse.ArgumentParser(description="Exora AI - Email Listener MP3. Tanpa argumen: menu interaktif.")
+    parser.add_argument('command', nargs='?', choices=['menu', 'run'], default='menu',
+                        help="'run' = langsung mendengarkan tanpa menu (mode daemon)")
+    parser.add_argument('--daemon', action='store_true', help="sama dengan perintah 'run'")
+    parser.add_argument('--config', default=CONFIG_FILE, help=f"file konfigurasi (default: {CONFIG_FILE})")
+    return parser.parse_args(argv)
+
 # --- Entry Point ---
 if __name__ == "__main__":
-    if sys.version_info < (3, 6):
-        print("Error: Butuh Python 3.6+"); sys.exit(1)
+    args = parse_args()
+    CONFIG_FILE = args.config
+    if args.daemon or args.command == 'run':
+        sys.exit(run_daemon())
 
     # Beri tahu user soal termux-api jika belum ada
     if not shutil.which("termux-media-player"):
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""Replay & benchmark offline untuk parser sinyal spartan.py.
+
+Memutar ulang korpus email (folder .eml atau file mbox) lewat IMAP palsu
+dan client Binance stub, tanpa akun Gmail/Binance sungguhan. Melaporkan
+pesan/detik per tahap, jumlah alokasi (tracemalloc) dan hasil sinyal per
+email supaya perubahan parser bisa dicek kecepatan & kebenarannya.
+
+Contoh:
+    python bench_replay.py korpus/ --repeat 5
+    python bench_replay.py alerts.mbox --config config.json --expect expect.json
+"""
+import argparse
+import contextlib
+import email
+import io
+import json
+import mailbox
+import os
+import sys
+import time
+import tracemalloc
+
+import spartan
+
+# --- Korpus ---
+def load_corpus(path):
+    """Return [(nama, raw_bytes)] dari folder .eml (urut nama) atau file mbox."""
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith('.eml'))
+        corpus = []
+        for name in names:
+            with open(os.path.join(path, name), 'rb') as f: corpus.append((name, f.read()))
+        return corpus
+    return [(f"{os.path.basename(path)}#{idx}", msg.as_bytes()) for idx, msg in enumerate(mailbox.mbox(path))]
+
+# --- IMAP Palsu ---
+def _imap_string(value):
+    if value is None: return "NIL"
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def build_bodystructure(msg):
+    """BODYSTRUCTURE (RFC 3501) sederhana dari email.message, cukup untuk find_text_plain_part."""
+    if msg.is_multipart():
+        return "(" + "".join(build_bodystructure(part) for part in msg.get_payload()) + f" {_imap_string(msg.get_content_subtype())})"
+    raw = msg.get_payload()
+    raw = raw if isinstance(raw, str) else ""
+    params = f'("charset" {_imap_string(msg.get_content_charset())})' if msg.get_content_charset() else "NIL"
+    encoding = msg.get('Content-Transfer-Encoding', '7bit').strip()
+    lines = f" {raw.count(chr(10))}" if msg.get_content_maintype() == 'text' else ""
+    disposition = msg.get_content_disposition()
+    disposition = f"({_imap_string(disposition)} NIL)" if disposition else "NIL"
+    return (f"({_imap_string(msg.get_content_maintype())} {_imap_string(msg.get_content_subtype())} {params} NIL NIL "
+            f"{_imap_string(encoding)} {len(raw.encode('utf-8', 'surrogateescape'))}{lines} NIL {disposition} NIL)")
+
+def body_section(msg, section):
+    """Isi mentah (masih ter-encode transfer) dari section MIME, mis. '1.2'."""
+    part = msg
+    for idx in section.split('.'):
+        if not part.is_multipart(): break
+        part = part.get_payload()[int(idx) - 1]
+    raw = part.get_payload()
+    return raw.encode('utf-8', 'surrogateescape') if isinstance(raw, str) else b""
+
+class ReplayIMAP:
+    """Objek pengganti imaplib.IMAP4 untuk UID FETCH/STORE atas korpus di memori."""
+    HEADER_FIELDS = ('Subject', 'From', 'Date', 'Received', 'Message-ID')
+
+    def __init__(self, corpus):
+        self.raw = {str(idx).encode(): raw for idx, (_, raw) in enumerate(corpus, 1)}
+        self.messages = {uid: email.message_from_bytes(raw) for uid, raw in self.raw.items()}
+        self.commands = 0
+
+    def _uids(self, message_set):
+        uids = []
+        for part in message_set.split(','):
+            start, _, end = part.partition(':')
+            uids += [str(i).encode() for i in range(int(start), int(end or start) + 1)]
+        return [uid for uid in uids if uid in self.messages]
+
+    def _fetch_one(self, uid, items):
+        msg = self.messages[uid]
+        if items == "(RFC822)":
+            return f"UID {uid.decode()} RFC822".encode(), self.raw[uid]
+        if items.startswith("(BODYSTRUCTURE"):
+            header = "".join(f"{name}: {value}\r\n" for name in self.HEADER_FIELDS for value in (msg.get_all(name) or []))
+            header = header.encode('utf-8', 'surrogateescape') + b"\r\n"
+            return f"UID {uid.decode()} BODYSTRUCTURE {build_bodystructure(msg)} BODY[HEADER.FIELDS (SUBJECT FROM DATE RECEIVED MESSAGE-ID)]".encode(), header
+        spec = items.strip("()")
+        section = spec[len("BODY.PEEK["):spec.index("]")]
+        data = body_section(msg, section)
+        if "<0." in spec: data = data[:int(spec[spec.index("<0.") + 3:-1])]
+        return f"UID {uid.decode()} BODY[{section}]".encode(), data
+
+    def uid(self, command, *args):
+        self.commands += 1
+        if command == 'FETCH':
+            data = []
+            for seq, uid in enumerate(self._uids(args[0]), 1):
+                head, literal = self._fetch_one(uid, args[1])
+                data += [(str(seq).encode() + b" (" + head + b" {%d}" % len(literal), literal), b")"]
+            return 'OK', data
+        if command == 'STORE': return 'OK', []
+        if command == 'SEARCH': return 'OK', [b" ".join(self.messages)]
+        return 'NO', [b"unsupported"]
+
+# --- Client Binance Stub ---
+class StubBinanceClient:
+    """Meniru create_order python-binance (MARKET langsung FILLED), tanpa jaringan."""
+    def __init__(self, price=60000.0):
+        self.price = price
+        self.orders = []
+        self.timestamp_offset = 0
+
+    def create_order(self, **params):
+        self.orders.append(params)
+        quote = float(params.get('quoteOrderQty') or float(params.get('quantity', 0)) * self.price)
+        return {'orderId': len(self.orders), 'status': 'FILLED', 'transactTime': int(time.time() * 1000),
+                'executedQty': f"{quote / self.price:.8f}", 'cummulativeQuoteQty': f"{quote:.8f}"}
+
+# --- Tahap Benchmark ---
+def stage_full_parse(corpus, rule_set):
+    """Parse RFC822 penuh: decode_mime_words + get_text_from_email + parser aturan."""
+    decisions = {}
+    for uid, (_, raw) in enumerate(corpus, 1):
+        msg = email.message_from_bytes(raw)
+        subject = spartan.decode_mime_words(msg["Subject"])
+        spartan.decode_mime_words(msg["From"])
+        body = spartan.get_text_from_email(msg)
+        decisions[str(uid)] = [(m[0].name, m[2]) for m in rule_set.match(subject.lower() + " " + body) if m[1] == 'ok']
+    return decisions
+
+def stage_rule_match(texts, rule_set):
+    """Parser aturan saja, atas teks yang sudah di-decode."""
+    for text in texts: rule_set.match(text)
+
+def stage_process_batch(corpus, settings, rule_set, client, batch_size):
+    """Jalur listener lengkap: process_email_batch atas IMAP palsu (header, body parsial, STORE)."""
+    mail = ReplayIMAP(corpus)
+    if client is not None: client.orders.clear()
+    spartan.SIGNAL_COALESCER = spartan.SignalCoalescer() # Jendela dedupe mulai kosong tiap run
+    uids = list(mail.messages)
+    decisions = {uid.decode(): [] for uid in uids}
+    original_emit = spartan.EVENTS.emit
+    def capture(event, **fields):
+        if event == 'rule_matched': decisions[fields['uid']].append((fields['rule'], fields['action']))
+        return original_emit(event, **fields)
+    spartan.EVENTS.emit = capture
+    try:
+        for start in range(0, len(uids), batch_size):
+            spartan.process_email_batch(mail, uids[start:start + batch_size], settings, client, None, None, rule_set)
+    finally:
+        spartan.EVENTS.emit = original_emit
+    return decisions, mail.commands
+
+def timed(func, repeat):
+    """Jalankan func repeat kali (stdout dibuang). Return (hasil terakhir, detik terbaik)."""
+    best, result = None, None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def measure_allocations(func):
+    """(jumlah blok dialokasikan & masih hidup, puncak KB) satu kali jalan func, via tracemalloc."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        func()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename') if stat.count_diff > 0)
+    return blocks, peak / 1024
+
+def load_bench_settings(config_path, execute):
+    loaded = {}
+    if config_path:
+        with open(config_path, 'r') as f: loaded = json.load(f)
+    return spartan.Settings.from_dict(dict(loaded, execute_binance_orders=execute, event_log_file="",
+                                           signal_net_seconds=0)) # Netting memakai timer, tidak cocok untuk replay sinkron
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay korpus email lewat parser sinyal spartan.py (tanpa jaringan).")
+    parser.add_argument("corpus", help="Folder berisi file .eml atau file mbox")
+    parser.add_argument("--config", help="config.json untuk keyword/aturan (default: DEFAULT_SETTINGS)")
+    parser.add_argument("--repeat", type=int, default=3, help="Ulangi tiap tahap N kali, ambil waktu terbaik")
+    parser.add_argument("--batch", type=int, default=50, help="Ukuran batch UID untuk process_email_batch")
+    parser.add_argument("--execute", action="store_true", help="Kirim order ke client Binance stub")
+    parser.add_argument("--expect", help="JSON {nama_file: 'buy'|'sell'|null} untuk cek kebenaran")
+    args = parser.parse_args()
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print(f"{spartan.RED}[X] Korpus '{args.corpus}' kosong.{spartan.RESET}")
+        return 1
+    settings = load_bench_settings(args.config, args.execute)
+    rule_set = spartan.compile_signal_rules(settings)
+    client = StubBinanceClient() if args.execute else None
+    spartan.EVENTS.quiet = True
+    spartan.trigger_beep = lambda action: None # Beep asli memanggil proses 'beep' + sleep, bukan bagian yang diukur
+
+    texts = []
+    for _, raw in corpus:
+        msg = email.message_from_bytes(raw)
+        texts.append(spartan.decode_mime_words(msg["Subject"]).lower() + " " + spartan.get_text_from_email(msg))
+
+    stages = [
+        ("full_parse", "RFC822 + decode + aturan", lambda: stage_full_parse(corpus, rule_set)),
+        ("rule_match", "parser aturan saja", lambda: stage_rule_match(texts, rule_set)),
+        ("process_batch", "process_email_batch (IMAP palsu)", lambda: stage_process_batch(corpus, settings, rule_set, client, args.batch)),
+    ]
+    n = len(corpus)
+    spartan.print_header(f"Replay {n} email x{args.repeat}")
+    results = {}
+    for name, desc, func in stages:
+        results[name], seconds = timed(func, args.repeat)
+        blocks, peak_kb = measure_allocations(func)
+        print(f" {spartan.CYAN}{name:<14}{spartan.RESET} {desc:<34} {n / seconds:>10.0f} msg/s "
+              f"{spartan.DIM}| {seconds / n * 1e6:>8.1f} µs/msg | blok hidup {blocks:>7} | puncak {peak_kb:>8.1f} KB{spartan.RESET}")
+
+    full_decisions = results["full_parse"]
+    batch_decisions, imap_commands = results["process_batch"]
+    print(f" {spartan.DIM}IMAP command per batch-run: {imap_commands} | order stub per run: {len(client.orders) if client else 0}{spartan.RESET}")
+
+    # Kebenaran: jalur header/body parsial harus memutuskan sama dengan parse penuh
+    mismatches = 0
+    for uid, (name, _) in enumerate(corpus, 1):
+        full_actions = sorted(full_decisions.get(str(uid), []))
+        batch_actions = sorted(batch_decisions.get(str(uid), []))
+        if full_actions != batch_actions:
+            mismatches += 1
+            print(f" {spartan.YELLOW}[?] {name}: parse penuh {full_actions} vs listener {batch_actions}{spartan.RESET}")
+
+    if args.expect:
+        with open(args.expect, 'r') as f: expected = json.load(f)
+        for uid, (name, _) in enumerate(corpus, 1):
+            if name not in expected: continue
+            actions = [action for _, action in batch_decisions.get(str(uid), [])]
+            want = [expected[name]] if expected[name] else []
+            if actions[:1] != want:
+                mismatches += 1
+                print(f" {spartan.RED}[X] {name}: diharapkan {want or 'tanpa sinyal'}, didapat {actions or 'tanpa sinyal'}{spartan.RESET}")
+
+    signals = sum(1 for actions in batch_decisions.values() if actions)
+    color = spartan.GREEN if not mismatches else spartan.RED
+    print(f"\n{color}{spartan.BOLD}[{'OK' if not mismatches else 'X'}] {signals}/{n} email bersinyal, {mismatches} selisih.{spartan.RESET}")
+    return 1 if mismatches else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+"""Server REST Binance stub lokal untuk uji throughput & latensi jalur order spartan.py.
+
+Meniru endpoint yang dipakai spartan: ping, time, exchangeInfo, avgPrice dan
+order (MARKET). Order divalidasi seperti bursa: timestamp/recvWindow (-1021),
+presisi & LOT_SIZE (-1111/-1013), NOTIONAL (-1013) dan saldo (-2010). Batas
+weight per menit & jumlah order per 10 detik dikirim lewat header
+X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-10S; pelanggaran dibalas 429, dan
+pelanggaran berulang selama Retry-After dibalas 418 (IP ban sementara).
+Seperti Binance, penghitung memakai jendela tetap (reset tiap menit / 10 detik).
+
+Arahkan spartan ke stub dengan "binance_api_url": "http://127.0.0.1:8765/api".
+
+Contoh:
+    python binance_stub_server.py --port 8765 --latency 20 --jitter 10
+    python binance_stub_server.py --bench 500 --concurrency 4 --latency 5 --error-rate 0.02
+"""
+import argparse
+import contextlib
+import hashlib
+import hmac
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal, ROUND_DOWN
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+GREEN, YELLOW, RED, CYAN, DIM, BOLD, RESET = "\033[92m", "\033[93m", "\033[91m", "\033[96m", "\033[2m", "\033[1m", "\033[0m"
+ERROR_MESSAGES = {
+    -1003: "Too many requests; current limit is exceeded.",
+    -1013: "Filter failure: NOTIONAL",
+    -1021: "Timestamp for this request is outside of the recvWindow.",
+    -1022: "Signature for this request is not valid.",
+    -1111: "Parameter 'quantity' has too much precision.",
+    -1121: "Invalid symbol.",
+    -2010: "Account has insufficient balance for requested action.",
+}
+REQUEST_WEIGHTS = {'ping': 1, 'time': 1, 'exchangeInfo': 20, 'avgPrice': 2, 'order': 1}
+
+# --- Data Pasar ---
+def symbol_info(symbol, base, quote):
+    """Entri exchangeInfo dengan filter spot yang realistis (mirip BTCUSDT)."""
+    return {
+        'symbol': symbol, 'status': 'TRADING', 'baseAsset': base, 'baseAssetPrecision': 8,
+        'quoteAsset': quote, 'quotePrecision': 8, 'quoteAssetPrecision': 8,
+        'orderTypes': ['LIMIT', 'MARKET'], 'quoteOrderQtyMarketAllowed': True,
+        'filters': [
+            {'filterType': 'PRICE_FILTER', 'minPrice': '0.01000000', 'maxPrice': '1000000.00000000', 'tickSize': '0.01000000'},
+            {'filterType': 'LOT_SIZE', 'minQty': '0.00001000', 'maxQty': '9000.00000000', 'stepSize': '0.00001000'},
+            {'filterType': 'MARKET_LOT_SIZE', 'minQty': '0.00000000', 'maxQty': '100.00000000', 'stepSize': '0.00000000'},
+            {'filterType': 'NOTIONAL', 'minNotional': '5.00000000', 'applyMinToMarket': True,
+             'maxNotional': '9000000.00000000', 'applyMaxToMarket': False, 'avgPriceMins': 5},
+        ],
+    }
+
+class StubExchange:
+    """State bursa stub: harga, saldo, batas rate & statistik. Aman lintas thread."""
+    def __init__(self, price=60000.0, balances=None, api_secret=None, clock_skew_ms=0,
+                 weight_limit=6000, order_limit=50, ban_after=3, ban_seconds=60, error_rate=0.0, error_codes=(-2010, -1013, -1111)):
+        self.lock = threading.Lock()
+        self.price = Decimal(str(price))
+        self.symbols = {'BTCUSDT': symbol_info('BTCUSDT', 'BTC', 'USDT')}
+        self.balances = {asset: Decimal(str(amount)) for asset, amount in (balances or {'USDT': 1e9, 'BTC': 1e6}).items()}
+        self.api_secret = api_secret
+        self.clock_skew_ms = clock_skew_ms
+        self.weight_limit = weight_limit
+        self.order_limit = order_limit
+        self.ban_after = ban_after
+        self.ban_seconds = ban_seconds
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.weight_window = (None, 0) # (indeks menit, weight terpakai), jendela tetap seperti Binance
+        self.order_window = (None, 0) # (indeks 10 detik, jumlah order)
+        self.violations = 0
+        self.banned_until = 0.0
+        self.next_order_id = 1
+        self.stats = {'requests': 0, 'orders': 0, 'filled': 0}
+        self.status_counts = {}
+        self.error_counts = {}
+
+    def server_time(self):
+        return int(time.time() * 1000 + self.clock_skew_ms)
+
+    def rate_limits(self):
+        return [{'rateLimitType': 'REQUEST_WEIGHT', 'interval': 'MINUTE', 'intervalNum': 1, 'limit': self.weight_limit},
+                {'rateLimitType': 'ORDERS', 'interval': 'SECOND', 'intervalNum': 10, 'limit': self.order_limit}]
+
+    def count(self, status, code=None):
+        with self.lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            if code is not None: self.error_counts[code] = self.error_counts.get(code, 0) + 1
+
+    def admit(self, endpoint):
+        """Catat weight request. Return (status, retry_after, used_weight, order_count); status None = lolos."""
+        now = self.server_time() / 1000
+        minute, ten_seconds = int(now // 60), int(now // 10)
+        with self.lock:
+            self.stats['requests'] += 1
+            if self.weight_window[0] != minute: self.weight_window = (minute, 0)
+            if self.order_window[0] != ten_seconds: self.order_window = (ten_seconds, 0)
+            if now < self.banned_until:
+                return 418, int(self.banned_until - now) + 1, self.weight_window[1], self.order_window[1]
+            used = self.weight_window[1] + REQUEST_WEIGHTS.get(endpoint, 1)
+            orders = self.order_window[1] + (endpoint == 'order')
+            self.weight_window, self.order_window = (minute, used), (ten_seconds, orders)
+            if used > self.weight_limit or (endpoint == 'order' and orders > self.order_limit):
+                self.violations += 1
+                if self.violations > self.ban_after: # Terus menembak setelah 429 -> IP ban
+                    self.banned_until = now + self.ban_seconds
+                    return 418, self.ban_seconds, used, orders
+                window_end = (minute + 1) * 60 if used > self.weight_limit else (ten_seconds + 1) * 10
+                return 429, max(1, int(window_end - now + 0.999)), used, orders
+            self.violations = 0
+            return None, 0, used, orders
+
+    def check_signature(self, params, raw_query):
+        if not self.api_secret: return True
+        signature = params.get('signature', '')
+        payload = raw_query.rsplit('&signature=', 1)[0]
+        expected = hmac.new(self.api_secret.encode(), payload.encode(), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(signature, expected)
+
+    def place_order(self, params):
+        """Validasi & isi order MARKET. Return (http_status, body)."""
+        symbol = params.get('symbol', '').upper()
+        info = self.symbols.get(symbol)
+        if not info: return 400, {'code': -1121, 'msg': ERROR_MESSAGES[-1121]}
+        timestamp = int(params.get('timestamp', 0))
+        recv_window = int(params.get('recvWindow', 5000))
+        server_now = self.server_time()
+        if timestamp - server_now > 1000 or server_now - timestamp > recv_window:
+            return 400, {'code': -1021, 'msg': ERROR_MESSAGES[-1021]}
+        if self.error_rate and random.random() < self.error_rate:
+            code = random.choice(self.error_codes)
+            return 400, {'code': code, 'msg': ERROR_MESSAGES.get(code, "Injected error.")}
+
+        filters = {f['filterType']: f for f in info['filters']}
+        step = Decimal(filters['LOT_SIZE']['stepSize'])
+        min_qty = Decimal(filters['LOT_SIZE']['minQty'])
+        min_notional = Decimal(filters['NOTIONAL']['minNotional'])
+        side = params.get('side', '').upper()
+        try:
+            if 'quoteOrderQty' in params:
+                quote_qty = Decimal(params['quoteOrderQty'])
+                if -quote_qty.as_tuple().exponent > info['quotePrecision']:
+                    return 400, {'code': -1111, 'msg': "Parameter 'quoteOrderQty' has too much precision."}
+                qty = (quote_qty / self.price).quantize(step, rounding=ROUND_DOWN)
+            else:
+                qty = Decimal(params['quantity'])
+                if qty % step:
+                    return 400, {'code': -1111, 'msg': ERROR_MESSAGES[-1111]}
+        except (KeyError, ArithmeticError, ValueError):
+            return 400, {'code': -1102, 'msg': "Mandatory parameter 'quantity' was not sent, was empty/null, or malformed."}
+        if qty < min_qty: return 400, {'code': -1013, 'msg': "Filter failure: LOT_SIZE"}
+        quote = (qty * self.price).quantize(Decimal('0.00000001'), rounding=ROUND_DOWN)
+        if quote < min_notional: return 400, {'code': -1013, 'msg': ERROR_MESSAGES[-1013]}
+
+        base_asset, quote_asset = info['baseAsset'], info['quoteAsset']
+        with self.lock:
+            self.stats['orders'] += 1
+            spend_asset, spend = (quote_asset, quote) if side == 'BUY' else (base_asset, qty)
+            if self.balances.get(spend_asset, Decimal(0)) < spend:
+                return 400, {'code': -2010, 'msg': ERROR_MESSAGES[-2010]}
+            self.balances[spend_asset] -= spend
+            gain_asset, gain = (base_asset, qty) if side == 'BUY' else (quote_asset, quote)
+            self.balances[gain_asset] = self.balances.get(gain_asset, Decimal(0)) + gain
+            order_id = self.next_order_id
+            self.next_order_id += 1
+            self.stats['filled'] += 1
+        return 200, {
+            'symbol': symbol, 'orderId': order_id, 'orderListId': -1, 'clientOrderId': params.get('newClientOrderId', f"stub{order_id}"),
+            'transactTime': self.server_time(), 'price': '0.00000000', 'origQty': f"{qty:.8f}", 'executedQty': f"{qty:.8f}",
+            'cummulativeQuoteQty': f"{quote:.8f}", 'status': 'FILLED', 'timeInForce': 'GTC', 'type': 'MARKET', 'side': side,
+            'fills': [{'price': f"{self.price:.8f}", 'qty': f"{qty:.8f}", 'commission': '0.00000000', 'commissionAsset': base_asset, 'tradeId': order_id}],
+        }
+
+# --- Handler HTTP ---
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # Keep-alive, supaya adapter pooled spartan ikut teruji
+    disable_nagle_algorithm = True # Header & body ditulis terpisah; tanpa ini delayed ACK menambah ~40 ms
+    exchange = None
+    latency = 0.0
+    jitter = 0.0
+
+    def log_message(self, format, *args): pass
+
+    def _send(self, status, body, used=None, orders=None, retry_after=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json;charset=UTF-8')
+        self.send_header('Content-Length', str(len(data)))
+        if used is not None: self.send_header('X-MBX-USED-WEIGHT-1M', str(used))
+        if orders is not None: self.send_header('X-MBX-ORDER-COUNT-10S', str(orders))
+        if retry_after: self.send_header('Retry-After', str(retry_after))
+        self.end_headers()
+        self.wfile.write(data)
+        self.exchange.count(status, body.get('code') if isinstance(body, dict) and status >= 400 else None)
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        raw_query = url.query
+        if method == 'POST':
+            length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(length).decode() if length else ""
+            raw_query = "&".join(q for q in (raw_query, body) if q)
+        params = dict(parse_qsl(raw_query, keep_blank_values=True))
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        if self.latency or self.jitter:
+            time.sleep(self.latency + (random.expovariate(1 / self.jitter) if self.jitter else 0))
+
+        known = {('GET', 'ping'), ('GET', 'time'), ('GET', 'exchangeInfo'), ('GET', 'avgPrice'), ('POST', 'order')}
+        if (method, endpoint) not in known:
+            return self._send(404, {'code': -1000, 'msg': f"Endpoint {method} {url.path} tidak ada di stub."})
+        status, retry_after, used, orders = self.exchange.admit(endpoint)
+        if status == 418:
+            return self._send(418, {'code': -1003, 'msg': f"Way too many requests; IP banned for {retry_after}s."}, used, orders, retry_after)
+        if status == 429:
+            return self._send(429, {'code': -1003, 'msg': ERROR_MESSAGES[-1003]}, used, orders, retry_after)
+
+        if endpoint == 'ping': return self._send(200, {}, used)
+        if endpoint == 'time': return self._send(200, {'serverTime': self.exchange.server_time()}, used)
+        if endpoint == 'avgPrice': return self._send(200, {'mins': 5, 'price': f"{self.exchange.price:.8f}"}, used)
+        if endpoint == 'exchangeInfo':
+            symbol = params.get('symbol', '').upper()
+            if symbol and symbol not in self.exchange.symbols: return self._send(400, {'code': -1121, 'msg': ERROR_MESSAGES[-1121]}, used)
+            symbols = [self.exchange.symbols[symbol]] if symbol else list(self.exchange.symbols.values())
+            return self._send(200, {'timezone': 'UTC', 'serverTime': self.exchange.server_time(), 'rateLimits': self.exchange.rate_limits(),
+                                    'symbols': symbols}, used)
+        if not self.exchange.check_signature(params, raw_query):
+            return self._send(400, {'code': -1022, 'msg': ERROR_MESSAGES[-1022]}, used, orders)
+        status, body = self.exchange.place_order(params)
+        return self._send(status, body, used, orders)
+
+    def do_GET(self): self._handle('GET')
+    def do_POST(self): self._handle('POST')
+
+def start_server(exchange, host="127.0.0.1", port=0, latency=0.0, jitter=0.0):
+    """Jalankan stub di thread background. Return (server, port)."""
+    handler = type("BoundStubHandler", (StubHandler,), {'exchange': exchange, 'latency': latency, 'jitter': jitter})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="binance-stub", daemon=True).start()
+    return server, server.server_address[1]
+
+# --- Benchmark Jalur Order ---
+def run_bench(exchange, args):
+    """Kirim args.bench order lewat execute_binance_order spartan ke stub, ukur order/detik & latensi ekor."""
+    import spartan # Import di sini agar mode server saja tidak butuh dependensi spartan
+    server, port = start_server(exchange, latency=args.latency / 1000, jitter=args.jitter / 1000)
+    settings = spartan.Settings(binance_api_key="stub-key", binance_api_secret=args.api_secret or "stub-secret",
+                                binance_api_url=f"http://127.0.0.1:{port}/api", execute_binance_orders=True, trading_pair="BTCUSDT",
+                                buy_quote_quantity=args.quote_qty, sell_base_quantity=args.base_qty, binance_pool_size=max(4, args.concurrency),
+                                event_log_file="", quiet_console=True)
+    spartan.SYMBOL_FILTERS = spartan.SymbolFilterCache(os.path.join(tempfile.mkdtemp(prefix="binance-stub-"), "symbol_filters.json"))
+    spartan.EVENTS.quiet = True
+    sides = {'buy': ['BUY'], 'sell': ['SELL'], 'mix': ['BUY', 'SELL']}[args.side]
+
+    latencies, results = [], []
+    lock = threading.Lock()
+    next_idx = iter(range(args.bench))
+    def worker(client):
+        while True:
+            with lock: idx = next(next_idx, None)
+            if idx is None: return
+            trace = {}
+            ok = spartan.execute_binance_order(client, settings, sides[idx % len(sides)], trace=trace)
+            with lock:
+                results.append(ok)
+                if trace.get('order_ack'): latencies.append((trace['order_ack'] - trace['order_sent']) * 1000)
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        session = spartan.BinanceSession(settings)
+        client = session.connect()
+        if client:
+            threads = [threading.Thread(target=worker, args=(client,)) for _ in range(args.concurrency)]
+            started = time.perf_counter()
+            for thread in threads: thread.start()
+            for thread in threads: thread.join()
+            elapsed = time.perf_counter() - started
+    server.shutdown()
+    if not client:
+        print(f"{RED}[X] Client spartan gagal terhubung ke stub:{RESET}\n{log.getvalue()}")
+        return 1
+
+    latencies.sort()
+    ok_count = sum(results)
+    print(f"{BOLD}Benchmark jalur order -> Binance stub{RESET} {DIM}({args.bench} order, {args.concurrency} thread, "
+          f"latensi {args.latency}+exp({args.jitter}) ms){RESET}")
+    print(f" {CYAN}Throughput{RESET} : {len(results) / elapsed:8.1f} order/s {DIM}({elapsed:.2f} s, {ok_count} FILLED, {len(results) - ok_count} gagal/ditolak){RESET}")
+    if latencies:
+        pct = {p: spartan.percentile(latencies, p) for p in (50, 95, 99)}
+        print(f" {CYAN}Latensi{RESET}    : {DIM}(FILLED){RESET} p50 {pct[50]:7.1f} | p95 {pct[95]:7.1f} | p99 {pct[99]:7.1f} | maks {latencies[-1]:7.1f} ms")
+    print(f" {CYAN}Koneksi{RESET}    : {session.stats.summary()}")
+    print(f" {CYAN}Penjadwal{RESET}  : {spartan.BINANCE_RATE_LIMITER.summary()}")
+    print(f" {CYAN}HTTP{RESET}       : {DIM}{dict(sorted(exchange.status_counts.items()))} | kode error {dict(sorted(exchange.error_counts.items()))}{RESET}")
+    if args.verbose: print(log.getvalue())
+    return 0
+
+def main():
+    parser = argparse.ArgumentParser(description="Server REST Binance stub untuk uji jalur order spartan.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latensi dasar per request (ms)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Rata-rata tambahan latensi eksponensial (ms), untuk ekor")
+    parser.add_argument("--price", type=float, default=60000.0, help="Harga BTCUSDT")
+    parser.add_argument("--usdt", type=float, default=1e9, help="Saldo USDT awal")
+    parser.add_argument("--btc", type=float, default=1e6, help="Saldo BTC awal")
+    parser.add_argument("--api-secret", help="Verifikasi signature HMAC dengan secret ini (default: tidak dicek)")
+    parser.add_argument("--clock-skew", type=float, default=0.0, help="Geser jam server (ms), untuk uji -1021")
+    parser.add_argument("--weight-limit", type=int, default=6000, help="Batas weight per menit (429 jika lewat)")
+    parser.add_argument("--order-limit", type=int, default=50, help="Batas order per 10 detik (429 jika lewat)")
+    parser.add_argument("--ban-after", type=int, default=3, help="Jumlah 429 beruntun sebelum 418")
+    parser.add_argument("--ban-seconds", type=int, default=60, help="Lama ban 418 (detik)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Peluang order dibalas error acak (0-1)")
+    parser.add_argument("--error-codes", default="-2010,-1013,-1111", help="Kode error untuk --error-rate")
+    parser.add_argument("--seed", type=int, help="Seed random untuk latensi & error")
+    parser.add_argument("--bench", type=int, help="Mode benchmark: jumlah order yang dikirim lewat spartan")
+    parser.add_argument("--concurrency", type=int, default=1, help="Benchmark: jumlah thread pengirim order")
+    parser.add_argument("--side", choices=("buy", "sell", "mix"), default="buy", help="Benchmark: sisi order")
+    parser.add_argument("--quote-qty", type=float, default=11.0, help="Benchmark: buy_quote_quantity (USDT)")
+    parser.add_argument("--base-qty", type=float, default=0.001, help="Benchmark: sell_base_quantity (BTC)")
+    parser.add_argument("--verbose", action="store_true", help="Benchmark: tampilkan log spartan")
+    args = parser.parse_args()
+    if args.seed is not None: random.seed(args.seed)
+
+    exchange = StubExchange(price=args.price, balances={'USDT': args.usdt, 'BTC': args.btc}, api_secret=args.api_secret,
+                            clock_skew_ms=args.clock_skew, weight_limit=args.weight_limit, order_limit=args.order_limit,
+                            ban_after=args.ban_after, ban_seconds=args.ban_seconds, error_rate=args.error_rate,
+                            error_codes=[int(c) for c in args.error_codes.split(',') if c.strip()])
+    if args.bench:
+        if args.order_limit == parser.get_default('order_limit'): exchange.order_limit = max(args.order_limit, args.bench) # Benchmark murni, kecuali batas diatur
+        return run_bench(exchange, args)
+
+    server, port = start_server(exchange, args.host, args.port, args.latency / 1000, args.jitter / 1000)
+    print(f"{GREEN}[OK] Binance stub di http://{args.host}:{port}/api{RESET} {DIM}(set binance_api_url ke alamat ini){RESET}")
+    try:
+        while True: time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n{YELLOW}[!] Berhenti.{RESET} {DIM}{exchange.stats} | HTTP {exchange.status_counts}{RESET}")
+    server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,573 @@
+# -*- coding: utf-8 -*-
+"""Server IMAP stub lokal (asyncio) untuk uji beban listener spartan.py.
+
+Mendukung subset IMAP4rev1 yang dipakai listener: CAPABILITY, LOGIN, SELECT,
+NOOP, (UID) SEARCH, (UID) FETCH, (UID) STORE, IDLE, CLOSE, LOGOUT. Semua
+plaintext, jadi arahkan listener dengan "imap_use_ssl": false dan
+"imap_port" ke port stub ini.
+
+Knob: latensi per perintah, peluang koneksi diputus, dan burst email.
+
+Contoh:
+    python imap_stub_server.py --port 1143 --burst 100 --burst-interval 10
+    python imap_stub_server.py --scenario 1,100,10000 --latency 5
+    python imap_stub_server.py --scenario 100 --engine asyncio
+    python imap_stub_server.py --scenario 100 --noise 9 --search-from tradingview
+    python imap_stub_server.py --reconnect-check
+"""
+import argparse
+import asyncio
+import contextlib
+import email
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import types
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+
+GREEN, YELLOW, RED, CYAN, DIM, BOLD, RESET = "\033[92m", "\033[93m", "\033[91m", "\033[96m", "\033[2m", "\033[1m", "\033[0m"
+CAPABILITIES = "IMAP4rev1 IDLE UIDPLUS"
+ARG_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|(\S+)')
+SEARCH_TOKEN_RE = re.compile(r'"((?:[^"\\]|\\.)*)"|([^\s()"]+)')
+FETCH_ITEM_RE = re.compile(r'BODY(?:\.PEEK)?\[[^\]]*\](?:<\d+\.\d+>)?|RFC822(?:\.HEADER|\.SIZE)?|[A-Z0-9.]+', re.IGNORECASE)
+
+# --- Pesan & BODYSTRUCTURE ---
+def make_message(idx, subject="Exora AI order BUY", body="Exora AI order buy BTCUSDT"):
+    """Email sinyal sintetis (bytes) dengan nomor urut di Subjek."""
+    msg = MIMEText(f"{body}\n#{idx}\n", 'plain', 'utf-8')
+    msg['Subject'] = f"{subject} #{idx}"
+    msg['From'] = "TradingView <noreply@tradingview.com>"
+    msg['Date'] = formatdate(localtime=True)
+    msg['Message-ID'] = make_msgid(f"stub{idx}", domain="imap-stub.local")
+    msg['Received'] = f"from stub by imap-stub; {formatdate(localtime=True)}"
+    return msg.as_bytes()
+
+def make_noise_message(idx, paragraphs=200):
+    """Email non-sinyal (newsletter) yang harus diabaikan listener."""
+    msg = MIMEText("Weekly market newsletter, nothing to trade here.\n" * paragraphs, 'plain', 'utf-8')
+    msg['Subject'] = f"Weekly newsletter #{idx}"
+    msg['From'] = "Market News <news@example.com>"
+    msg['Date'] = formatdate(localtime=True)
+    msg['Message-ID'] = make_msgid(f"noise{idx}", domain="imap-stub.local")
+    return msg.as_bytes()
+
+def _imap_string(value):
+    if value is None: return "NIL"
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def build_bodystructure(msg):
+    """BODYSTRUCTURE (RFC 3501) dari email.message, tanpa field ekstensi yang jarang dipakai."""
+    if msg.is_multipart():
+        return "(" + "".join(build_bodystructure(part) for part in msg.get_payload()) + f" {_imap_string(msg.get_content_subtype())})"
+    raw = msg.get_payload()
+    raw = raw if isinstance(raw, str) else ""
+    params = f'("charset" {_imap_string(msg.get_content_charset())})' if msg.get_content_charset() else "NIL"
+    encoding = msg.get('Content-Transfer-Encoding', '7bit').strip()
+    lines = f" {raw.count(chr(10))}" if msg.get_content_maintype() == 'text' else ""
+    disposition = msg.get_content_disposition()
+    disposition = f"({_imap_string(disposition)} NIL)" if disposition else "NIL"
+    return (f"({_imap_string(msg.get_content_maintype())} {_imap_string(msg.get_content_subtype())} {params} NIL NIL "
+            f"{_imap_string(encoding)} {len(raw.encode('utf-8', 'surrogateescape'))}{lines} NIL {disposition} NIL)")
+
+def body_section(msg, section):
+    """Isi mentah section MIME ('1', '1.2', 'TEXT', '' = seluruh pesan)."""
+    if section == "": return msg.as_bytes()
+    if section.upper() == "TEXT":
+        raw = msg.as_bytes()
+        return raw[raw.find(b"\n\n") + 2:] if b"\n\n" in raw else b""
+    part = msg
+    for idx in section.split('.'):
+        if not part.is_multipart(): break
+        part = part.get_payload()[int(idx) - 1]
+    raw = part.get_payload()
+    return raw.encode('utf-8', 'surrogateescape') if isinstance(raw, str) else b""
+
+def header_fields(msg, names):
+    """Header yang diminta, urutan & penulisan nama asli (seperti BODY[HEADER.FIELDS (...)] server sungguhan)."""
+    wanted = {name.lower() for name in names}
+    text = "".join(f"{name}: {value}\r\n" for name, value in msg.items() if name.lower() in wanted)
+    return text.encode('utf-8', 'surrogateescape') + b"\r\n"
+
+# --- Mailbox ---
+class StubMessage:
+    __slots__ = ("uid", "raw", "msg", "flags", "added_at", "fetched_at", "seen_at")
+
+    def __init__(self, uid, raw):
+        self.uid = uid
+        self.raw = raw
+        self.msg = email.message_from_bytes(raw)
+        self.flags = set()
+        self.added_at = time.time()
+        self.fetched_at = None # FETCH pertama (= listener mendeteksi email)
+        self.seen_at = None # STORE \Seen (= listener selesai memproses)
+
+class StubMailbox:
+    """Satu folder INBOX di memori. Semua method dipanggil dari thread event loop."""
+    def __init__(self, uidvalidity=None):
+        self.uidvalidity = uidvalidity or int(time.time())
+        self.messages = []
+        self.by_uid = {}
+        self.idlers = set() # Sesi yang sedang IDLE
+
+    def add_many(self, raws):
+        """Tambah email sekaligus lalu kirim satu '* N EXISTS' ke sesi IDLE."""
+        next_uid = self.messages[-1].uid + 1 if self.messages else 1
+        for offset, raw in enumerate(raws):
+            message = StubMessage(next_uid + offset, raw)
+            self.messages.append(message)
+            self.by_uid[message.uid] = message
+        for session in list(self.idlers): session.report_exists()
+
+    def resolve(self, message_set, by_uid):
+        """Daftar (seq, StubMessage) untuk message set IMAP ('1:5,7', '3:*')."""
+        if not self.messages: return []
+        highest = self.messages[-1].uid if by_uid else len(self.messages)
+        wanted = []
+        for part in message_set.split(','):
+            start, _, end = part.partition(':')
+            start = highest if start == '*' else int(start)
+            end = start if not end else (highest if end == '*' else int(end))
+            wanted.append((min(start, end), max(start, end)))
+        result = []
+        for seq, message in enumerate(self.messages, 1):
+            key = message.uid if by_uid else seq
+            if any(lo <= key <= hi for lo, hi in wanted): result.append((seq, message))
+        return result
+
+# --- Sesi Koneksi ---
+class StubSession:
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.mailbox = server.mailbox
+        self.reader = reader
+        self.writer = writer
+        self.selected = False
+        self.reported_exists = 0
+
+    def send(self, line):
+        data = line if isinstance(line, bytes) else line.encode() + b"\r\n"
+        self.server.stats['bytes'] += len(data)
+        self.writer.write(data)
+
+    def report_exists(self):
+        """Kirim EXISTS jika jumlah email bertambah sejak terakhir dilaporkan ke sesi ini."""
+        if self.selected and len(self.mailbox.messages) != self.reported_exists:
+            self.reported_exists = len(self.mailbox.messages)
+            self.send(f"* {self.reported_exists} EXISTS")
+
+    async def run(self):
+        stats = self.server.stats
+        stats['connections'] += 1
+        self.server.sessions.add(self)
+        self.send(f"* OK [CAPABILITY {CAPABILITIES}] IMAP stub siap")
+        try:
+            while True:
+                await self.writer.drain()
+                line = await self.reader.readline()
+                if not line: break
+                if self.server.latency: await asyncio.sleep(self.server.latency)
+                if self.server.drop_rate and random.random() < self.server.drop_rate:
+                    stats['drops'] += 1
+                    break # Putus tanpa respons, seperti koneksi mobile yang hilang
+                stats['commands'] += 1
+                if not await self.dispatch(line.decode('utf-8', 'replace').rstrip("\r\n")): break
+            await self.writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError): pass
+        finally:
+            self.mailbox.idlers.discard(self)
+            self.server.sessions.discard(self)
+            self.writer.close()
+
+    async def dispatch(self, line):
+        tag, _, rest = line.partition(' ')
+        command, _, args = rest.partition(' ')
+        command = command.upper()
+        by_uid = command == 'UID'
+        if by_uid: command, _, args = args.partition(' '); command = command.upper()
+        handler = getattr(self, f"cmd_{command.lower()}", None)
+        if handler is None or (not self.selected and command in ('SEARCH', 'FETCH', 'STORE', 'IDLE', 'CLOSE')):
+            self.send(f"{tag} BAD Perintah {command} tidak didukung di state ini")
+            return True
+        return await handler(tag, args, by_uid) is not False
+
+    async def cmd_capability(self, tag, args, by_uid):
+        self.send(f"* CAPABILITY {CAPABILITIES}")
+        self.send(f"{tag} OK CAPABILITY selesai")
+
+    async def cmd_login(self, tag, args, by_uid):
+        tokens = [re.sub(r'\\(.)', r'\1', quoted) if not atom else atom for quoted, atom in ARG_RE.findall(args)]
+        user, password = (tokens + [None, None])[:2]
+        if self.server.credentials and (user, password) != self.server.credentials:
+            self.send(f"{tag} NO [AUTHENTICATIONFAILED] Authentication failed.")
+            return
+        self.server.stats['logins'] += 1
+        self.send(f"{tag} OK [CAPABILITY {CAPABILITIES}] LOGIN berhasil")
+
+    async def cmd_select(self, tag, args, by_uid):
+        self.selected = True
+        self.reported_exists = len(self.mailbox.messages)
+        next_uid = self.mailbox.messages[-1].uid + 1 if self.mailbox.messages else 1
+        self.send(f"* FLAGS (\\Seen)")
+        self.send(f"* {self.reported_exists} EXISTS")
+        self.send("* 0 RECENT")
+        self.send(f"* OK [UIDVALIDITY {self.mailbox.uidvalidity}] UIDs valid")
+        self.send(f"* OK [UIDNEXT {next_uid}] Prediksi UID berikutnya")
+        self.send(f"{tag} OK [READ-WRITE] SELECT selesai")
+    cmd_examine = cmd_select
+
+    async def cmd_noop(self, tag, args, by_uid):
+        self.report_exists()
+        self.send(f"{tag} OK NOOP selesai")
+
+    async def cmd_close(self, tag, args, by_uid):
+        self.selected = False
+        self.send(f"{tag} OK CLOSE selesai")
+
+    async def cmd_logout(self, tag, args, by_uid):
+        self.send("* BYE Sampai jumpa")
+        self.send(f"{tag} OK LOGOUT selesai")
+        return False
+
+    async def cmd_search(self, tag, args, by_uid):
+        # Atom dinaikkan ke huruf besar, string bertanda kutip dibiarkan (nilai FROM/SUBJECT/HEADER)
+        tokens = [re.sub(r'\\(.)', r'\1', m.group(1)) if m.group(1) is not None else m.group(2).upper()
+                  for m in SEARCH_TOKEN_RE.finditer(args)]
+        candidates = list(enumerate(self.mailbox.messages, 1))
+        idx = 0
+        while idx < len(tokens):
+            token = tokens[idx]
+            if token == 'UID' and idx + 1 < len(tokens):
+                allowed = {m.uid for _, m in self.mailbox.resolve(tokens[idx + 1], True)}
+                candidates = [(s, m) for s, m in candidates if m.uid in allowed]
+                idx += 1
+            elif token == 'UNSEEN': candidates = [(s, m) for s, m in candidates if '\\Seen' not in m.flags]
+            elif token == 'SEEN': candidates = [(s, m) for s, m in candidates if '\\Seen' in m.flags]
+            elif token in ('FROM', 'SUBJECT', 'HEADER') and idx + (2 if token == 'HEADER' else 1) < len(tokens):
+                name = tokens[idx + 1] if token == 'HEADER' else token
+                needle = tokens[idx + (2 if token == 'HEADER' else 1)].lower()
+                # Substring tanpa beda huruf besar/kecil, seperti server sungguhan
+                candidates = [(s, m) for s, m in candidates if needle in str(m.msg.get(name, '')).lower()]
+                idx += 2 if token == 'HEADER' else 1
+            elif token != 'ALL':
+                self.send(f"{tag} BAD Kriteria SEARCH {token} tidak didukung")
+                return
+            idx += 1
+        self.send("* SEARCH" + "".join(f" {m.uid if by_uid else s}" for s, m in candidates))
+        self.send(f"{tag} OK SEARCH selesai")
+
+    async def cmd_fetch(self, tag, args, by_uid):
+        message_set, _, items = args.partition(' ')
+        items = FETCH_ITEM_RE.findall(items.strip())
+        now = time.time()
+        for seq, message in self.mailbox.resolve(message_set, by_uid):
+            if message.fetched_at is None: message.fetched_at = now
+            parts = [f"UID {message.uid}".encode()] if by_uid else []
+            for item in items:
+                upper = item.upper()
+                if upper == 'UID':
+                    if not by_uid: parts.append(f"UID {message.uid}".encode())
+                elif upper == 'FLAGS': parts.append(f"FLAGS ({' '.join(sorted(message.flags))})".encode())
+                elif upper == 'BODYSTRUCTURE': parts.append(b"BODYSTRUCTURE " + build_bodystructure(message.msg).encode())
+                elif upper == 'RFC822.SIZE': parts.append(f"RFC822.SIZE {len(message.raw)}".encode())
+                elif upper.startswith('RFC822') or upper.startswith('BODY'):
+                    name, data = self._fetch_literal(message, item)
+                    if not upper.startswith('BODY.PEEK') and upper != 'RFC822.HEADER': message.flags.add('\\Seen')
+                    parts.append(name.encode() + b" {%d}\r\n" % len(data) + data)
+            self.send(f"* {seq} FETCH (".encode() + b" ".join(parts) + b")\r\n")
+            if self.writer.transport.get_write_buffer_size() > 1 << 20: await self.writer.drain()
+        self.send(f"{tag} OK FETCH selesai")
+
+    def _fetch_literal(self, message, item):
+        """(nama item di respons, bytes) untuk RFC822 / BODY[...]<a.b>."""
+        upper = item.upper()
+        if upper == 'RFC822': return "RFC822", message.raw
+        if upper == 'RFC822.HEADER': return "RFC822.HEADER", header_fields(message.msg, set(message.msg.keys()))
+        spec = item[item.index('[') + 1:item.index(']')]
+        if spec.upper().startswith('HEADER.FIELDS'):
+            names = spec[spec.index('(') + 1:spec.index(')')].split()
+            data = header_fields(message.msg, names)
+        elif spec.upper() == 'HEADER': data = header_fields(message.msg, set(message.msg.keys()))
+        else: data = body_section(message.msg, spec)
+        name = f"BODY[{spec}]"
+        if '<' in item:
+            start, length = (int(n) for n in item[item.index('<') + 1:-1].split('.'))
+            data = data[start:start + length]
+            name += f"<{start}>"
+        return name, data
+
+    async def cmd_store(self, tag, args, by_uid):
+        message_set, action, flags = (args.split(' ', 2) + ["", ""])[:3]
+        flags = set(flags.strip('()').split())
+        silent = action.upper().endswith('.SILENT')
+        action = action.upper().replace('.SILENT', '')
+        now = time.time()
+        for seq, message in self.mailbox.resolve(message_set, by_uid):
+            if action == '+FLAGS': message.flags |= flags
+            elif action == '-FLAGS': message.flags -= flags
+            else: message.flags = set(flags)
+            if '\\Seen' in message.flags and message.seen_at is None: message.seen_at = now
+            if not silent: self.send(f"* {seq} FETCH (UID {message.uid} FLAGS ({' '.join(sorted(message.flags))}))")
+        self.send(f"{tag} OK STORE selesai")
+
+    async def cmd_idle(self, tag, args, by_uid):
+        self.send("+ idling")
+        self.report_exists() # Email yang masuk sebelum IDLE tetap diberitahukan
+        self.mailbox.idlers.add(self)
+        try:
+            while True:
+                await self.writer.drain()
+                line = await self.reader.readline()
+                if not line: return False
+                if line.strip().upper() == b"DONE": break
+        finally:
+            self.mailbox.idlers.discard(self)
+        self.send(f"{tag} OK IDLE selesai")
+
+# --- Server ---
+class StubIMAPServer:
+    """Server IMAP stub. start() menjalankan event loop di thread background."""
+    def __init__(self, mailbox=None, latency=0.0, drop_rate=0.0, credentials=None):
+        self.mailbox = mailbox or StubMailbox()
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.credentials = credentials # (user, password) atau None = terima semua
+        self.stats = {'connections': 0, 'logins': 0, 'commands': 0, 'drops': 0, 'bytes': 0}
+        self.sessions = set() # Sesi yang sedang terbuka (lihat drop_connections)
+        self.loop = None
+        self.port = None
+        self._server = None
+        self._thread = None
+
+    async def _handle(self, reader, writer):
+        try: await StubSession(self, reader, writer).run()
+        except asyncio.CancelledError: pass # Server dihentikan saat sesi masih terbuka
+
+    def start(self, host="127.0.0.1", port=0):
+        """Jalankan server di thread background. Return port yang dipakai."""
+        ready = threading.Event()
+        def run():
+            self.loop = asyncio.new_event_loop()
+            self._server = self.loop.run_until_complete(asyncio.start_server(self._handle, host, port, limit=1 << 20))
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self.loop.run_forever()
+        self._thread = threading.Thread(target=run, name="imap-stub", daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self.port
+
+    def call(self, func, *args):
+        """Jalankan func di thread event loop dan tunggu hasilnya."""
+        async def wrapper(): return func(*args)
+        return asyncio.run_coroutine_threadsafe(wrapper(), self.loop).result()
+
+    def inject(self, raws):
+        self.call(self.mailbox.add_many, raws)
+
+    def drop_connections(self):
+        """Putus semua sesi yang terbuka tanpa respons (seperti jaringan hilang). Return jumlah sesi."""
+        def drop():
+            for session in list(self.sessions): session.writer.transport.abort()
+            self.stats['drops'] += len(self.sessions)
+            return len(self.sessions)
+        return self.call(drop)
+
+    def stop(self):
+        if not self.loop: return
+        async def shutdown():
+            self._server.close()
+            tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            for task in tasks: task.cancel() # Sesi yang masih terbuka (mis. listener dibatalkan)
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.loop.stop()
+        asyncio.run_coroutine_threadsafe(shutdown(), self.loop)
+        self._thread.join(5)
+
+# --- Skenario Beban ---
+def _fmt(value):
+    return f"{value:8.1f}" if value is not None else "       -"
+
+def run_scenario(count, args):
+    """Jalankan MailboxListener spartan ke server stub, inject count email sekaligus, ukur latensi & throughput."""
+    import spartan # Import di sini agar mode server saja tidak butuh dependensi spartan
+    server = StubIMAPServer(latency=args.latency / 1000, drop_rate=args.drop_rate)
+    port = server.start()
+    settings = spartan.Settings(email_address="stub@localhost", app_password="stub",
+                                imap_server="127.0.0.1", imap_port=port, imap_use_ssl=False, use_imap_idle=not args.polling,
+                                check_interval_seconds=args.poll_interval, execute_binance_orders=False, event_log_file="", quiet_console=True,
+                                imap_search_from=args.search_from or "")
+    spartan.STATE_FILE = os.path.join(tempfile.mkdtemp(prefix="imap-stub-"), "listener_state.json")
+    spartan.trigger_beep = lambda action: None
+    spartan.EVENTS.quiet = True
+    spartan.running = True
+    raws = []
+    for idx in range(1, count + 1):
+        raws += [make_noise_message(idx * 1000 + n) for n in range(args.noise)] # Newsletter diselipkan di antara sinyal
+        raws.append(make_message(idx))
+    if args.engine == "asyncio":
+        listener = spartan.AsyncMailboxListener("stub", "inbox", settings)
+        loop = asyncio.new_event_loop()
+        task = loop.create_task(listener.run_async())
+        def run_listener():
+            with contextlib.suppress(asyncio.CancelledError): loop.run_until_complete(task)
+            loop.close()
+    else:
+        listener = spartan.MailboxListener("stub", "inbox", settings)
+        run_listener = listener.run
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        thread = threading.Thread(target=run_listener, name="listener", daemon=True)
+        thread.start()
+        deadline = time.time() + 30
+        while server.stats['logins'] == 0 and time.time() < deadline: time.sleep(0.01)
+        time.sleep(0.3) # Beri waktu SEARCH awal + masuk IDLE
+        started = time.time()
+        server.inject(raws)
+        deadline = started + args.timeout
+        while time.time() < deadline:
+            if server.call(lambda: sum(1 for m in server.mailbox.messages if m.seen_at and is_signal(m))) >= count: break
+            time.sleep(0.02)
+        spartan.running = False
+        if args.engine == "asyncio": loop.call_soon_threadsafe(task.cancel) # IDLE async berhenti lewat pembatalan
+        thread.join(5)
+    server.stop()
+
+    messages = [m for m in server.mailbox.messages if is_signal(m)]
+    noise_fetched = sum(1 for m in server.mailbox.messages if m.fetched_at and not is_signal(m))
+    detect = sorted((m.fetched_at - m.added_at) * 1000 for m in messages if m.fetched_at)
+    done = sorted((m.seen_at - m.added_at) * 1000 for m in messages if m.seen_at)
+    finished = max((m.seen_at for m in messages if m.seen_at), default=None)
+    throughput = len(done) / (finished - started) if finished and finished > started else None
+    return {'count': count, 'processed': len(done), 'detect': detect, 'done': done, 'throughput': throughput,
+            'noise': len(server.mailbox.messages) - len(messages), 'noise_fetched': noise_fetched,
+            'stats': dict(server.stats), 'log': log.getvalue()}
+
+class StuckDispatcher:
+    """Dispatcher palsu: order dicatat tapi tidak pernah selesai (tetap 'antre' di uid_state)."""
+    def __init__(self):
+        self.submitted = []
+
+    def submit(self, client, settings, side, trace=None):
+        self.submitted.append(trace['uid'])
+
+    def beep(self, action_word): pass
+
+def run_reconnect_check(args):
+    """Uji regresi: koneksi putus saat order masih antre tidak boleh mengirim order email yang sama lagi."""
+    import spartan
+    server = StubIMAPServer()
+    port = server.start()
+    settings = spartan.Settings(email_address="stub@localhost", app_password="stub", imap_server="127.0.0.1", imap_port=port,
+                                imap_use_ssl=False, use_imap_idle=not args.polling, check_interval_seconds=args.poll_interval,
+                                execute_binance_orders=True, event_log_file="", quiet_console=True)
+    spartan.STATE_FILE = os.path.join(tempfile.mkdtemp(prefix="imap-stub-"), "listener_state.json")
+    spartan.EVENTS.quiet = True
+    spartan.running = True
+    dispatcher = StuckDispatcher()
+    listener = spartan.MailboxListener("stub", "inbox", settings, types.SimpleNamespace(client=object()), dispatcher)
+
+    def wait_for(condition, timeout):
+        deadline = time.time() + timeout
+        while not condition() and time.time() < deadline: time.sleep(0.02)
+        return condition()
+
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):
+        thread = threading.Thread(target=listener.run, name="listener", daemon=True)
+        thread.start()
+        wait_for(lambda: server.stats['logins'] >= 1, 30)
+        time.sleep(0.3)
+        server.inject([make_message(1)])
+        wait_for(lambda: dispatcher.submitted, args.timeout)
+        server.drop_connections()
+        reconnected = wait_for(lambda: server.stats['logins'] >= 2, args.timeout)
+        time.sleep(args.poll_interval + 0.5 if args.polling else 1.0) # Beri waktu satu putaran SEARCH setelah reconnect
+        spartan.running = False
+        thread.join(5)
+    server.stop()
+    with open(spartan.STATE_FILE, 'r') as f: state = next(iter(json.load(f).values()), {})
+    ok = reconnected and dispatcher.submitted == ['1'] and state.get('pending_uids') == [1]
+    color = GREEN if ok else RED
+    print(f" {color}[{'OK' if ok else 'X'}] Reconnect saat order antre: order dikirim {dispatcher.submitted}, "
+          f"login {server.stats['logins']}, state {state}{RESET}")
+    if args.verbose or not ok: print(log.getvalue())
+    return 0 if ok else 1
+
+def is_signal(message):
+    return not message.msg['Subject'].startswith("Weekly newsletter")
+
+def print_scenario(result, percentile):
+    detect, done = result['detect'], result['done']
+    color = GREEN if result['processed'] == result['count'] else RED
+    print(f" {CYAN}{result['count']:>6}{RESET} email | {color}{result['processed']:>6} diproses{RESET} | "
+          f"deteksi p50 {_fmt(percentile(detect, 50))} p99 {_fmt(percentile(detect, 99))} ms | "
+          f"selesai p50 {_fmt(percentile(done, 50))} p99 {_fmt(percentile(done, 99))} ms | "
+          f"{(result['throughput'] or 0):>8.0f} msg/s")
+    stats = result['stats']
+    print(f"        {DIM}koneksi {stats['connections']} | login {stats['logins']} | perintah {stats['commands']} | diputus {stats['drops']} | "
+          f"terkirim {stats['bytes'] / 1024:.0f} KB" + (f" | newsletter diunduh {result['noise_fetched']}/{result['noise']}" if result['noise'] else "") + RESET)
+
+def main():
+    parser = argparse.ArgumentParser(description="Server IMAP stub lokal untuk uji listener spartan.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1143)
+    parser.add_argument("--user", help="Username yang diterima (default: semua)")
+    parser.add_argument("--password", help="Password yang diterima")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latensi per perintah (ms)")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Peluang koneksi diputus per perintah (0-1)")
+    parser.add_argument("--preload", type=int, default=0, help="Jumlah email awal di INBOX")
+    parser.add_argument("--burst", type=int, default=0, help="Jumlah email per burst")
+    parser.add_argument("--burst-interval", type=float, default=10.0, help="Jeda antar burst (detik)")
+    parser.add_argument("--seed", type=int, help="Seed random untuk drop-rate")
+    parser.add_argument("--scenario", help="Uji beban listener, mis. '1,100,10000' email per skenario")
+    parser.add_argument("--polling", action="store_true", help="Skenario: pakai polling, bukan IDLE")
+    parser.add_argument("--noise", type=int, default=0, help="Skenario: email newsletter (non-sinyal) per email sinyal")
+    parser.add_argument("--search-from", help="Skenario: isi imap_search_from (filter SEARCH di server)")
+    parser.add_argument("--engine", choices=("thread", "asyncio"), default="thread", help="Skenario: engine listener spartan")
+    parser.add_argument("--poll-interval", type=int, default=5, help="Skenario: interval polling (detik)")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Skenario: batas waktu per skenario (detik)")
+    parser.add_argument("--verbose", action="store_true", help="Skenario: tampilkan log listener")
+    parser.add_argument("--reconnect-check", action="store_true", help="Uji koneksi putus saat order masih antre (order tidak boleh terkirim 2x)")
+    args = parser.parse_args()
+    if args.seed is not None: random.seed(args.seed)
+
+    if args.reconnect_check: return run_reconnect_check(args)
+
+    if args.scenario:
+        import spartan
+        counts = [int(n) for n in args.scenario.split(',') if n.strip()]
+        print(f"{BOLD}Skenario listener -> IMAP stub{RESET} {DIM}(latensi {args.latency} ms, drop {args.drop_rate}, "
+              f"{'polling' if args.polling else 'IDLE'}, engine {args.engine}){RESET}")
+        for count in counts:
+            result = run_scenario(count, args)
+            print_scenario(result, spartan.percentile)
+            if args.verbose: print(result['log'])
+        return 0
+
+    credentials = (args.user, args.password) if args.user else None
+    server = StubIMAPServer(latency=args.latency / 1000, drop_rate=args.drop_rate, credentials=credentials)
+    if args.preload: server.mailbox.add_many([make_message(idx) for idx in range(1, args.preload + 1)])
+    port = server.start(args.host, args.port)
+    print(f"{GREEN}[OK] IMAP stub di {args.host}:{port} (plaintext). {DIM}Set imap_use_ssl=false, imap_port={port}.{RESET}")
+    try:
+        while True:
+            time.sleep(args.burst_interval if args.burst else 1)
+            if args.burst:
+                start = len(server.mailbox.messages) + 1
+                server.inject([make_message(idx) for idx in range(start, start + args.burst)])
+                print(f"{CYAN}[+] Burst {args.burst} email (total {start + args.burst - 1}){RESET} {DIM}{server.stats}{RESET}")
+    except KeyboardInterrupt:
+        print(f"\n{YELLOW}[!] Berhenti.{RESET} {DIM}{server.stats}{RESET}")
+    server.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
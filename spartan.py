@@ -2,7 +2,9 @@
 import imaplib
 import email
 from email.header import decode_header
+from email.utils import parsedate_to_datetime # Waktu header Date/Received untuk latensi
 import time
+STARTED_AT = time.perf_counter() # Awal startup (dilaporkan di mode daemon)
 import datetime # Untuk timestamp
 import subprocess
 import json
@@ -12,58 +14,161 @@ import sys
 import signal # Untuk menangani Ctrl+C
 import traceback # Untuk mencetak traceback error
 import socket # Untuk error koneksi
+import select # Untuk menunggu data IMAP IDLE
+import re # Untuk parsing respons IMAP
+import ssl # Untuk deteksi data SSL tertunda
+import binascii # Untuk decode base64 bagian email
+import quopri # Untuk decode quoted-printable
+import codecs # Decoder charset bertahap untuk body email
 import shutil # Untuk mendapatkan lebar terminal (opsional)
-
-# --- Inquirer Integration ---
-try:
-    import inquirer
-    # Coba tema lain yg mungkin lebih simpel atau kontras di Termux
-    # from inquirer.themes import Default as InquirerTheme
-    from inquirer.themes import GreenPassion as InquirerTheme # Tetap pakai ini dulu
-    INQUIRER_AVAILABLE = True
-except ImportError:
-    INQUIRER_AVAILABLE = False
-    print("\n!!! WARNING: Library 'inquirer' tidak ditemukan. !!!")
-    print("!!!          Menu akan menggunakan input teks biasa.     !!!")
-    print("!!!          Install dengan: pip install inquirer       !!!\n")
-    time.sleep(3)
-    # Definisikan dummy theme jika inquirer tidak ada
-    class InquirerTheme: pass
-
-# --- Binance Integration ---
-# (Kode Binance Integration tetap sama)
-try:
-    from binance.client import Client
-    import requests # Ditambahkan untuk menangani network error spesifik Binance
-    from binance.exceptions import BinanceAPIException, BinanceOrderException
-    BINANCE_AVAILABLE = True
-except ImportError:
-    BINANCE_AVAILABLE = False
-    print("\n!!! WARNING: Library 'python-binance' tidak ditemukan. !!!")
-    print("!!!          Fitur eksekusi order Binance tidak akan berfungsi. !!!")
-    print("!!!          Install dengan: pip install python-binance requests !!!\n") # Tambah requests
-    class BinanceAPIException(Exception): pass
-    class BinanceOrderException(Exception): pass
-    class Client:
-        SIDE_BUY = 'BUY'
-        SIDE_SELL = 'SELL'
-        ORDER_TYPE_MARKET = 'MARKET'
-    # Definisikan dummy requests jika binance tidak ada tapi script jalan
-    if 'requests' not in sys.modules:
-        class requests:
-            class exceptions:
-                RequestException = Exception
+import threading # Untuk worker order & beep di background
+import queue # Antrean order terbatas
+import zlib # Hash stabil untuk routing pair ke worker
+import hashlib # Hash isi email untuk deduplikasi sinyal
+import functools # Aksi sinyal yang ditunda (netting)
+import asyncio # Engine listener asyncio (opsional, pilih di menu)
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError # Panggilan blocking (imaplib/order) dari engine asyncio
+from decimal import Decimal, ROUND_DOWN, InvalidOperation # Pembulatan kuantitas order sesuai filter
+from collections import deque # Sampel latensi terbatas
+import dataclasses # Model Settings (frozen, slots)
+from dataclasses import dataclass, field
+
+if sys.version_info < (3, 10): # Sebelum @dataclass(slots=True), yang gagal saat import di Python lama
+    print("Error: Butuh Python 3.10+"); sys.exit(1)
+
+# --- Inquirer & Binance Integration (lazy) ---
+# Library berat baru di-import saat dibutuhkan: menu interaktif -> load_inquirer(),
+# eksekusi order -> load_binance(). Mode daemon / listener-only tidak membayar keduanya.
+inquirer = None
+INQUIRER_AVAILABLE = None # None = belum dicoba import
+class InquirerTheme: pass # Diganti tema asli oleh load_inquirer()
+
+BINANCE_AVAILABLE = None # None = belum dicoba import
+class BinanceAPIException(Exception): pass # Pengganti sampai load_binance() berhasil
+class BinanceOrderException(Exception): pass
+class Client:
+    SIDE_BUY = 'BUY'
+    SIDE_SELL = 'SELL'
+    ORDER_TYPE_MARKET = 'MARKET'
+class requests:
+    class exceptions:
+        RequestException = Exception
+KeepAliveAdapter = None
+
+def load_inquirer():
+    """Import inquirer sekali (hanya untuk menu). Return True jika tersedia."""
+    global inquirer, InquirerTheme, INQUIRER_AVAILABLE
+    if INQUIRER_AVAILABLE is None:
+        try:
+            import inquirer
+            # Coba tema lain yg mungkin lebih simpel atau kontras di Termux
+            # from inquirer.themes import Default as InquirerTheme
+            from inquirer.themes import GreenPassion as InquirerTheme # Tetap pakai ini dulu
+            INQUIRER_AVAILABLE = True
+        except ImportError:
+            INQUIRER_AVAILABLE = False # Menu memakai input teks biasa (info ditampilkan di menu)
+    return INQUIRER_AVAILABLE
+
+def load_binance():
+    """Import python-binance + requests sekali, saat eksekusi order dibutuhkan. Return True jika tersedia."""
+    global Client, BinanceAPIException, BinanceOrderException, requests, KeepAliveAdapter, BINANCE_AVAILABLE
+    if BINANCE_AVAILABLE is None:
+        try:
+            from binance.client import Client
+            import requests # Untuk menangani network error spesifik Binance
+            from binance.exceptions import BinanceAPIException, BinanceOrderException
+            KeepAliveAdapter = _define_keepalive_adapter()
+            BINANCE_AVAILABLE = True
+        except ImportError:
+            BINANCE_AVAILABLE = False
+            print("\n!!! WARNING: Library 'python-binance' tidak ditemukan. !!!")
+            print("!!!          Fitur eksekusi order Binance tidak akan berfungsi. !!!")
+            print("!!!          Install dengan: pip install python-binance requests !!!\n")
+    return BINANCE_AVAILABLE
 
 # --- Konfigurasi & Variabel Global ---
 # (Konfigurasi & Variabel Global tetap sama)
 CONFIG_FILE = "config.json"
-DEFAULT_SETTINGS = {
-    "email_address": "", "app_password": "", "imap_server": "imap.gmail.com",
-    "check_interval_seconds": 10, "target_keyword": "Exora AI", "trigger_keyword": "order",
-    "binance_api_key": "", "binance_api_secret": "", "trading_pair": "BTCUSDT",
-    "buy_quote_quantity": 11.0, "sell_base_quantity": 0.0, "execute_binance_orders": False
-}
+STATE_FILE = "listener_state.json" # UIDVALIDITY + UID terakhir yang sudah diproses
+SYMBOL_CACHE_FILE = "symbol_filters.json" # Cache exchangeInfo (LOT_SIZE, MIN_NOTIONAL, presisi)
+@dataclass(frozen=True, slots=True)
+class Settings:
+    """Pengaturan yang sudah divalidasi (lihat Settings.from_dict). Immutable: ubah lewat replace() / simpan ulang.
+
+    Nilai turunan (pair huruf besar, entri mailboxes/signal_rules yang valid)
+    dihitung sekali saat dibuat, bukan di tiap email.
+    """
+    email_address: str = ""
+    app_password: str = ""
+    imap_server: str = "imap.gmail.com"
+    imap_port: int = 0 # 0 = port standar (993 SSL / 143 plaintext, mis. server stub lokal)
+    imap_use_ssl: bool = True
+    check_interval_seconds: int = 10
+    target_keyword: str = "Exora AI"
+    trigger_keyword: str = "order"
+    use_imap_idle: bool = True
+    use_partial_fetch: bool = True
+    body_fetch_max_bytes: int = 0 # 0 = tanpa batas
+    header_match_include_sender: bool = False
+    # Filter SEARCH di server (kosong = semua UNSEEN). Email yang tidak cocok tidak diunduh & tetap belum dibaca.
+    imap_search_from: str = ""
+    imap_search_subject: str = ""
+    imap_search_headers: dict = field(default_factory=dict) # {"Nama-Header": "isi"}
+    imap_search_gmail_raw: str = "" # Query Gmail (X-GM-RAW), mis. "from:tradingview newer_than:1d"; diabaikan jika server bukan Gmail
+    binance_api_key: str = ""
+    binance_api_secret: str = ""
+    binance_api_url: str = "" # "" = api.binance.com, mis. "http://127.0.0.1:8765/api" untuk stub lokal
+    trading_pair: str = "BTCUSDT"
+    buy_quote_quantity: float = 11.0
+    sell_base_quantity: float = 0.0
+    execute_binance_orders: bool = False
+    order_workers: int = 2
+    order_queue_size: int = 100
+    binance_pool_size: int = 4
+    binance_keepalive_seconds: int = 30
+    symbol_cache_ttl_seconds: int = 3600
+    binance_max_rate_wait_seconds: float = 10.0 # Order yang harus menunggu rate limit lebih lama dari ini dibatalkan
+    signal_dedupe_seconds: float = 0.0 # >0: sinyal dengan Message-ID / isi (Subjek + body utuh) sama dalam jendela ini diabaikan
+    signal_net_seconds: float = 0.0 # >0: sinyal ditahan sekian detik, BUY & SELL pair sama saling menghapus (menambah latensi)
+    event_log_file: str = "events.jsonl"
+    quiet_console: bool = False
+    config_reload_seconds: float = 2.0 # Interval cek perubahan config.json saat listener jalan (0 = hanya via SIGHUP)
+    mailboxes: tuple = () # Mailbox tambahan: {"name", "email_address", "app_password", "imap_server", "folder", + override lain (lihat MAILBOX_OVERRIDE_KEYS)}
+    signal_rules: tuple = () # Aturan tambahan: {"name", "target", "trigger", "side": auto/buy/sell, "pair", "buy_quote_quantity", "sell_base_quantity"}
+    # Nilai turunan
+    active_mailboxes: tuple = field(init=False, repr=False, compare=False) # Entri tidak valid tetap di config, hanya diabaikan
+    active_signal_rules: tuple = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        set_value = functools.partial(object.__setattr__, self)
+        set_value('trading_pair', self.trading_pair.strip().upper())
+        for name in ('buy_quote_quantity', 'sell_base_quantity', 'binance_max_rate_wait_seconds',
+                     'signal_dedupe_seconds', 'signal_net_seconds', 'config_reload_seconds'):
+            set_value(name, float(getattr(self, name)))
+        set_value('imap_search_headers', dict(self.imap_search_headers))
+        set_value('mailboxes', tuple(self.mailboxes))
+        set_value('signal_rules', tuple(self.signal_rules))
+        set_value('active_mailboxes', tuple(m for m in self.mailboxes if is_valid_mailbox(m)))
+        set_value('active_signal_rules', tuple(r for r in self.signal_rules if is_valid_signal_rule(r)))
+
+    @classmethod
+    def from_dict(cls, raw):
+        """Validasi dict mentah (isi config.json / hasil edit menu) lalu buat Settings."""
+        return cls(**validate_settings(raw))
+
+    def to_dict(self):
+        """Dict siap-JSON berisi semua kunci config (tanpa nilai turunan)."""
+        data = {}
+        for f in dataclasses.fields(self):
+            if not f.init: continue
+            value = getattr(self, f.name)
+            data[f.name] = list(value) if isinstance(value, tuple) else dict(value) if isinstance(value, dict) else value
+        return data
+
+DEFAULT_SETTINGS = Settings().to_dict() # Kunci & nilai default config.json
 running = True
+DAEMON_MODE = False # True saat dijalankan via `spartan.py run` / --daemon (tanpa menu & jeda tampilan)
+MATCH_PATH_STATS = {"subject": 0, "body": 0, "none": 0} # Statistik jalur keputusan sinyal
 
 # --- Kode Warna ANSI ---
 # (Kode Warna ANSI tetap sama)
@@ -78,9 +183,19 @@ MAGENTA = "\033[95m"
 CYAN = "\033[96m"
 
 # --- Fungsi Penanganan Sinyal (Ctrl+C) ---
-# (Signal Handler tetap sama)
+listening = False # True selama start_listening (engine thread) jalan: Ctrl+C hanya menghentikan loop
+stop_requests = 0 # Ctrl+C selama listening; ke-2 membatalkan antrean order
+
 def signal_handler(sig, frame):
-    global running
+    global running, stop_requests
+    if listening: # Jangan sys.exit di sini: antrean order, state UID & log event harus dituntaskan dulu
+        stop_requests += 1
+        if stop_requests == 1:
+            print(f"\n{YELLOW}{BOLD}[WARN] Ctrl+C terdeteksi. Menghentikan listener...{RESET}")
+            running = False
+        else:
+            print(f"\n{YELLOW}[!] Ctrl+C lagi: antrean order dibatalkan.{RESET}")
+        return
     print(f"\n{YELLOW}{BOLD}[WARN] Ctrl+C terdeteksi. Menghentikan program...{RESET}")
     running = False
     time.sleep(1.5)
@@ -92,13 +207,23 @@ signal.signal(signal.SIGINT, signal_handler)
 def clear_screen():
     os.system('cls' if os.name == 'nt' else 'clear')
 
+_terminal_width = None # Cache lebar terminal, direset saat ukuran jendela berubah (SIGWINCH)
+
+def _reset_terminal_width(sig, frame):
+    global _terminal_width
+    _terminal_width = None
+if hasattr(signal, 'SIGWINCH'): signal.signal(signal.SIGWINCH, _reset_terminal_width) # Tidak ada di Windows
+
 def get_terminal_width(default=70):
-    """Mencoba mendapatkan lebar terminal, fallback ke default."""
-    try:
-        # Berfungsi di Linux/macOS, mungkin perlu penyesuaian untuk Windows
-        return shutil.get_terminal_size(fallback=(default, 24)).columns
-    except Exception:
-        return default
+    """Lebar terminal (di-cache sampai SIGWINCH), fallback ke default."""
+    global _terminal_width
+    if _terminal_width is None:
+        try:
+            # Berfungsi di Linux/macOS, mungkin perlu penyesuaian untuk Windows
+            _terminal_width = shutil.get_terminal_size(fallback=(default, 24)).columns
+        except Exception:
+            return default
+    return _terminal_width
 
 def print_centered(text, color=RESET, style=BOLD):
     """Mencetak teks di tengah terminal."""
@@ -118,34 +243,272 @@ def print_separator(char='─', color=DIM):
     width = get_terminal_width()
     print(f"{color}{char * width}{RESET}")
 
+# --- Log Event Terstruktur (JSONL + Renderer Konsol) ---
+class EventLog:
+    """Event listener & order sebagai record terstruktur.
+
+    Setiap emit() menjadi satu baris JSON di file event (dikumpulkan di memori
+    dan ditulis thread background tiap FLUSH_SECONDS, bukan per event) lalu
+    dirender ke konsol lewat CONSOLE_RENDERERS. Mode quiet hanya merender
+    event level warning/error, cocok untuk jalan tanpa terminal.
+    """
+    FLUSH_SECONDS = 1.0
+
+    def __init__(self):
+        self.quiet = False
+        self.file = None
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    def configure(self, path, quiet=False):
+        self.close()
+        self.quiet = quiet
+        if not path: return
+        try:
+            self.file = open(path, 'a', encoding='utf-8')
+        except OSError as e:
+            print(f"{YELLOW}[!] File event '{path}' tidak bisa dibuka ({e}). Event hanya tampil di konsol.{RESET}")
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._flush_loop, name="event-log", daemon=True)
+        self.thread.start()
+
+    def emit(self, event, **fields):
+        record = {"ts": round(time.time(), 3), "event": event, **fields}
+        if self.file:
+            with self.lock: self.buffer.append(record) # Serialisasi JSON di thread flush
+        level, render = CONSOLE_RENDERERS.get(event, ('info', None))
+        if render and (not self.quiet or level != 'info'): print(render(record))
+        return record
+
+    def _flush_loop(self):
+        while not self.stop_event.wait(self.FLUSH_SECONDS): self.flush()
+
+    def flush(self):
+        with self.lock: records, self.buffer = self.buffer, []
+        if not records or not self.file: return
+        try:
+            self.file.write(''.join(json.dumps(r, ensure_ascii=False, default=str) + '\n' for r in records))
+            self.file.flush()
+        except (OSError, ValueError) as e:
+            print(f"{RED}[X] Gagal menulis file event: {e}{RESET}")
+
+    def close(self):
+        if self.thread:
+            self.stop_event.set()
+            self.thread.join(2)
+            self.thread = None
+        self.flush()
+        if self.file:
+            self.file.close()
+            self.file = None
+
+EVENTS = EventLog()
+
+def _tag(r):
+    return f"{MAGENTA}[{r['mailbox']}]{RESET} " if r.get('mailbox') else ""
+
+def _box_footer(r):
+    return f"{CYAN}╰{'─' * (get_terminal_width() - 1)}{RESET}"
+
+def _render_listener_started(r):
+    mailbox_desc = f" untuk {r['mailboxes']} mailbox" if r['mailboxes'] > 1 else ""
+    startup_desc = f" {DIM}(startup {r['startup_ms']:.0f} ms){RESET}" if 'startup_ms' in r else ""
+    return f"\n{GREEN}{BOLD}Memulai listener{mailbox_desc}... (Ctrl+C untuk berhenti){RESET}{startup_desc}"
+
+def _render_imap_connected(r):
+    folder_desc = f" ({r['folder']})" if r['folder'].lower() != "inbox" else ""
+    return f"{_tag(r)}{GREEN}[OK] Terhubung & Login ke {r['email']}{folder_desc}. Mendengarkan...{RESET}"
+
+def _render_email_received(r):
+    sender, subject = r['sender'], r['subject']
+    label = f" {r['mailbox']}" if r.get('mailbox') else ""
+    return (f"\n{CYAN}╭─ Email Baru [{datetime.datetime.fromtimestamp(r['ts']).strftime('%H:%M')}]{label} {'─'*15}{RESET}\n"
+            f"{CYAN}│{RESET} {DIM}UID   :{RESET} {r['uid']}\n"
+            f"{CYAN}│{RESET} {DIM}Dari  :{RESET} {sender[:40]}{'...' if len(sender)>40 else ''}\n" # Batasi panjang sender
+            f"{CYAN}│{RESET} {DIM}Subjek:{RESET} {subject[:50]}{'...' if len(subject)>50 else ''}") # Batasi panjang subjek
+
+def _render_rule_matched(r):
+    rule_desc = f"aturan {r['rule']}, " if r.get('multi_rule') else ""
+    return (f"{CYAN}│{RESET} {GREEN}[✓] Target '{r['target']}' ditemukan.{RESET}\n"
+            f"{CYAN}│{RESET} {GREEN}[✓] Trigger '{r['trigger']}' -> Aksi: {BOLD}{r['action'].upper()} {r['pair']}{RESET} {DIM}({rule_desc}via {r['path']}){RESET}")
+
+def _render_signal_unmatched(r):
+    result = r['result']
+    if result == 'no_rules': return f"{CYAN}│{RESET} {BLUE}[-] Tidak ada aturan sinyal aktif (Target/Trigger kosong).{RESET}"
+    lines = [f"{CYAN}│{RESET} {GREEN}[✓] Target '{r['target']}' ditemukan.{RESET}"] if result != 'no_target' else []
+    if result == 'invalid_action':
+        lines.append(f"{CYAN}│{RESET} {YELLOW}[?] Trigger ditemukan, tapi kata '{r['action_word']}' bukan 'buy'/'sell'.{RESET}")
+    elif result == 'no_action':
+        lines.append(f"{CYAN}│{RESET} {YELLOW}[?] Trigger ditemukan, tapi tidak ada kata aksi setelahnya.{RESET}")
+    elif result == 'no_trigger':
+        lines.append(f"{CYAN}│{RESET} {YELLOW}[?] Target ditemukan, tapi trigger '{r['trigger']}' tidak ada SETELAHNYA.{RESET}")
+    elif r.get('rules', 1) > 1:
+        lines.append(f"{CYAN}│{RESET} {BLUE}[-] Tidak ada target dari {r['rules']} aturan yang ditemukan.{RESET}")
+    else:
+        lines.append(f"{CYAN}│{RESET} {BLUE}[-] Target '{r['target']}' tidak ditemukan.{RESET}")
+    return '\n'.join(lines)
+
+def _render_email_failed(r):
+    if r['reason'] == 'fetch': return f"[{BLUE}EMAIL {r['uid']}{RESET}] {RED}Gagal fetch, dicoba lagi nanti.{RESET}"
+    if r['reason'] == 'body': return f"{CYAN}│{RESET} {RED}[X] Body tidak terambil, dicoba lagi nanti.{RESET}\n" + _box_footer(r)
+    return f"[{BLUE}EMAIL {r['uid']}{RESET}] {RED}{BOLD}FATAL Error proses email:{RESET} {r.get('error', '')}"
+
+def _render_order_filled(r):
+    base = r['pair'].replace('USDT', '') # Asumsi quote = USDT
+    lines = [f"{GREEN}{BOLD}[SUCCESS]{RESET} Order {r['side']} {r['pair']} berhasil!",
+             f"  {DIM}├─ ID     : {r['order_id']}{RESET}",
+             f"  {DIM}├─ Status : {r['status']}{RESET}"]
+    if r.get('latency_ms') is not None:
+        conn_desc = f"koneksi baru {r['connect_ms']:.0f} ms" if r['connect_ms'] > 0 else "koneksi reuse"
+        lines.append(f"  {DIM}├─ Latensi: {r['latency_ms']:.0f} ms ({conn_desc}){RESET}")
+    if r['executed_qty'] > 0:
+        lines.append(f"  {DIM}├─ Terisi : {r['executed_qty']:.8f} {base}{RESET}")
+        lines.append(f"  {DIM}└─ Harga Avg: {r['avg_price']:.4f} USDT{RESET}")
+    return '\n'.join(lines)
+
+def _render_order_failed(r):
+    if r['kind'] == 'api':
+        lines = [f"{RED}{BOLD}[X] Gagal eksekusi order Binance!{RESET}", f"{RED}    └─ Error {r['status_code']}/{r['code']}: {r['message']}{RESET}"]
+    elif r['kind'] == 'network':
+        lines = [f"{RED}{BOLD}[X] Gagal mengirim order (Network Error)!{RESET}", f"{RED}    └─ {r['message']}{RESET}"]
+    elif r['kind'] == 'rate_limit':
+        lines = [f"{RED}{BOLD}[X] Order tidak dikirim (rate limit Binance)!{RESET}", f"{RED}    └─ {r['message']}{RESET}"]
+    else:
+        lines = [f"{RED}{BOLD}[X] Error tidak dikenal saat eksekusi order:{RESET}", f"{RED}    └─ {r['message']}{RESET}"]
+    if r.get('hint'): lines.append(f"{YELLOW}       ↳ {r['hint']}{RESET}")
+    return '\n'.join(lines)
+
+def _render_signals_netted(r):
+    result = f"{abs(r['net'])}x {'BUY' if r['net'] > 0 else 'SELL'}" if r['net'] else "tidak ada order"
+    return f"{YELLOW}[~] Netting {r['pair']}: {r['buys']} BUY vs {r['sells']} SELL -> {result}.{RESET}"
+
+def _render_order_done(r):
+    status_desc = f"{GREEN}selesai{RESET}" if r['ok'] else f"{RED}gagal{RESET}"
+    return f"{MAGENTA}[ORDER]{RESET} {r['side']} {r['pair']} {status_desc} {DIM}| antre {r['queue_ms']:.0f} ms | eksekusi {r['exec_ms']:.0f} ms{RESET}"
+
+def _render_config_reloaded(r):
+    lines = [f"\n{GREEN}[OK] {CONFIG_FILE} dimuat ulang{' (SIGHUP)' if r['reason'] == 'sighup' else ''}: {', '.join(r['changed'])}. "
+             f"{DIM}(berlaku untuk email berikutnya, koneksi tetap){RESET}"]
+    if r['restart_needed']:
+        lines.append(f"{YELLOW}[!] Perlu restart listener agar berlaku: {', '.join(r['restart_needed'])}.{RESET}")
+    return '\n'.join(lines)
+
+CONSOLE_RENDERERS = { # event -> (level, fungsi render). Event tanpa renderer hanya masuk file.
+    'listener_started': ('info', _render_listener_started),
+    'listener_stopped': ('warning', lambda r: f"\n{YELLOW}{BOLD}[INFO] Listener dihentikan.{RESET} {DIM}({r['stats']}){RESET}"),
+    'imap_connected': ('info', _render_imap_connected),
+    'new_mail': ('info', lambda r: f"\n{_tag(r)}{GREEN}{BOLD}[!] {r['count']} email baru ditemukan!{RESET}"),
+    'batch_done': ('info', lambda r: f"{_tag(r)}{GREEN}[OK] Selesai proses {r['count']} email. Mendengarkan lagi... {DIM}({r['stats']}){RESET}"),
+    'email_received': ('info', _render_email_received),
+    'rule_matched': ('warning', _render_rule_matched), # Sinyal selalu tampil, juga di mode quiet
+    'signal_unmatched': ('info', _render_signal_unmatched),
+    'email_done': ('info', _box_footer),
+    'email_failed': ('error', _render_email_failed),
+    'emails_seen': ('info', lambda r: f"{DIM}[i] {r['count']} email ditandai sudah dibaca.{RESET}"),
+    'signal_duplicate': ('warning', lambda r: f"{CYAN}│{RESET} {YELLOW}[=] Sinyal {r['action'].upper()} {r['pair']} duplikat "
+                                              f"({'Message-ID' if r['reason'] == 'message_id' else 'isi'} sama dalam {r['window']:g} detik). Order tidak dikirim.{RESET}"),
+    'signal_held': ('info', lambda r: f"{CYAN}│{RESET} {DIM}[~] Sinyal {r['action'].upper()} {r['pair']} ditahan {r['seconds']:g} detik untuk netting.{RESET}"),
+    'signals_netted': ('warning', _render_signals_netted),
+    'order_queued': ('info', lambda r: f"{CYAN}│{RESET} {DIM}[ORDER] {r['side']} {r['pair']} masuk antrean eksekusi.{RESET}"),
+    'order_rejected': ('error', lambda r: f"{RED}[X] Order {r['side']} {r['pair']} tidak dikirim: {r['reason']}.{RESET}"),
+    'order_sent': ('info', lambda r: f"{MAGENTA}{BOLD}[ACTION]{RESET} Eksekusi Binance: {r['desc']}..."),
+    'order_filled': ('warning', _render_order_filled),
+    'order_failed': ('error', _render_order_failed),
+    'order_done': ('info', _render_order_done),
+    'config_reloaded': ('warning', _render_config_reloaded),
+    'config_reload_failed': ('error', lambda r: f"\n{RED}[X] Gagal memuat ulang {CONFIG_FILE}: {r['error']}. Pengaturan lama tetap dipakai.{RESET}"),
+    'rate_limited': ('warning', lambda r: f"{YELLOW}[!] Binance membalas {r['status']} (rate limit). Request dijeda {r['retry_after']} detik.{RESET} "
+                                          f"{DIM}(weight 1m: {r['used_weight'] or '-'}, order 10s: {r['order_count'] or '-'}){RESET}"),
+}
+
 # --- Fungsi Konfigurasi ---
-# (load_settings & save_settings tetap sama)
+# (load_settings -> Settings tervalidasi, save_settings menulis secara atomik)
+def validate_settings(loaded_settings):
+    """Gabungkan isi config dengan default & koreksi nilai yang tidak valid (tanpa menyimpan)."""
+    settings = dict(DEFAULT_SETTINGS) # Mulai dengan default
+    valid_keys = set(DEFAULT_SETTINGS.keys())
+    filtered_settings = {k: v for k, v in loaded_settings.items() if k in valid_keys}
+    settings.update(filtered_settings) # Timpa default dengan yg dari file
+
+    # Validasi tambahan (minimal)
+    for key in ("email_address", "app_password", "imap_server", "target_keyword", "trigger_keyword",
+                "trading_pair", "binance_api_key", "binance_api_secret"):
+        if not isinstance(settings.get(key), str): settings[key] = DEFAULT_SETTINGS[key] # Mis. null / angka: jangan gagalkan seluruh config
+    if not isinstance(settings.get("check_interval_seconds", 10), int) or settings.get("check_interval_seconds") < 5:
+        settings["check_interval_seconds"] = 10
+    if not isinstance(settings.get("buy_quote_quantity"), (int, float)) or settings.get("buy_quote_quantity") <= 0:
+        settings["buy_quote_quantity"] = DEFAULT_SETTINGS['buy_quote_quantity']
+    if not isinstance(settings.get("sell_base_quantity"), (int, float)) or settings.get("sell_base_quantity") < 0:
+        settings["sell_base_quantity"] = DEFAULT_SETTINGS['sell_base_quantity']
+    if not isinstance(settings.get("execute_binance_orders"), bool):
+        settings["execute_binance_orders"] = False
+    if not isinstance(settings.get("order_workers"), int) or settings.get("order_workers") < 1:
+        settings["order_workers"] = DEFAULT_SETTINGS['order_workers']
+    if not isinstance(settings.get("order_queue_size"), int) or settings.get("order_queue_size") < 1:
+        settings["order_queue_size"] = DEFAULT_SETTINGS['order_queue_size']
+    if not isinstance(settings.get("binance_pool_size"), int) or settings.get("binance_pool_size") < 1:
+        settings["binance_pool_size"] = DEFAULT_SETTINGS['binance_pool_size']
+    if not isinstance(settings.get("binance_keepalive_seconds"), int) or settings.get("binance_keepalive_seconds") < 5:
+        settings["binance_keepalive_seconds"] = DEFAULT_SETTINGS['binance_keepalive_seconds']
+    if not isinstance(settings.get("binance_api_url"), str):
+        settings["binance_api_url"] = DEFAULT_SETTINGS['binance_api_url']
+    if not isinstance(settings.get("binance_max_rate_wait_seconds"), (int, float)) or settings.get("binance_max_rate_wait_seconds") < 0:
+        settings["binance_max_rate_wait_seconds"] = DEFAULT_SETTINGS['binance_max_rate_wait_seconds']
+    if not isinstance(settings.get("symbol_cache_ttl_seconds"), int) or settings.get("symbol_cache_ttl_seconds") < 60:
+        settings["symbol_cache_ttl_seconds"] = DEFAULT_SETTINGS['symbol_cache_ttl_seconds']
+    if not isinstance(settings.get("imap_port"), int) or not 0 <= settings.get("imap_port") <= 65535:
+        settings["imap_port"] = DEFAULT_SETTINGS['imap_port']
+    if not isinstance(settings.get("imap_use_ssl"), bool):
+        settings["imap_use_ssl"] = DEFAULT_SETTINGS['imap_use_ssl']
+    if not isinstance(settings.get("use_imap_idle"), bool):
+        settings["use_imap_idle"] = DEFAULT_SETTINGS['use_imap_idle']
+    if not isinstance(settings.get("use_partial_fetch"), bool):
+        settings["use_partial_fetch"] = DEFAULT_SETTINGS['use_partial_fetch']
+    if not isinstance(settings.get("header_match_include_sender"), bool):
+        settings["header_match_include_sender"] = DEFAULT_SETTINGS['header_match_include_sender']
+    if not isinstance(settings.get("body_fetch_max_bytes"), int) or settings.get("body_fetch_max_bytes") < 0:
+        settings["body_fetch_max_bytes"] = DEFAULT_SETTINGS['body_fetch_max_bytes'] # 0 = tanpa batas
+    for key in SEARCH_FILTER_KEYS:
+        if not is_valid_search_filter({key: settings.get(key)}):
+            print(f"{YELLOW}[!] '{key}' di '{CONFIG_FILE}' tidak valid (harus teks ASCII satu baris) & diabaikan.{RESET}")
+            settings[key] = DEFAULT_SETTINGS[key]
+    for key in ("signal_dedupe_seconds", "signal_net_seconds"):
+        if not isinstance(settings.get(key), (int, float)) or isinstance(settings.get(key), bool) or settings.get(key) < 0:
+            settings[key] = DEFAULT_SETTINGS[key]
+    if not isinstance(settings.get("event_log_file"), str):
+        settings["event_log_file"] = DEFAULT_SETTINGS['event_log_file'] # "" = tanpa file event
+    if not isinstance(settings.get("quiet_console"), bool):
+        settings["quiet_console"] = DEFAULT_SETTINGS['quiet_console']
+    if not isinstance(settings.get("config_reload_seconds"), (int, float)) or isinstance(settings.get("config_reload_seconds"), bool) or settings.get("config_reload_seconds") < 0:
+        settings["config_reload_seconds"] = DEFAULT_SETTINGS['config_reload_seconds']
+    if not isinstance(settings.get("mailboxes"), list):
+        settings["mailboxes"] = []
+    # Entri mailboxes / signal_rules yang tidak valid tetap disimpan (bisa diperbaiki di file), hanya diabaikan saat jalan
+    invalid_mailboxes = [m for m in settings["mailboxes"] if not is_valid_mailbox(m)]
+    if invalid_mailboxes:
+        print(f"{YELLOW}[!] {len(invalid_mailboxes)} mailbox di '{CONFIG_FILE}' tidak valid & diabaikan.{RESET}")
+    if not isinstance(settings.get("signal_rules"), list):
+        settings["signal_rules"] = []
+    invalid_rules = [r for r in settings["signal_rules"] if not is_valid_signal_rule(r)]
+    if invalid_rules:
+        print(f"{YELLOW}[!] {len(invalid_rules)} aturan sinyal di '{CONFIG_FILE}' tidak valid & diabaikan.{RESET}")
+    return settings
+
 def load_settings():
-    """Memuat pengaturan dari file JSON, memastikan semua kunci ada."""
-    settings = DEFAULT_SETTINGS.copy() # Mulai dengan default
+    """Memuat config.json jadi Settings tervalidasi, menyimpan ulang jika ada koreksi / kunci baru."""
+    settings = Settings() # Mulai dengan default
     if os.path.exists(CONFIG_FILE):
         try:
             with open(CONFIG_FILE, 'r') as f:
                 loaded_settings = json.load(f)
-                valid_keys = set(DEFAULT_SETTINGS.keys())
-                filtered_settings = {k: v for k, v in loaded_settings.items() if k in valid_keys}
-                settings.update(filtered_settings) # Timpa default dengan yg dari file
-
-                # Validasi tambahan (minimal)
-                if not isinstance(settings.get("check_interval_seconds", 10), int) or settings.get("check_interval_seconds") < 5:
-                    settings["check_interval_seconds"] = 10
-                if not isinstance(settings.get("buy_quote_quantity"), (int, float)) or settings.get("buy_quote_quantity") <= 0:
-                    settings["buy_quote_quantity"] = DEFAULT_SETTINGS['buy_quote_quantity']
-                if not isinstance(settings.get("sell_base_quantity"), (int, float)) or settings.get("sell_base_quantity") < 0:
-                    settings["sell_base_quantity"] = DEFAULT_SETTINGS['sell_base_quantity']
-                if not isinstance(settings.get("execute_binance_orders"), bool):
-                    settings["execute_binance_orders"] = False
-
-                # Save back jika ada koreksi atau penambahan default key
-                current_settings_in_file = json.dumps({k: loaded_settings.get(k) for k in DEFAULT_SETTINGS if k in loaded_settings}, sort_keys=True)
-                potentially_corrected_settings = json.dumps({k: settings.get(k, DEFAULT_SETTINGS[k]) for k in DEFAULT_SETTINGS}, sort_keys=True)
-                if current_settings_in_file != potentially_corrected_settings:
-                     save_settings(settings) # Save hanya jika ada perbedaan
+            settings = Settings.from_dict(loaded_settings)
+
+            # Save back jika ada koreksi atau penambahan default key
+            if {k: v for k, v in loaded_settings.items() if k in DEFAULT_SETTINGS} != settings.to_dict():
+                save_settings(settings)
 
         except json.JSONDecodeError:
             print(f"{RED}[ERROR] File konfigurasi '{CONFIG_FILE}' rusak. Menggunakan default & menyimpan ulang.{RESET}")
@@ -158,22 +521,17 @@ def load_settings():
     return settings
 
 def save_settings(settings):
-    """Menyimpan pengaturan ke file JSON."""
-    try:
-        # Pastikan tipe data benar sebelum menyimpan
-        settings['check_interval_seconds'] = int(settings.get('check_interval_seconds', DEFAULT_SETTINGS['check_interval_seconds']))
-        settings['buy_quote_quantity'] = float(settings.get('buy_quote_quantity', DEFAULT_SETTINGS['buy_quote_quantity']))
-        settings['sell_base_quantity'] = float(settings.get('sell_base_quantity', DEFAULT_SETTINGS['sell_base_quantity']))
-        settings['execute_binance_orders'] = bool(settings.get('execute_binance_orders', DEFAULT_SETTINGS['execute_binance_orders']))
+    """Validasi lalu simpan pengaturan (Settings / dict hasil edit) ke JSON. Return Settings yang disimpan.
 
-        settings_to_save = {k: settings.get(k, DEFAULT_SETTINGS[k]) for k in DEFAULT_SETTINGS}
-
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(settings_to_save, f, indent=2, sort_keys=True) # Indent 2 untuk file lebih kecil
-        # Pesan sukses simpan biasanya dipanggil setelah user edit, bukan saat load
+    Ditulis lewat file sementara + fsync + rename: crash saat menyimpan tidak
+    pernah meninggalkan config.json setengah jadi.
+    """
+    if not isinstance(settings, Settings): settings = Settings.from_dict(settings)
+    try:
+        write_json_atomic(CONFIG_FILE, settings.to_dict())
     except Exception as e:
         print(f"{RED}[ERROR] Gagal menyimpan konfigurasi: {e}{RESET}")
-
+    return settings
 
 # --- Fungsi Utilitas Email & Beep ---
 # (decode_mime_words, get_text_from_email, trigger_beep tetap sama)
@@ -190,58 +548,608 @@ def decode_mime_words(s):
         return "".join(result)
     except Exception: return str(s) if isinstance(s, str) else "[DecodeErr]"
 
+def iter_email_text(msg):
+    """Potongan teks semua bagian text/plain (bukan attachment), di-decode bertahap per bagian."""
+    multipart = msg.is_multipart()
+    for part in (msg.walk() if multipart else (msg,)):
+        if part.get_content_type() != "text/plain": continue
+        if multipart and "attachment" in str(part.get("Content-Disposition")).lower(): continue
+        try:
+            charset = part.get_content_charset() or 'utf-8'
+            payload = part.get_payload(decode=True)
+        except Exception: continue # Abaikan bagian yg error decode
+        if not payload: continue
+        yield from iter_body_chunks(payload, None, charset)
+        if multipart: yield "\n" # Pemisah antar bagian
+
+def iter_raw_email_text(msg):
+    """Isi mentah (belum di-decode) bagian text/plain yang sama dengan iter_email_text, sebagai bytes."""
+    multipart = msg.is_multipart()
+    for part in (msg.walk() if multipart else (msg,)):
+        if part.get_content_type() != "text/plain": continue
+        if multipart and "attachment" in str(part.get("Content-Disposition")).lower(): continue
+        payload = part.get_payload()
+        if isinstance(payload, str): yield payload.encode('utf-8', 'surrogateescape')
+
+def body_fingerprint(payloads):
+    """SHA-1 atas seluruh body text/plain mentah yang diambil (tanpa decode), untuk deteksi email kembar."""
+    hasher = hashlib.sha1()
+    for payload in payloads: hasher.update(payload)
+    return hasher.hexdigest()
+
+class TextNormalizer:
+    """Padanan bertahap " ".join(teks.split()).lower() untuk potongan teks berurutan."""
+    def __init__(self):
+        self.started = False # Sudah ada kata yang dikeluarkan
+        self.gap = False # Ada spasi tertunda sebelum kata berikutnya
+
+    def feed(self, text):
+        words = text.split()
+        if not words:
+            if text: self.gap = True
+            return ""
+        sep = " " if self.started and (self.gap or text[0].isspace()) else ""
+        self.started, self.gap = True, text[-1].isspace()
+        return sep + " ".join(words).lower()
+
 def get_text_from_email(msg):
-    text_content = ""
-    if msg.is_multipart():
-        for part in msg.walk():
-            ctype = part.get_content_type()
-            cdisp = str(part.get("Content-Disposition"))
-            if ctype == "text/plain" and "attachment" not in cdisp.lower():
-                try:
-                    charset = part.get_content_charset() or 'utf-8'
-                    payload = part.get_payload(decode=True)
-                    if payload: text_content += payload.decode(charset, errors='replace') + "\n"
-                except Exception: pass # Abaikan bagian yg error decode
-    else:
-        if msg.get_content_type() == "text/plain":
-            try:
-                charset = msg.get_content_charset() or 'utf-8'
-                payload = msg.get_payload(decode=True)
-                if payload: text_content = payload.decode(charset, errors='replace')
-            except Exception: pass
-    return " ".join(text_content.split()).lower()
+    normalizer = TextNormalizer()
+    return "".join(normalizer.feed(chunk) for chunk in iter_email_text(msg))
+
+BEEP_PATTERNS = { # (frekuensi, durasi ms) per nada, jeda 0.1 detik antar nada
+    "buy": [("1000", "300"), ("1200", "200")],
+    "sell": [("700", "500")],
+}
 
 def trigger_beep(action):
     try:
-        prefix = f"{MAGENTA}{BOLD}[ACTION]{RESET}"
-        if action == "buy":
-            print(f"{prefix} Beep 'BUY'")
-            subprocess.run(["beep", "-f", "1000", "-l", "300"], check=True, capture_output=True)
-            time.sleep(0.1)
-            subprocess.run(["beep", "-f", "1200", "-l", "200"], check=True, capture_output=True)
-        elif action == "sell":
-            print(f"{prefix} Beep 'SELL'")
-            subprocess.run(["beep", "-f", "700", "-l", "500"], check=True, capture_output=True)
-        else: print(f"{YELLOW}[WARN] Aksi beep '{action}' tidak dikenal.{RESET}")
+        pattern = BEEP_PATTERNS.get(action)
+        if not pattern:
+            print(f"{YELLOW}[WARN] Aksi beep '{action}' tidak dikenal.{RESET}"); return
+        print(f"{MAGENTA}{BOLD}[ACTION]{RESET} Beep '{action.upper()}'")
+        for idx, (freq, length) in enumerate(pattern):
+            if idx: time.sleep(0.1)
+            subprocess.run(["beep", "-f", freq, "-l", length], check=True, capture_output=True)
+    except FileNotFoundError:
+        print(f"{YELLOW}[WARN] Perintah 'beep' tidak ditemukan. {DIM}(Coba: pkg install beep){RESET}")
+    except Exception: pass # Jangan crash jika beep error
+
+async def trigger_beep_async(action):
+    """Versi asyncio trigger_beep: subprocess tanpa thread, bisa dibatalkan kapan saja."""
+    try:
+        pattern = BEEP_PATTERNS.get(action)
+        if not pattern:
+            print(f"{YELLOW}[WARN] Aksi beep '{action}' tidak dikenal.{RESET}"); return
+        print(f"{MAGENTA}{BOLD}[ACTION]{RESET} Beep '{action.upper()}'")
+        for idx, (freq, length) in enumerate(pattern):
+            if idx: await asyncio.sleep(0.1)
+            proc = await asyncio.create_subprocess_exec("beep", "-f", freq, "-l", length,
+                                                        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+            try: await proc.wait()
+            except asyncio.CancelledError:
+                if proc.returncode is None: proc.kill()
+                raise
     except FileNotFoundError:
         print(f"{YELLOW}[WARN] Perintah 'beep' tidak ditemukan. {DIM}(Coba: pkg install beep){RESET}")
+    except asyncio.CancelledError: raise
     except Exception: pass # Jangan crash jika beep error
 
+# --- Sesi Binance (Koneksi Pooled & Keep-Alive) ---
+_request_timing = threading.local() # Waktu request terakhir per thread (worker order / keepalive)
+
+def get_last_request_timing():
+    """(total_detik, connect_detik) request Binance terakhir di thread ini, atau None."""
+    return getattr(_request_timing, 'last', None)
+
+class BinanceRequestStats:
+    """Statistik waktu request Binance: connect (TCP+TLS) vs sisa (kirim + waktu server)."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.new_connections = 0
+        self.connect_total = 0.0
+        self.server_total = 0.0
+
+    def record(self, total_seconds, connect_seconds):
+        with self.lock:
+            self.count += 1
+            if connect_seconds > 0: self.new_connections += 1
+            self.connect_total += connect_seconds
+            self.server_total += total_seconds - connect_seconds
+
+    def summary(self):
+        with self.lock:
+            if not self.count: return "Binance: belum ada request"
+            avg_connect = self.connect_total / self.new_connections * 1000 if self.new_connections else 0
+            return (f"Binance: {self.count} request | koneksi baru {self.new_connections}x (avg {avg_connect:.0f} ms) "
+                    f"| server avg {self.server_total / self.count * 1000:.0f} ms")
+
+def _define_keepalive_adapter():
+    """Buat kelas KeepAliveAdapter (butuh requests/urllib3, dipanggil dari load_binance)."""
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection, HTTPSConnection
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    class _ConnectTimerMixin:
+        """Catat durasi connect (TCP, + TLS untuk HTTPS) koneksi urllib3 baru."""
+        def connect(self):
+            started = time.perf_counter()
+            super().connect()
+            _request_timing.connect_seconds = getattr(_request_timing, 'connect_seconds', 0.0) + time.perf_counter() - started
+
+    class TimedHTTPConnection(_ConnectTimerMixin, HTTPConnection): pass
+    class TimedHTTPSConnection(_ConnectTimerMixin, HTTPSConnection): pass
+
+    class TimedHTTPConnectionPool(HTTPConnectionPool):
+        ConnectionCls = TimedHTTPConnection
+
+    class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+        ConnectionCls = TimedHTTPSConnection
+
+    class KeepAliveAdapter(HTTPAdapter):
+        """HTTPAdapter dengan ukuran pool tetap, TCP keepalive & pencatatan waktu per request."""
+        def __init__(self, pool_size=4, stats=None):
+            self.stats = stats
+            super().__init__(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+
+        def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+            socket_options = list(HTTPConnection.default_socket_options) + [(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)]
+            for opt_name, value in (('TCP_KEEPIDLE', 30), ('TCP_KEEPINTVL', 10), ('TCP_KEEPCNT', 3)):
+                if hasattr(socket, opt_name): socket_options.append((socket.IPPROTO_TCP, getattr(socket, opt_name), value))
+            pool_kwargs['socket_options'] = socket_options
+            super().init_poolmanager(connections, maxsize, block, **pool_kwargs)
+            self.poolmanager.pool_classes_by_scheme = {'http': TimedHTTPConnectionPool, 'https': TimedHTTPSConnectionPool}
+
+        def send(self, request, **kwargs):
+            _request_timing.rate_wait = BINANCE_RATE_LIMITER.acquire(request.method, request.path_url) # Bisa menunggu / raise RateLimitWait
+            _request_timing.connect_seconds = 0.0
+            started = time.perf_counter()
+            response = None
+            try:
+                response = super().send(request, **kwargs)
+                return response
+            finally:
+                total = time.perf_counter() - started
+                connect = min(_request_timing.connect_seconds, total)
+                _request_timing.last = (total, connect)
+                if self.stats: self.stats.record(total, connect)
+                if response is not None: BINANCE_RATE_LIMITER.observe(response)
+
+    return KeepAliveAdapter
+
+# --- Sinkronisasi Waktu Server Binance ---
+class BinanceTimeSync:
+    """Estimasi selisih jam lokal vs server Binance untuk timestamp request bertanda tangan.
+
+    Tiap sampel: offset = serverTime - titik tengah request (gaya NTP).
+    Sampel dengan RTT jauh di atas RTT minimum dibobot lebih kecil karena
+    asimetri jaringannya lebih besar. Offset, jitter & RTT dihaluskan EWMA.
+    """
+    ALPHA = 0.25
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.offset_ms = None
+        self.jitter_ms = 0.0
+        self.rtt_ms = None
+        self.min_rtt_ms = None
+        self.samples = 0
+        self.last_sync = None
+
+    def sample(self, client):
+        """Ambil satu sampel /time dan perbarui estimasi. Sekaligus menjaga koneksi tetap hangat."""
+        started = time.time()
+        server_ms = client.get_server_time()['serverTime']
+        finished = time.time()
+        rtt_ms = (finished - started) * 1000
+        offset_ms = server_ms - (started + finished) / 2 * 1000
+        with self.lock:
+            self.min_rtt_ms = rtt_ms if self.min_rtt_ms is None else min(self.min_rtt_ms, rtt_ms)
+            if self.offset_ms is None:
+                self.offset_ms, self.rtt_ms = offset_ms, rtt_ms
+            else:
+                weight = self.ALPHA * min(1.0, (self.min_rtt_ms + 1) / (rtt_ms + 1))
+                self.jitter_ms += self.ALPHA * (abs(offset_ms - self.offset_ms) - self.jitter_ms)
+                self.offset_ms += weight * (offset_ms - self.offset_ms)
+                self.rtt_ms += self.ALPHA * (rtt_ms - self.rtt_ms)
+            self.samples += 1
+            self.last_sync = datetime.datetime.now()
+
+    def apply(self, client):
+        """Pasang offset ke client; python-binance menambahkannya ke setiap timestamp."""
+        if self.offset_ms is not None: client.timestamp_offset = int(round(self.offset_ms))
+
+    def sync(self, client, samples=1):
+        for _ in range(samples): self.sample(client)
+        self.apply(client)
+
+    def status_text(self):
+        with self.lock:
+            if self.offset_ms is None: return f"{DIM}belum diukur{RESET}"
+            color = GREEN if abs(self.offset_ms) < 500 else YELLOW if abs(self.offset_ms) < 1000 else RED
+            return (f"offset {color}{self.offset_ms:+.0f} ms{RESET} | jitter {self.jitter_ms:.0f} ms | RTT {self.rtt_ms:.0f} ms "
+                    f"{DIM}({self.samples} sampel, {self.last_sync.strftime('%H:%M:%S')}){RESET}")
+
+BINANCE_TIME_SYNC = BinanceTimeSync()
+
+# --- Pembatas Rate Binance (Weight & Order Count) ---
+class RateLimitWait(Exception):
+    """Request dibatalkan karena harus menunggu rate limit lebih lama dari batas."""
+
+class TokenBucket:
+    """Token bucket: kapasitas penuh di awal, terisi ulang linear (kapasitas per periode)."""
+    def __init__(self, capacity, period):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def set_capacity(self, capacity, period):
+        self._refill()
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = min(self.tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        """Detik sampai amount token tersedia (0 = sekarang)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount):
+        self.tokens -= min(amount, self.capacity)
+
+    def sync_used(self, used):
+        """Samakan dengan pemakaian versi server (header), termasuk request proses lain dari IP yang sama."""
+        self._refill()
+        self.tokens = min(self.tokens, self.capacity - used)
+
+class BinanceRateLimiter:
+    """Penjadwal request Binance berdasarkan weight per menit & jumlah order per 10 detik.
+
+    Dua token bucket (dikalibrasi dari rateLimits exchangeInfo, dengan margin
+    SAFETY) meratakan laju request. Header X-MBX-USED-WEIGHT-1M /
+    X-MBX-ORDER-COUNT-10S dari tiap respons menyamakan bucket dengan hitungan
+    server; jika jatah jendela (tetap, reset tiap menit / 10 detik jam server)
+    sudah habis, request ditahan sampai jendela berikutnya. Respons 429/418
+    menjeda semua request sampai Retry-After habis.
+    Jika jeda melebihi max_wait, request dibatalkan (RateLimitWait) supaya
+    order basi tidak dikirim belakangan.
+    """
+    SAFETY = 0.9
+    REQUEST_WEIGHTS = {'exchangeInfo': 20, 'avgPrice': 2} # Endpoint lain (order, time, ping) weight 1
+    DEFAULT_RETRY_AFTER = {429: 10, 418: 120} # Jika server tidak mengirim Retry-After
+
+    def __init__(self, weight_limit=6000, order_limit=100):
+        self.lock = threading.Lock()
+        self.weight = TokenBucket(weight_limit * self.SAFETY, 60)
+        self.orders = TokenBucket(order_limit * self.SAFETY, 10)
+        self.blocked_until = 0.0 # time.monotonic(), semua request (429/418 atau weight habis)
+        self.orders_blocked_until = 0.0 # Jatah order jendela 10 detik habis
+        self.max_wait = 10.0
+        self.used_weight = None # Nilai header terakhir
+        self.order_count = None
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.limited = {429: 0, 418: 0}
+
+    def update_limits(self, rate_limits):
+        """Pakai batas resmi dari exchangeInfo['rateLimits'] (jika ada)."""
+        for limit in rate_limits or []:
+            kind, interval, num = limit.get('rateLimitType'), limit.get('interval'), limit.get('intervalNum')
+            with self.lock:
+                if kind == 'REQUEST_WEIGHT' and interval == 'MINUTE' and num == 1:
+                    self.weight.set_capacity(limit['limit'] * self.SAFETY, 60)
+                elif kind == 'ORDERS' and interval == 'SECOND' and num == 10:
+                    self.orders.set_capacity(limit['limit'] * self.SAFETY, 10)
+
+    def acquire(self, method, path_url):
+        """Tunggu sampai request boleh dikirim, lalu ambil token-nya. Return detik menunggu."""
+        endpoint = path_url.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+        is_order = method == 'POST' and endpoint == 'order'
+        weight = self.REQUEST_WEIGHTS.get(endpoint, 1)
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                wait = max(self.blocked_until - now, self.weight.wait_time(weight),
+                           max(self.orders_blocked_until - now, self.orders.wait_time(1)) if is_order else 0.0)
+                if wait <= 0:
+                    self.weight.take(weight)
+                    if is_order: self.orders.take(1)
+                    if waited:
+                        self.throttled += 1
+                        self.wait_total += waited
+                    return waited
+                if waited + wait > self.max_wait:
+                    raise RateLimitWait(f"Harus menunggu rate limit {waited + wait:.1f} detik (maks {self.max_wait:g} detik).")
+            time.sleep(wait)
+            waited += wait
+
+    def observe(self, response):
+        """Sinkronkan bucket dengan header respons; 429/418 -> jeda sesuai Retry-After."""
+        headers = response.headers
+        used_weight, order_count = headers.get('X-MBX-USED-WEIGHT-1M'), headers.get('X-MBX-ORDER-COUNT-10S')
+        status = response.status_code
+        with self.lock:
+            try:
+                if used_weight is not None:
+                    self.used_weight = int(used_weight)
+                    self.weight.sync_used(self.used_weight)
+                    if self.used_weight >= self.weight.capacity:
+                        self.blocked_until = max(self.blocked_until, time.monotonic() + self._window_remaining(60))
+                if order_count is not None:
+                    self.order_count = int(order_count)
+                    self.orders.sync_used(self.order_count)
+                    if self.order_count >= self.orders.capacity:
+                        self.orders_blocked_until = max(self.orders_blocked_until, time.monotonic() + self._window_remaining(10))
+            except ValueError: pass
+            if status not in self.limited: return
+            try: retry_after = int(headers.get('Retry-After'))
+            except (TypeError, ValueError): retry_after = self.DEFAULT_RETRY_AFTER[status]
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.limited[status] += 1
+        EVENTS.emit('rate_limited', status=status, retry_after=retry_after, used_weight=self.used_weight, order_count=self.order_count)
+
+    @staticmethod
+    def _window_remaining(period):
+        """Detik sampai jendela rate limit berikutnya (jendela Binance sejajar jam server)."""
+        server_now = time.time() + (BINANCE_TIME_SYNC.offset_ms or 0) / 1000
+        return period - server_now % period
+
+    def summary(self):
+        with self.lock:
+            parts = [f"weight 1m {self.used_weight if self.used_weight is not None else '-'}",
+                     f"order 10s {self.order_count if self.order_count is not None else '-'}"]
+            if self.throttled: parts.append(f"dijeda {self.throttled}x ({self.wait_total:.1f} s)")
+            if any(self.limited.values()): parts.append(f"429: {self.limited[429]}x, 418: {self.limited[418]}x")
+            return "Rate limit: " + " | ".join(parts)
+
+BINANCE_RATE_LIMITER = BinanceRateLimiter()
+
+class BinanceSession:
+    """Client Binance dengan koneksi pooled yang dijaga tetap hangat di background.
+
+    Thread keepalive mengambil sampel waktu server secara berkala (sekaligus
+    berfungsi sebagai ping) supaya socket di pool tidak ditutup server dan
+    offset timestamp tetap akurat. Jika gagal, client dibuat ulang.
+    """
+    def __init__(self, settings):
+        self.settings = settings
+        self.stats = BinanceRequestStats()
+        self.client = None
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def connect(self):
+        self.client = get_binance_client(self.settings, self.stats)
+        if self.client: self._maintain_symbol_filters(self.client)
+        return self.client
+
+    def _maintain_symbol_filters(self, client):
+        """Segarkan cache filter simbol (jika kedaluwarsa) & harga rata-rata untuk cek notional."""
+        for pair in signal_rule_pairs(self.settings):
+            SYMBOL_FILTERS.ensure(client, pair, self.settings.symbol_cache_ttl_seconds)
+            SYMBOL_FILTERS.refresh_avg_price(client, pair)
+
+    def start_keepalive(self):
+        if self._thread: return
+        self._thread = threading.Thread(target=self._keepalive_loop, name="binance-keepalive", daemon=True)
+        self._thread.start()
+
+    def _keepalive_loop(self):
+        interval = max(5, self.settings.binance_keepalive_seconds)
+        while not self._stop_event.wait(interval):
+            client = self.client
+            try:
+                if client: BINANCE_TIME_SYNC.sync(client)
+                else: raise ConnectionError("client belum ada")
+            except RateLimitWait:
+                continue # Sedang dijeda rate limit, koneksi tidak perlu dibuat ulang
+            except Exception:
+                print(f"\n{YELLOW}[!] Ping Binance gagal. Mencoba reconnect Binance...{RESET}")
+                new_client = get_binance_client(self.settings, self.stats)
+                if new_client: self.client = new_client
+                continue
+            self._maintain_symbol_filters(client)
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread: self._thread.join(2)
+
+# --- Cache Filter Simbol Binance (exchangeInfo) ---
+def _to_decimal(value):
+    """Konversi angka/string filter Binance ke Decimal. Nilai kosong/nol -> None."""
+    try:
+        d = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+    return d if d > 0 else None
+
+def _round_down_step(value, step):
+    """Bulatkan ke bawah ke kelipatan step (tanpa float)."""
+    if not step: return value
+    return (value / step).to_integral_value(rounding=ROUND_DOWN) * step
+
+def _format_decimal(value):
+    """Format Decimal tanpa notasi eksponen & nol berlebih (mis. '0.001')."""
+    return format(value.normalize(), 'f')
+
+class SymbolFilters:
+    """Aturan order MARKET satu simbol dari exchangeInfo: LOT_SIZE/MARKET_LOT_SIZE, (MIN_)NOTIONAL, presisi quote."""
+    def __init__(self, info):
+        self.symbol = info.get('symbol', '')
+        self.status = info.get('status', 'TRADING')
+        self.base_asset = info.get('baseAsset', '')
+        self.quote_asset = info.get('quoteAsset', '')
+        quote_precision = info.get('quoteAssetPrecision', info.get('quotePrecision', 8))
+        self.quote_step = Decimal(1).scaleb(-int(quote_precision))
+        filters = {f.get('filterType'): f for f in info.get('filters', [])}
+        lot = filters.get('LOT_SIZE', {})
+        market_lot = filters.get('MARKET_LOT_SIZE', {})
+        # MARKET_LOT_SIZE dengan stepSize 0 berarti ikut LOT_SIZE
+        self.step_size = _to_decimal(market_lot.get('stepSize')) or _to_decimal(lot.get('stepSize'))
+        min_qtys = [q for q in (_to_decimal(lot.get('minQty')), _to_decimal(market_lot.get('minQty'))) if q]
+        max_qtys = [q for q in (_to_decimal(lot.get('maxQty')), _to_decimal(market_lot.get('maxQty'))) if q]
+        self.min_qty = max(min_qtys) if min_qtys else None
+        self.max_qty = min(max_qtys) if max_qtys else None
+        self.tick_size = _to_decimal(filters.get('PRICE_FILTER', {}).get('tickSize'))
+        self.min_notional = None
+        self.max_notional = None
+        if 'NOTIONAL' in filters:
+            notional = filters['NOTIONAL']
+            if notional.get('applyMinToMarket', True): self.min_notional = _to_decimal(notional.get('minNotional'))
+            if notional.get('applyMaxToMarket', False): self.max_notional = _to_decimal(notional.get('maxNotional'))
+        elif 'MIN_NOTIONAL' in filters and filters['MIN_NOTIONAL'].get('applyToMarket', True):
+            self.min_notional = _to_decimal(filters['MIN_NOTIONAL'].get('minNotional'))
+
+    def prepare_buy(self, quote_qty):
+        """Validasi & bulatkan quoteOrderQty. Return (string_qty, None) atau (None, alasan)."""
+        if self.status != 'TRADING': return None, f"status simbol {self.status}"
+        qty = _round_down_step(Decimal(str(quote_qty)), self.quote_step)
+        if qty <= 0: return None, f"{quote_qty} {self.quote_asset} habis setelah dibulatkan ke presisi {_format_decimal(self.quote_step)}"
+        if self.min_notional and qty < self.min_notional:
+            return None, f"{_format_decimal(qty)} {self.quote_asset} < MIN_NOTIONAL {_format_decimal(self.min_notional)}"
+        if self.max_notional and qty > self.max_notional:
+            return None, f"{_format_decimal(qty)} {self.quote_asset} > maxNotional {_format_decimal(self.max_notional)}"
+        return _format_decimal(qty), None
+
+    def prepare_sell(self, base_qty, avg_price=None):
+        """Validasi & bulatkan quantity ke stepSize. Notional dicek jika harga rata-rata diketahui."""
+        if self.status != 'TRADING': return None, f"status simbol {self.status}"
+        qty = _round_down_step(Decimal(str(base_qty)), self.step_size)
+        if qty <= 0: return None, f"{_format_decimal(Decimal(str(base_qty)))} {self.base_asset} habis setelah dibulatkan ke stepSize {_format_decimal(self.step_size)}"
+        if self.min_qty and qty < self.min_qty:
+            return None, f"{_format_decimal(qty)} {self.base_asset} < LOT_SIZE minQty {_format_decimal(self.min_qty)}"
+        if self.max_qty and qty > self.max_qty:
+            return None, f"{_format_decimal(qty)} {self.base_asset} > LOT_SIZE maxQty {_format_decimal(self.max_qty)}"
+        if avg_price and self.min_notional and qty * avg_price < self.min_notional:
+            return None, (f"nilai ~{_format_decimal(_round_down_step(qty * avg_price, self.quote_step))} {self.quote_asset} "
+                          f"< MIN_NOTIONAL {_format_decimal(self.min_notional)}")
+        return _format_decimal(qty), None
+
+class SymbolFilterCache:
+    """Cache filter simbol di memori + disk (dengan TTL), aman dipakai lintas thread.
+
+    Worker order hanya membaca dari memori (tanpa round trip). Penyegaran
+    exchangeInfo & harga rata-rata dilakukan thread keepalive BinanceSession.
+    Entri kedaluwarsa tetap dipakai sampai penyegaran berhasil.
+    """
+    AVG_PRICE_MAX_AGE = 300 # Detik, harga lebih tua dari ini tidak dipakai untuk cek notional
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.entries = None # {symbol: {"fetched_at": epoch, "info": {...}}}, dimuat dari disk saat pertama dipakai
+        self.filters = {}
+        self.avg_prices = {} # {symbol: (Decimal, epoch)}
+
+    def _load_disk(self):
+        if self.entries is not None: return
+        self.entries = {}
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            for symbol, entry in data.items():
+                self.filters[symbol] = SymbolFilters(entry['info'])
+                self.entries[symbol] = entry
+        except Exception as e:
+            print(f"{YELLOW}[!] Cache filter simbol '{self.path}' tidak terbaca ({e}). Akan diambil ulang.{RESET}")
+            self.entries, self.filters = {}, {}
+
+    def get(self, symbol):
+        with self.lock:
+            self._load_disk()
+            return self.filters.get(symbol)
+
+    def avg_price(self, symbol):
+        price, fetched_at = self.avg_prices.get(symbol, (None, 0))
+        return price if time.time() - fetched_at <= self.AVG_PRICE_MAX_AGE else None
+
+    def is_stale(self, symbol, ttl_seconds):
+        with self.lock:
+            self._load_disk()
+            entry = self.entries.get(symbol)
+        return not entry or time.time() - entry.get('fetched_at', 0) > ttl_seconds
+
+    @staticmethod
+    def _exchange_info(client, symbol):
+        """exchangeInfo untuk satu simbol saja (weight kecil), atau seluruh bursa jika tidak bisa.
+
+        API publik python-binance (get_symbol_info / get_exchange_info) selalu
+        mengambil seluruh bursa, jadi dipakai Client._get(path, data=...) yang
+        private (diuji dengan python-binance 1.0.x). Jika signature itu berubah
+        di versi lain, kembali ke get_exchange_info() yang publik.
+        """
+        try:
+            return client._get('exchangeInfo', data={'symbol': symbol})
+        except (AttributeError, TypeError):
+            return client.get_exchange_info()
+
+    def refresh(self, client, symbol):
+        """Ambil exchangeInfo untuk satu simbol lalu simpan ke memori & disk."""
+        try:
+            info = self._exchange_info(client, symbol)
+            BINANCE_RATE_LIMITER.update_limits(info.get('rateLimits'))
+            symbols = info.get('symbols', [])
+            symbol_info = next((s for s in symbols if s.get('symbol') == symbol), None)
+            if not symbol_info:
+                print(f"{YELLOW}[!] Pair '{symbol}' tidak ada di exchangeInfo Binance.{RESET}")
+                return False
+            entry = {'fetched_at': time.time(), 'info': symbol_info}
+            filters = SymbolFilters(symbol_info)
+            with self.lock:
+                self._load_disk()
+                self.entries[symbol] = entry
+                self.filters[symbol] = filters
+                write_json_atomic(self.path, self.entries)
+            return True
+        except Exception as e:
+            print(f"{YELLOW}[!] Gagal memperbarui filter simbol {symbol}: {e}{RESET}")
+            return False
+
+    def refresh_avg_price(self, client, symbol):
+        try:
+            self.avg_prices[symbol] = (Decimal(str(client.get_avg_price(symbol=symbol)['price'])), time.time())
+        except Exception:
+            pass # Tanpa harga, cek notional SELL dilewati (Binance tetap jadi penentu akhir)
+
+    def ensure(self, client, symbol, ttl_seconds):
+        if self.is_stale(symbol, ttl_seconds): self.refresh(client, symbol)
+
+SYMBOL_FILTERS = SymbolFilterCache(SYMBOL_CACHE_FILE)
+
 # --- Fungsi Eksekusi Binance ---
 # (get_binance_client & execute_binance_order tetap sama, mungkin sedikit penyesuaian pesan)
-def get_binance_client(settings):
-    """Membuat instance Binance client."""
-    if not BINANCE_AVAILABLE: return None
-    api_key = settings.get('binance_api_key')
-    api_secret = settings.get('binance_api_secret')
+def get_binance_client(settings, stats=None):
+    """Membuat instance Binance client dengan adapter pooled keep-alive, lalu ping (warm-up)."""
+    if not load_binance(): return None
+    api_key = settings.binance_api_key
+    api_secret = settings.binance_api_secret
     if not api_key or not api_secret:
         print(f"{RED}[!] Kunci API Binance belum diatur.{RESET}")
         return None
     try:
-        print(f"{CYAN}[...] Menghubungkan ke Binance API...{RESET}")
-        client = Client(api_key, api_secret)
-        client.ping()
-        print(f"{GREEN}[OK] Koneksi Binance API berhasil.{RESET}")
+        api_url = settings.binance_api_url.rstrip('/')
+        print(f"{CYAN}[...] Menghubungkan ke Binance API{f' {YELLOW}({api_url}){CYAN}' if api_url else ''}...{RESET}")
+        try:
+            client = Client(api_key, api_secret, ping=False) # Ping nanti lewat adapter pooled
+        except TypeError:
+            client = Client(api_key, api_secret) # python-binance versi lama
+        if api_url: client.API_URL = api_url # Endpoint alternatif (stub lokal untuk uji/benchmark)
+        BINANCE_RATE_LIMITER.max_wait = settings.binance_max_rate_wait_seconds
+        adapter = KeepAliveAdapter(settings.binance_pool_size, stats)
+        client.session.mount('https://', adapter)
+        client.session.mount('http://', adapter)
+        client.ping() # Sekaligus membuka socket pertama di pool
+        BINANCE_TIME_SYNC.sync(client, samples=3)
+        print(f"{GREEN}[OK] Koneksi Binance API berhasil.{RESET} {DIM}Waktu server: {BINANCE_TIME_SYNC.status_text()}{RESET}")
         return client
     except (BinanceAPIException, BinanceOrderException) as e:
         print(f"{RED}{BOLD}[X] Gagal koneksi/autentikasi Binance!{RESET}")
@@ -260,12 +1168,12 @@ def get_binance_client(settings):
         # traceback.print_exc() # Aktifkan jika perlu debug detail
         return None
 
-def execute_binance_order(client, settings, side):
-    """Mengeksekusi order MARKET BUY atau SELL di Binance."""
+def execute_binance_order(client, settings, side, _retry=True, trace=None):
+    """Mengeksekusi order MARKET BUY atau SELL di Binance. trace (opsional) diisi waktu kirim/ack order."""
     if not client: return False # Sudah ada pesan error dari get_client
-    if not settings.get("execute_binance_orders", False): return False # Safety check
+    if not settings.execute_binance_orders: return False # Safety check
 
-    pair = settings.get('trading_pair', '').upper()
+    pair = settings.trading_pair
     if not pair:
         print(f"{RED}[!] Trading pair belum diatur.{RESET}")
         return False
@@ -274,302 +1182,1918 @@ def execute_binance_order(client, settings, side):
     action_desc = ""
     qty = 0
     is_buy = side == Client.SIDE_BUY
+    filters = SYMBOL_FILTERS.get(pair) # Validasi lokal; tanpa cache order dikirim apa adanya
 
     try:
         if is_buy:
-            qty = settings.get('buy_quote_quantity', 0.0)
+            qty = settings.buy_quote_quantity
             if qty <= 0: print(f"{RED}[!] Kuantitas Beli ({qty}) harus > 0.{RESET}"); return False
+            if filters:
+                qty, reject_reason = filters.prepare_buy(qty)
+                if reject_reason: EVENTS.emit('order_rejected', side=side, pair=pair, reason=reject_reason); return False
             order_details = {'symbol': pair, 'side': side, 'type': Client.ORDER_TYPE_MARKET, 'quoteOrderQty': qty}
             action_desc = f"BUY {qty} USDT senilai {pair}" # Asumsi quote = USDT
         else: # SELL
-            qty = settings.get('sell_base_quantity', 0.0)
+            qty = settings.sell_base_quantity
             if qty <= 0: print(f"{YELLOW}[!] Kuantitas Jual ({qty}) <= 0. Order dilewati.{RESET}"); return False # Info, bukan error fatal
+            if filters:
+                qty, reject_reason = filters.prepare_sell(qty, SYMBOL_FILTERS.avg_price(pair))
+                if reject_reason: EVENTS.emit('order_rejected', side=side, pair=pair, reason=reject_reason); return False
             order_details = {'symbol': pair, 'side': side, 'type': Client.ORDER_TYPE_MARKET, 'quantity': qty}
             action_desc = f"SELL {qty} {pair.replace('USDT', '')}" # Asumsi base
 
-        print(f"{MAGENTA}{BOLD}[ACTION]{RESET} Eksekusi Binance: {action_desc}...")
+        EVENTS.emit('order_sent', side=side, pair=pair, qty=str(qty), desc=action_desc)
+        if trace is not None: trace['order_sent'] = time.time()
         order_result = client.create_order(**order_details)
+        if trace is not None:
+            trace['order_sent'] += getattr(_request_timing, 'rate_wait', 0.0) # Jeda rate limit masuk tahap dispatch, bukan exchange
+            trace['order_ack'] = time.time()
+            if order_result.get('transactTime'): # Jam server -> jam lokal pakai offset sinkronisasi waktu
+                trace['transact'] = (order_result['transactTime'] - (BINANCE_TIME_SYNC.offset_ms or 0)) / 1000
 
-        print(f"{GREEN}{BOLD}[SUCCESS]{RESET} Order {side} {pair} berhasil!")
-        # Tampilkan info penting saja
+        # Simpan info penting saja
         filled_qty = float(order_result.get('executedQty', 0))
         filled_quote_qty = float(order_result.get('cummulativeQuoteQty', 0))
-        avg_price = filled_quote_qty / filled_qty if filled_qty else 0
-        print(f"  {DIM}├─ ID     : {order_result.get('orderId')}{RESET}")
-        print(f"  {DIM}├─ Status : {order_result.get('status')}{RESET}")
-        if filled_qty > 0:
-            print(f"  {DIM}├─ Terisi : {filled_qty:.8f} {pair.replace('USDT', '')}{RESET}")
-            print(f"  {DIM}└─ Harga Avg: {avg_price:.4f} USDT{RESET}") # Asumsi USDT
-
+        timing = get_last_request_timing()
+        EVENTS.emit('order_filled', side=side, pair=pair, order_id=order_result.get('orderId'), status=order_result.get('status'),
+                    executed_qty=filled_qty, quote_qty=filled_quote_qty, avg_price=filled_quote_qty / filled_qty if filled_qty else 0,
+                    latency_ms=round(timing[0] * 1000, 1) if timing else None, connect_ms=round(timing[1] * 1000, 1) if timing else None)
         return True
 
     except (BinanceAPIException, BinanceOrderException) as e:
-        print(f"{RED}{BOLD}[X] Gagal eksekusi order Binance!{RESET}")
-        print(f"{RED}    └─ Error {e.status_code}/{e.code}: {e.message}{RESET}")
+        if e.code == -1021 and _retry:
+            # Order ditolak sebelum masuk order book, aman dikirim ulang setelah sinkron waktu
+            print(f"{YELLOW}[!] Timestamp ditolak (-1021). Sinkronisasi ulang waktu server lalu kirim ulang...{RESET}")
+            try: BINANCE_TIME_SYNC.sync(client, samples=3)
+            except Exception: pass
+            return execute_binance_order(client, settings, side, _retry=False, trace=trace)
+        if e.status_code == 429 and _retry:
+            # Ditolak rate limit (belum dieksekusi); limiter menahan request berikutnya sampai Retry-After
+            return execute_binance_order(client, settings, side, _retry=False, trace=trace)
         # Error umum
-        if e.code == -2010: print(f"{YELLOW}       ↳ Saldo tidak cukup?{RESET}")
-        elif e.code == -1121: print(f"{YELLOW}       ↳ Pair '{pair}' tidak valid?{RESET}")
-        elif e.code in [-1013, -2015] or 'MIN_NOTIONAL' in str(e.message): print(f"{YELLOW}       ↳ Nilai order terlalu kecil? (Cek MIN_NOTIONAL){RESET}")
-        elif e.code == -1111 or 'LOT_SIZE' in str(e.message): print(f"{YELLOW}       ↳ Kuantitas tidak sesuai LOT_SIZE?{RESET}")
+        hint = ""
+        if e.code == -2010: hint = "Saldo tidak cukup?"
+        elif e.code == -1121: hint = f"Pair '{pair}' tidak valid?"
+        elif e.code in [-1013, -2015] or 'MIN_NOTIONAL' in str(e.message): hint = "Nilai order terlalu kecil? (Cek MIN_NOTIONAL)"
+        elif e.code == -1111 or 'LOT_SIZE' in str(e.message): hint = "Kuantitas tidak sesuai LOT_SIZE?"
+        elif e.status_code == 418: hint = "IP diblokir sementara karena rate limit. Tunggu sesuai Retry-After."
+        elif e.status_code == 429: hint = "Rate limit Binance tercapai."
+        EVENTS.emit('order_failed', side=side, pair=pair, kind='api', status_code=e.status_code, code=e.code, message=str(e.message), hint=hint)
+        return False
+    except RateLimitWait as e:
+        EVENTS.emit('order_failed', side=side, pair=pair, kind='rate_limit', message=str(e),
+                    hint="Naikkan binance_max_rate_wait_seconds atau kurangi frekuensi sinyal.")
         return False
     except requests.exceptions.RequestException as e:
-         print(f"{RED}{BOLD}[X] Gagal mengirim order (Network Error)!{RESET}")
-         print(f"{RED}    └─ {e}{RESET}")
+         EVENTS.emit('order_failed', side=side, pair=pair, kind='network', message=str(e))
          return False
     except Exception as e:
-        print(f"{RED}{BOLD}[X] Error tidak dikenal saat eksekusi order:{RESET}")
-        print(f"{RED}    └─ {e}{RESET}")
+        EVENTS.emit('order_failed', side=side, pair=pair, kind='unknown', message=str(e))
         # traceback.print_exc()
         return False
 
-# --- Fungsi Pemrosesan Email ---
-# (process_email tetap sama, mungkin penyesuaian pesan log)
-def process_email(mail, email_id, settings, binance_client):
-    global running
-    if not running: return
+# --- Fungsi State Listener (High-Water Mark UID) ---
+def write_json_atomic(path, data):
+    """Tulis JSON via file sementara + fsync + rename agar tidak pernah setengah jadi."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+STATE_LOCK = threading.Lock() # File state dipakai bersama oleh semua listener mailbox
+
+def load_uid_state(state_key, uidvalidity):
+    """Muat UID terakhir yang sudah diproses. Reset ke 0 jika UIDVALIDITY berubah."""
+    uid_state = {'key': state_key, 'uidvalidity': uidvalidity, 'last_uid': 0, 'saved_uid': 0, 'inflight': {}, 'retry': [], 'saved_pending': []}
+    if uidvalidity is None: return uid_state # Server tidak kirim UIDVALIDITY, tidak bisa dipercaya
+    try:
+        with STATE_LOCK, open(STATE_FILE, 'r') as f:
+            saved = json.load(f).get(state_key) or {}
+        if saved.get('uidvalidity') == uidvalidity:
+            uid_state['last_uid'] = uid_state['saved_uid'] = int(saved.get('last_uid', 0))
+            # Email yang order-nya belum jalan saat listener berhenti: sudah \Seen, jadi diulang eksplisit
+            uid_state['retry'] = uid_state['saved_pending'] = sorted(int(u) for u in saved.get('pending_uids', []) if int(u) > uid_state['last_uid'])
+        elif saved:
+            print(f"{YELLOW}[i] UIDVALIDITY mailbox berubah. State UID direset.{RESET}")
+    except FileNotFoundError: pass
+    except (ValueError, OSError) as e:
+        print(f"{YELLOW}[!] State listener '{STATE_FILE}' tidak bisa dibaca ({e}). Mulai dari awal.{RESET}")
+    return uid_state
+
+def save_uid_state(uid_state, uid):
+    """Majukan high-water mark ke UID ini lalu simpan atomik ke disk.
+
+    Yang disimpan berhenti tepat sebelum UID tertua yang sinyalnya masih
+    ditahan (hold_uid_state), agar restart mengulang email itu, bukan
+    melewatkan order yang belum sempat jalan.
+    """
+    with STATE_LOCK:
+        uid_state['last_uid'] = max(uid_state['last_uid'], int(uid))
+    _persist_uid_state(uid_state)
+
+def hold_uid_state(uid_state, uid):
+    """Tahan UID ini di disk sampai sinyalnya selesai. Return fungsi pelepas (dipanggil signal_done)."""
+    uid = int(uid)
+    with STATE_LOCK: uid_state['inflight'][uid] = uid_state['inflight'].get(uid, 0) + 1
+    def release():
+        with STATE_LOCK:
+            count = uid_state['inflight'].pop(uid, 0) - 1
+            if count > 0: uid_state['inflight'][uid] = count
+        _persist_uid_state(uid_state)
+    return release
+
+def _persist_uid_state(uid_state):
+    if uid_state['uidvalidity'] is None: return
+    try:
+        with STATE_LOCK: # Read-modify-write seluruh file, jangan sampai menimpa update mailbox lain
+            inflight = uid_state['inflight']
+            mark = max(uid_state['saved_uid'], min(uid_state['last_uid'], min(inflight) - 1) if inflight else uid_state['last_uid'])
+            pending = sorted(set(inflight) | set(uid_state['retry']))
+            if mark == uid_state['saved_uid'] and pending == uid_state['saved_pending']: return
+            try:
+                with open(STATE_FILE, 'r') as f: all_state = json.load(f)
+            except (FileNotFoundError, ValueError): all_state = {}
+            entry = {'uidvalidity': uid_state['uidvalidity'], 'last_uid': mark}
+            if pending: entry['pending_uids'] = pending
+            all_state[uid_state['key']] = entry
+            write_json_atomic(STATE_FILE, all_state)
+            uid_state['saved_uid'], uid_state['saved_pending'] = mark, pending
+    except OSError as e:
+        print(f"{RED}[X] Gagal menyimpan state listener: {e}{RESET}")
+
+def get_uidvalidity(mail):
+    """Ambil UIDVALIDITY dari respons SELECT terakhir."""
+    try:
+        typ, data = mail.response('UIDVALIDITY')
+        if data and data[0]: return int(data[0])
+    except (ValueError, TypeError): pass
+    return None
+
+# --- Fungsi IMAP IDLE (RFC 2177) ---
+IDLE_REFRESH_SECONDS = 25 * 60 # Server boleh memutus IDLE setelah 29 menit, perbarui sebelum itu
+IDLE_NEW_MAIL_RE = re.compile(rb'^\* \d+ (EXISTS|RECENT)\b', re.IGNORECASE)
+IDLE_ABORT_TIMEOUT = 2 # Detik menunggu balasan DONE saat listener dihentikan di tengah IDLE
+
+def imap_address(settings):
+    """'server' atau 'server:port' jika port diatur (juga dipakai sebagai kunci state)."""
+    return f"{settings.imap_server}:{settings.imap_port}" if settings.imap_port else settings.imap_server
+
+def imap_connect(settings, timeout=20):
+    """Buka koneksi IMAP4_SSL, atau IMAP4 plaintext jika imap_use_ssl dimatikan."""
+    if settings.imap_use_ssl:
+        return imaplib.IMAP4_SSL(settings.imap_server, settings.imap_port or imaplib.IMAP4_SSL_PORT, timeout=timeout)
+    return imaplib.IMAP4(settings.imap_server, settings.imap_port or imaplib.IMAP4_PORT, timeout=timeout)
+
+def imap_capabilities(mail):
+    """Kapabilitas yang diiklankan server setelah login (set string huruf besar)."""
+    try:
+        typ, data = mail.capability()
+        if typ == 'OK' and data and data[-1]:
+            return set(data[-1].decode('ascii', errors='replace').upper().split())
+    except Exception: pass
+    return set(getattr(mail, 'capabilities', ()))
+
+def imap_supports_idle(mail):
+    """Cek apakah server mengiklankan kapabilitas IDLE (setelah login)."""
+    return 'IDLE' in imap_capabilities(mail)
+
+# --- Filter SEARCH di Server ---
+SEARCH_FILTER_KEYS = ("imap_search_from", "imap_search_subject", "imap_search_headers", "imap_search_gmail_raw")
+HEADER_NAME_RE = re.compile(r'^[!-9;-~]+$') # Nama field RFC 5322: ASCII tampak, tanpa ':'
+
+def _is_search_text(value):
+    return isinstance(value, str) and value.isascii() and not any(c in value for c in "\r\n\0")
+
+def is_valid_search_filter(source):
+    """Cek nilai imap_search_* (jika ada) di settings / entri mailbox.
+
+    Hanya ASCII: string non-ASCII butuh literal + CHARSET di SEARCH, yang tidak
+    didukung semua server.
+    """
+    for key in ("imap_search_from", "imap_search_subject", "imap_search_gmail_raw"):
+        if key in source and not _is_search_text(source[key]): return False
+    headers = source.get("imap_search_headers", {})
+    if not isinstance(headers, dict): return False
+    return all(isinstance(name, str) and HEADER_NAME_RE.match(name) and _is_search_text(value) for name, value in headers.items())
+
+def imap_quote(value):
+    """String IMAP bertanda kutip (escape \\ dan ")."""
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+def build_search_filter(settings, capabilities=()):
+    """Kriteria SEARCH tambahan dari imap_search_*, mis. 'FROM "tradingview" SUBJECT "alert"'.
+
+    X-GM-RAW hanya dipakai jika server mengiklankan X-GM-EXT-1. Return
+    (kriteria, gmail_raw_diabaikan); kriteria kosong = tanpa filter.
+    """
+    terms = []
+    if settings.imap_search_from: terms.append(f"FROM {imap_quote(settings.imap_search_from)}")
+    if settings.imap_search_subject: terms.append(f"SUBJECT {imap_quote(settings.imap_search_subject)}")
+    for name, value in settings.imap_search_headers.items():
+        terms.append(f"HEADER {name} {imap_quote(value)}")
+    gmail_raw = settings.imap_search_gmail_raw
+    raw_ignored = bool(gmail_raw) and 'X-GM-EXT-1' not in capabilities
+    if gmail_raw and not raw_ignored: terms.append(f"X-GM-RAW {imap_quote(gmail_raw)}")
+    return " ".join(terms), raw_ignored
+
+def build_search_criteria(last_uid, search_filter=""):
+    """Kriteria UID SEARCH: email UNSEEN setelah high-water mark, ditambah filter server."""
+    criteria = f"UID {last_uid + 1}:* UNSEEN" if last_uid else "UNSEEN"
+    return f"({criteria} {search_filter})" if search_filter else f"({criteria})"
+
+def imap_data_ready(mail, timeout):
+    """Tunggu sampai ada data dari server (termasuk yg sudah ada di buffer)."""
+    sock = mail.sock
+    old_timeout = sock.gettimeout()
+    try:
+        sock.settimeout(0.0)
+        try:
+            if mail.file.peek(1): return True # Sudah ada di buffer / socket
+        except (BlockingIOError, ssl.SSLWantReadError): pass
+        if isinstance(sock, ssl.SSLSocket) and sock.pending(): return True
+        readable, _, _ = select.select([sock], [], [], timeout)
+        return bool(readable)
+    finally:
+        sock.settimeout(old_timeout)
+
+def imap_idle_start(mail):
+    """Kirim IDLE dan tunggu continuation '+'. Return (tag, ada_email_baru)."""
+    tag = mail._new_tag()
+    got_new_mail = False
+    try:
+        mail.send(tag + b' IDLE\r\n')
+        while True: # Tunggu continuation '+ idling'
+            line = mail.readline()
+            if not line: raise imaplib.IMAP4.abort("EOF saat memulai IDLE")
+            if line.startswith(b'+'): break
+            if line.startswith(tag + b' '):
+                raise imaplib.IMAP4.error(f"IDLE ditolak server: {line.decode(errors='replace').strip()}")
+            if IDLE_NEW_MAIL_RE.match(line): got_new_mail = True
+    except Exception:
+        mail.tagged_commands.pop(tag, None)
+        raise
+    return tag, got_new_mail
+
+def imap_idle_read(mail):
+    """Baca satu baris untagged selama IDLE (data sudah siap). Return True jika EXISTS/RECENT."""
+    line = mail.readline()
+    if not line: raise imaplib.IMAP4.abort("EOF saat IDLE")
+    return bool(IDLE_NEW_MAIL_RE.match(line))
+
+def imap_idle_done(mail, tag):
+    """Kirim DONE dan tunggu respons bertag IDLE. Return True jika sempat ada EXISTS/RECENT."""
+    got_new_mail = False
+    try:
+        mail.send(b'DONE\r\n')
+        while True: # Tunggu respons bertag untuk IDLE
+            line = mail.readline()
+            if not line: raise imaplib.IMAP4.abort("EOF saat mengakhiri IDLE")
+            if line.startswith(tag + b' '):
+                if not line[len(tag) + 1:].upper().startswith(b'OK'):
+                    raise imaplib.IMAP4.abort(f"IDLE diakhiri dengan error: {line.decode(errors='replace').strip()}")
+                break
+            if IDLE_NEW_MAIL_RE.match(line): got_new_mail = True
+    finally:
+        mail.tagged_commands.pop(tag, None)
+    return got_new_mail
+
+def imap_idle_wait(mail, max_wait):
+    """Masuk mode IDLE sampai server mengirim EXISTS/RECENT atau max_wait habis.
+
+    Return True jika ada email baru. Raise IMAP4.abort jika koneksi putus,
+    IMAP4.error jika server menolak perintah IDLE.
+    """
+    tag, got_new_mail = imap_idle_start(mail)
+    try:
+        deadline = time.time() + max_wait
+        while running and not got_new_mail:
+            remaining = deadline - time.time()
+            if remaining <= 0: break
+            if not imap_data_ready(mail, min(1.0, remaining)): continue # Cek 'running' tiap detik
+            got_new_mail = imap_idle_read(mail)
+    except (KeyboardInterrupt, SystemExit):
+        imap_idle_abort(mail, tag)
+        raise
+    except Exception:
+        mail.tagged_commands.pop(tag, None)
+        raise
+    return imap_idle_done(mail, tag) or got_new_mail
 
-    target_kw = settings['target_keyword'].lower()
-    trigger_kw = settings['trigger_keyword'].lower()
-    email_id_str = email_id.decode('utf-8')
-    log_prefix = f"[{BLUE}EMAIL {email_id_str}{RESET}]"
+def imap_idle_abort(mail, tag):
+    """Akhiri IDLE yang terpotong (Ctrl+C/exit): DONE dengan batas waktu singkat, socket ditutup jika gagal.
 
+    Tanpa ini logout() berikutnya menunggu balasan yang tidak pernah datang
+    (server masih menunggu DONE) sampai timeout socket.
+    """
     try:
-        status, data = mail.fetch(email_id, "(RFC822)")
-        if status != 'OK':
-            print(f"{log_prefix} {RED}Gagal fetch: {status}{RESET}")
-            return
+        mail.sock.settimeout(IDLE_ABORT_TIMEOUT)
+        imap_idle_done(mail, tag)
+    except Exception:
+        try: mail.sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+
+async def imap_wait_readable(mail, timeout, call):
+    """Tunggu socket IMAP bisa dibaca tanpa memblok loop asyncio. Return False jika timeout."""
+    if imap_data_ready(mail, 0): return True # Sisa data di buffer file / SSL
+    loop = asyncio.get_running_loop()
+    fd = mail.sock.fileno()
+    ready = loop.create_future()
+    try:
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(True))
+    except NotImplementedError: # Loop tanpa add_reader (Proactor di Windows): cek per detik di thread
+        return await call(imap_data_ready, mail, min(1.0, timeout))
+    try:
+        await asyncio.wait_for(ready, timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        loop.remove_reader(fd)
 
-        msg = email.message_from_bytes(data[0][1])
-        subject = decode_mime_words(msg["Subject"])
-        sender = decode_mime_words(msg["From"])
-        timestamp = datetime.datetime.now().strftime("%H:%M") # Waktu lebih ringkas
+async def imap_idle_wait_async(mail, max_wait, call):
+    """Versi asyncio imap_idle_wait: menunggu push server di loop, bukan di thread.
+
+    call(fn, *args) menjalankan fungsi blocking di thread milik koneksi ini
+    (perintah IDLE/DONE & pembacaan baris tetap lewat imaplib).
+    """
+    loop = asyncio.get_running_loop()
+    tag, got_new_mail = await call(imap_idle_start, mail)
+    try:
+        deadline = loop.time() + max_wait
+        while running and not got_new_mail:
+            remaining = deadline - loop.time()
+            if remaining <= 0: break
+            if not await imap_wait_readable(mail, remaining, call): continue
+            got_new_mail = await call(imap_idle_read, mail)
+    except Exception:
+        mail.tagged_commands.pop(tag, None)
+        raise
+    return await call(imap_idle_done, mail, tag) or got_new_mail
+
+# --- Fungsi Fetch Parsial IMAP ---
+HEADER_FETCH_ITEMS = "(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (SUBJECT FROM DATE RECEIVED MESSAGE-ID)])"
+IMAP_TOKEN_RE = re.compile(rb'''
+    (?P<open>\() | (?P<close>\)) |
+    "(?P<quoted>(?:[^"\\]|\\.)*)" |
+    (?P<atom>(?:[^\s()"\[]|\[[^\]]*\])+)
+''', re.VERBOSE)
+IMAP_LITERAL_RE = re.compile(rb'\{\d+\}\s*$')
+
+def imap_parse_response(data):
+    """Ubah data respons imaplib (bytes & tuple literal) menjadi list bersarang."""
+    root = []
+    stack = [root]
+    for item in data:
+        if isinstance(item, tuple):
+            head, literal = item[0], item[1]
+            _imap_tokenize_into(IMAP_LITERAL_RE.sub(b'', head), stack)
+            stack[-1].append(literal)
+        elif isinstance(item, bytes):
+            _imap_tokenize_into(item, stack)
+    return root
+
+def _imap_tokenize_into(text, stack):
+    for m in IMAP_TOKEN_RE.finditer(text):
+        if m.group('open'):
+            new_list = []
+            stack[-1].append(new_list)
+            stack.append(new_list)
+        elif m.group('close'):
+            if len(stack) > 1: stack.pop()
+        elif m.group('quoted') is not None:
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', m.group('quoted')))
+        else:
+            atom = m.group('atom')
+            stack[-1].append(None if atom.upper() == b'NIL' else atom)
+
+def imap_fetch_messages(data):
+    """Kelompokkan respons FETCH per pesan: list (seq, {ITEM: nilai})."""
+    parsed = imap_parse_response(data)
+    messages = []
+    for i in range(len(parsed) - 1):
+        if isinstance(parsed[i], bytes) and isinstance(parsed[i + 1], list):
+            pairs = parsed[i + 1]
+            items = {}
+            for k in range(0, len(pairs) - 1, 2):
+                if isinstance(pairs[k], bytes): items[pairs[k].upper()] = pairs[k + 1]
+            messages.append((parsed[i], items))
+    return messages
+
+def imap_find_item(items, prefix):
+    """Cari nilai item FETCH berdasarkan awalan nama (mis. b'BODY[HEADER')."""
+    for key, value in items.items():
+        if key.startswith(prefix): return value
+    return None
+
+def find_text_plain_part(bodystructure, section=""):
+    """Cari bagian text/plain pertama (bukan attachment) di BODYSTRUCTURE.
+
+    Return (section, encoding, charset) atau None jika tidak ada.
+    """
+    if not isinstance(bodystructure, list) or not bodystructure: return None
+    if isinstance(bodystructure[0], list): # Multipart: anak bernomor 1..n
+        for idx, part in enumerate(bodystructure, start=1):
+            if not isinstance(part, list): break
+            found = find_text_plain_part(part, f"{section}.{idx}" if section else str(idx))
+            if found: return found
+        return None
 
-        print(f"\n{CYAN}╭─ Email Baru [{timestamp}] {'─'*15}{RESET}")
-        print(f"{CYAN}│{RESET} {DIM}ID    :{RESET} {email_id_str}")
-        print(f"{CYAN}│{RESET} {DIM}Dari  :{RESET} {sender[:40]}{'...' if len(sender)>40 else ''}") # Batasi panjang sender
-        print(f"{CYAN}│{RESET} {DIM}Subjek:{RESET} {subject[:50]}{'...' if len(subject)>50 else ''}") # Batasi panjang subjek
-        # print(f"{CYAN}╰{'─' * 30}{RESET}") # Footer sementara sebelum proses body
+    ctype = (bodystructure[0] or b'').lower()
+    subtype = (bodystructure[1] or b'').lower() if len(bodystructure) > 1 else b''
+    if ctype != b'text' or subtype != b'plain': return None
+    disposition = bodystructure[9] if len(bodystructure) > 9 else None
+    if isinstance(disposition, list) and disposition and (disposition[0] or b'').lower() == b'attachment':
+        return None
 
-        body = get_text_from_email(msg)
-        full_content = (subject.lower() + " " + body)
+    charset = 'utf-8'
+    params = bodystructure[2] if isinstance(bodystructure[2], list) else []
+    for key, value in zip(params[::2], params[1::2]):
+        if isinstance(key, bytes) and key.lower() == b'charset' and value:
+            charset = value.decode('ascii', errors='replace')
+    encoding = (bodystructure[5] or b'7bit').decode('ascii', errors='replace').lower() if len(bodystructure) > 5 else '7bit'
+    return (section or "1", encoding, charset)
+
+def header_timestamp(value):
+    """Epoch dari tanggal RFC 2822 (header Date / bagian akhir Received), atau None."""
+    if not value: return None
+    try:
+        return parsedate_to_datetime(str(value).rsplit(';', 1)[-1].strip()).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
 
-        if target_kw in full_content:
-            print(f"{CYAN}│{RESET} {GREEN}[✓] Target '{settings['target_keyword']}' ditemukan.{RESET}")
-            try:
-                target_idx = full_content.find(target_kw)
-                trigger_idx = full_content.find(trigger_kw, target_idx + len(target_kw))
-
-                if trigger_idx != -1:
-                    text_after = full_content[trigger_idx + len(trigger_kw):].lstrip()
-                    action_word = text_after.split(maxsplit=1)[0].strip('.,!?:;()[]{}').lower() if text_after else ""
-
-                    if action_word in ["buy", "sell"]:
-                        print(f"{CYAN}│{RESET} {GREEN}[✓] Trigger '{settings['trigger_keyword']}' -> Aksi: {BOLD}{action_word.upper()}{RESET}")
-                        # --- Trigger Aksi ---
-                        execute_binance = settings.get("execute_binance_orders", False)
-                        order_attempted = False
-
-                        if action_word == "buy":
-                            trigger_beep("buy")
-                            if execute_binance and binance_client:
-                                order_attempted = execute_binance_order(binance_client, settings, Client.SIDE_BUY)
-                        elif action_word == "sell":
-                            trigger_beep("sell")
-                            # Cek Qty > 0 sebelum mencoba eksekusi
-                            if settings.get('sell_base_quantity', 0) > 0:
-                                if execute_binance and binance_client:
-                                    order_attempted = execute_binance_order(binance_client, settings, Client.SIDE_SELL)
-                            # else: # Info jika qty 0 sudah ada di execute_binance_order
-                            #    print(f"{CYAN}│{RESET} {YELLOW}[i] Aksi Sell, tapi Qty=0. Order dilewati.{RESET}")
-
-                        # Warning jika eksekusi aktif tapi client bermasalah atau Qty=0 untuk sell
-                        if execute_binance and not order_attempted:
-                            if not binance_client:
-                                 print(f"{CYAN}│{RESET} {YELLOW}[!] Eksekusi aktif, tapi koneksi Binance bermasalah.{RESET}")
-                            # Kasus lain (misal qty 0 untuk sell) sudah ditangani di execute_binance_order
-                    elif action_word:
-                        print(f"{CYAN}│{RESET} {YELLOW}[?] Trigger ditemukan, tapi kata '{action_word}' bukan 'buy'/'sell'.{RESET}")
-                    else:
-                        print(f"{CYAN}│{RESET} {YELLOW}[?] Trigger ditemukan, tapi tidak ada kata aksi setelahnya.{RESET}")
-                else:
-                     print(f"{CYAN}│{RESET} {YELLOW}[?] Target ditemukan, tapi trigger '{settings['trigger_keyword']}' tidak ada SETELAHNYA.{RESET}")
-            except Exception as e:
-                 print(f"{CYAN}│{RESET} {RED}[X] Error parsing setelah trigger: {e}{RESET}")
+def message_times(msg):
+    """(waktu Date pengirim, waktu Received teratas = tiba di server mailbox kita)."""
+    received = msg.get_all('Received') or []
+    return header_timestamp(msg['Date']), header_timestamp(received[0] if received else None)
+
+def parse_header_fetch(items):
+    """Ambil (subject, sender, part_info, (date, received), message_id) dari item FETCH header+BODYSTRUCTURE."""
+    header = imap_find_item(items, b'BODY[HEADER')
+    bodystructure = items.get(b'BODYSTRUCTURE')
+    if header is None or bodystructure is None: return None
+    msg = email.message_from_bytes(header)
+    return (decode_mime_words(msg["Subject"]), decode_mime_words(msg["From"]), find_text_plain_part(bodystructure),
+            message_times(msg), (msg["Message-ID"] or "").strip())
+
+BODY_SCAN_CHUNK = 16384 # Byte per potongan saat decode body bertahap
+BASE64_JUNK_RE = re.compile(rb'[^A-Za-z0-9+/=]')
+
+def _iter_transfer_decoded(payload, encoding, chunk_size):
+    """Decode Content-Transfer-Encoding per potongan tanpa memutus kuartet base64 / escape =XX."""
+    carry = b''
+    for start in range(0, len(payload), chunk_size):
+        raw = carry + payload[start:start + chunk_size]
+        if encoding == 'base64':
+            raw = BASE64_JUNK_RE.sub(b'', raw)
+            cut = len(raw) - len(raw) % 4
+        elif encoding == 'quoted-printable':
+            cut = raw.rfind(b'\n') + 1
+            if not cut: # Baris sangat panjang: potong asal tidak di tengah escape
+                eq = raw.rfind(b'=', max(len(raw) - 2, 0))
+                cut = eq if eq != -1 else len(raw)
         else:
-             print(f"{CYAN}│{RESET} {BLUE}[-] Target '{settings['target_keyword']}' tidak ditemukan.{RESET}")
+            yield raw; continue
+        carry, raw = raw[cut:], raw[:cut]
+        try:
+            yield binascii.a2b_base64(raw) if encoding == 'base64' else quopri.decodestring(raw)
+        except (binascii.Error, ValueError): yield raw # Pakai apa adanya
+    if carry and encoding == 'quoted-printable': yield quopri.decodestring(carry)
+    # Sisa base64 < 4 karakter dibuang: fetch terpotong <0.N> bisa memutus kuartet base64
+
+def iter_body_chunks(payload, encoding, charset, chunk_size=BODY_SCAN_CHUNK):
+    """Decode bagian MIME (base64/quoted-printable lalu charset) sebagai potongan teks berurutan."""
+    if not payload: return
+    if len(payload) <= chunk_size: # Body kecil: cukup sekali decode
+        raw = b"".join(_iter_transfer_decoded(payload, encoding, chunk_size))
+        try: text = raw.decode(charset, errors='replace')
+        except LookupError: text = raw.decode('utf-8', errors='replace')
+        if text: yield text
+        return
+    try:
+        decoder = codecs.getincrementaldecoder(charset)(errors='replace')
+    except LookupError:
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for raw in _iter_transfer_decoded(payload, encoding, chunk_size):
+        text = decoder.decode(raw)
+        if text: yield text
+    text = decoder.decode(b'', final=True)
+    if text: yield text
+
+def decode_body_part(payload, encoding, charset):
+    """Decode isi bagian MIME (base64/quoted-printable) lalu charset-nya."""
+    return "".join(iter_body_chunks(payload, encoding, charset))
+
+def imap_message_set(uids):
+    """Ringkas daftar UID jadi message set IMAP, mis. [1, 2, 3, 7] -> '1:3,7'."""
+    nums = sorted({int(uid) for uid in uids})
+    if not nums: return ""
+    ranges = []
+    start = prev = nums[0]
+    for num in nums[1:]:
+        if num != prev + 1:
+            ranges.append((start, prev))
+            start = num
+        prev = num
+    ranges.append((start, prev))
+    return ",".join(f"{a}:{b}" if a != b else str(a) for a, b in ranges)
+
+def imap_fetch_by_uid(mail, uids, items):
+    """Satu UID FETCH untuk banyak pesan. Return (status, {uid: {ITEM: nilai}})."""
+    if not uids: return 'OK', {}
+    status, data = mail.uid('FETCH', imap_message_set(uids), items)
+    if status != 'OK': return status, {}
+    wanted = set(uids)
+    result = {}
+    for seq, fetched in imap_fetch_messages(data):
+        uid = fetched.get(b'UID')
+        if uid in wanted: result.setdefault(uid, {}).update(fetched)
+    return 'OK', result
+
+def fetch_headers_batch(mail, uids):
+    """Tahap 1 massal: BODYSTRUCTURE + Subject/From/Date/Received/Message-ID. Return (status, {uid: (subject, sender, part_info, times, message_id)})."""
+    status, fetched = imap_fetch_by_uid(mail, uids, HEADER_FETCH_ITEMS)
+    headers = {}
+    for uid, items in fetched.items():
+        try: parsed = parse_header_fetch(items)
+        except Exception: parsed = None # BODYSTRUCTURE aneh, nanti pakai RFC822
+        if parsed: headers[uid] = parsed
+    return status, headers
+
+def fetch_bodies_batch(mail, parts, settings):
+    """Tahap 2 massal: fetch text/plain, satu UID FETCH per section yang sama.
+
+    parts: {uid: part_info}. Return (status, {uid: (iterator potongan teks body, sidik jari body)}).
+    Body baru di-decode saat iterator dibaca (lihat scan_email_body).
+    """
+    bodies = {}
+    by_section = {}
+    for uid, part_info in parts.items():
+        if part_info: by_section.setdefault(part_info[0], []).append(uid)
+        else: bodies[uid] = (iter(()), body_fingerprint(())) # Tidak ada text/plain
+    max_bytes = settings.body_fetch_max_bytes
+    for section, uids in by_section.items():
+        spec = f"BODY.PEEK[{section}]" + (f"<0.{max_bytes}>" if max_bytes > 0 else "")
+        status, fetched = imap_fetch_by_uid(mail, uids, f"({spec})")
+        if status != 'OK': return status, bodies
+        for uid in uids:
+            if uid not in fetched: continue
+            _, encoding, charset = parts[uid]
+            payload = imap_find_item(fetched[uid], b'BODY[') or b''
+            bodies[uid] = (iter_body_chunks(payload, encoding, charset), body_fingerprint((payload,)))
+    return 'OK', bodies
+
+def fetch_full_batch(mail, uids):
+    """Fetch RFC822 penuh massal (mode lama / fallback). Return (status, {uid: (subject, sender, body, times, message_id, fingerprint)}).
+
+    body berupa iterator potongan teks (lazy), sama seperti fetch_bodies_batch.
+    """
+    status, fetched = imap_fetch_by_uid(mail, uids, "(RFC822)")
+    contents = {}
+    for uid, items in fetched.items():
+        raw = items.get(b'RFC822')
+        if not raw: continue
+        msg = email.message_from_bytes(raw)
+        contents[uid] = (decode_mime_words(msg["Subject"]), decode_mime_words(msg["From"]), iter_email_text(msg),
+                         message_times(msg), (msg["Message-ID"] or "").strip(), body_fingerprint(iter_raw_email_text(msg)))
+    return status, contents
+
+def mark_seen_batch(mail, uids):
+    """Satu UID STORE +FLAGS (\\Seen) untuk semua email yang sudah diproses."""
+    if not uids: return 'OK'
+    status, _ = mail.uid('STORE', imap_message_set(uids), '+FLAGS', '(\\Seen)')
+    return status
+
+def format_match_stats():
+    """Ringkasan berapa kali sinyal diputuskan dari Subjek vs Body."""
+    text = f"Jalur: Subjek {MATCH_PATH_STATS['subject']}x | Body {MATCH_PATH_STATS['body']}x | Tanpa sinyal {MATCH_PATH_STATS['none']}x"
+    coalesced = SIGNAL_COALESCER.stats
+    if coalesced['duplicate'] or coalesced['netted']: text += f" | Duplikat {coalesced['duplicate']}x | Netting {coalesced['netted']}x"
+    return text
+
+# --- Mesin Aturan Sinyal ---
+SIGNAL_RULE_SIDES = ("auto", "buy", "sell")
+ACTION_WORD_RE = re.compile(r'\s*(\S+)')
+RESULT_PROGRESS = {'no_target': 0, 'no_trigger': 1, 'no_action': 2, 'invalid_action': 2, 'ok': 3}
+
+def is_valid_signal_rule(rule):
+    """Cek struktur satu entri signal_rules di config."""
+    if not isinstance(rule, dict): return False
+    if not all(isinstance(rule.get(k), str) and rule[k].strip() for k in ('target', 'trigger')): return False
+    side = rule.get('side', 'auto')
+    if not isinstance(side, str) or side.lower() not in SIGNAL_RULE_SIDES: return False
+    if not isinstance(rule.get('pair', ''), str): return False
+    for qty_key in ('buy_quote_quantity', 'sell_base_quantity'):
+        qty = rule.get(qty_key)
+        if qty is not None and (not isinstance(qty, (int, float)) or qty < 0): return False
+    return True
+
+class SignalRule:
+    """Satu aturan: target -> trigger -> aksi, dengan pair, side & kuantitas sendiri.
+
+    order_settings adalah settings dengan override pair/kuantitas aturan ini,
+    sehingga jalur order (dispatcher, execute_binance_order) tidak berubah.
+    """
+    def __init__(self, name, target, trigger, side, order_settings):
+        self.name = name
+        self.target_label, self.trigger_label = target, trigger # Untuk tampilan
+        self.target = target.lower()
+        self.trigger = trigger.lower()
+        self.side = side
+        self.order_settings = order_settings
+
+    @property
+    def pair(self):
+        return self.order_settings.trading_pair
+
+class SignalRuleSet:
+    """Semua aturan dikompilasi jadi satu regex gabungan; teks discan sekali untuk semua aturan.
+
+    Regex berupa lookahead (?=(kw1|kw2|...)) sehingga kemunculan yang tumpang
+    tindih tetap terlihat. Tiap kemunculan menggerakkan state machine per aturan
+    (cari target, lalu trigger setelah target), dengan semantik yang sama
+    seperti find(target) lalu find(trigger) sebelumnya.
+    """
+    def __init__(self, rules):
+        self.rules = rules
+        keywords = sorted({kw for rule in rules for kw in (rule.target, rule.trigger)}, key=len, reverse=True)
+        self.regex = re.compile('(?=(' + '|'.join(re.escape(kw) for kw in keywords) + '))') if keywords else None
+        # Di satu posisi regex hanya melaporkan keyword terpanjang; keyword yang jadi prefiksnya juga cocok di sana
+        self.prefix_closure = {kw: [k for k in keywords if kw.startswith(k)] for kw in keywords}
+        self.keyword_rules = {kw: [idx for idx, rule in enumerate(rules) if kw in (rule.target, rule.trigger)] for kw in keywords}
+        self.max_keyword_len = len(keywords[0]) if keywords else 0
+
+    def scanner(self):
+        """State machine baru untuk teks yang datang bertahap (lihat SignalStreamScanner)."""
+        return SignalStreamScanner(self)
+
+    def match(self, content):
+        """Scan teks (sudah lowercase) sekali. Return [(aturan, hasil, kata_aksi)] sesuai urutan aturan.
+
+        hasil: 'ok', 'no_target', 'no_trigger', 'no_action' atau 'invalid_action'.
+        Untuk body panjang yang di-decode bertahap, pakai scanner() (hasil sama).
+        """
+        target_ends = [None] * len(self.rules) # Posisi akhir target pertama per aturan
+        results = [None] * len(self.rules)
+        unresolved = len(self.rules)
+        if self.regex:
+            for m in self.regex.finditer(content):
+                pos = m.start()
+                for kw in self.prefix_closure[m.group(1)]:
+                    for idx in self.keyword_rules[kw]:
+                        if results[idx]: continue
+                        rule = self.rules[idx]
+                        if target_ends[idx] is None:
+                            if kw == rule.target: target_ends[idx] = pos + len(kw)
+                        elif kw == rule.trigger and pos >= target_ends[idx]:
+                            results[idx] = self._resolve_action(rule, content, pos + len(kw))
+                            unresolved -= 1
+                if not unresolved: break # Semua aturan sudah terputuskan, sisa teks tidak perlu discan
+        return [(rule, *(results[idx] or (('no_target' if target_ends[idx] is None else 'no_trigger'), "")))
+                for idx, rule in enumerate(self.rules)]
+
+    @staticmethod
+    def _resolve_action(rule, content, trigger_end):
+        if rule.side != 'auto': return 'ok', rule.side
+        m = ACTION_WORD_RE.match(content, trigger_end)
+        action_word = m.group(1).strip('.,!?:;()[]{}').lower() if m else ""
+        if action_word in ("buy", "sell"): return 'ok', action_word
+        return ('invalid_action' if action_word else 'no_action'), action_word
+
+class SignalStreamScanner:
+    """State machine SignalRuleSet untuk teks yang di-feed potong demi potong.
+
+    Posisi hanya discan jika keyword terpanjang pasti sudah muat di buffer, dan
+    kata aksi baru diputuskan setelah katanya lengkap, sehingga hasilnya sama
+    dengan match() atas teks utuh. Buffer hanya menyimpan ekor yang belum pasti.
+    """
+    PENDING = ('pending', "") # Trigger ketemu, kata aksi belum lengkap
+
+    def __init__(self, rule_set):
+        self.rule_set = rule_set
+        self.target_ends = [None] * len(rule_set.rules) # Posisi (absolut) akhir target pertama per aturan
+        self.results = [None] * len(rule_set.rules)
+        self.trigger_ends = {} # idx aturan -> posisi akhir trigger, menunggu kata aksi
+        self.unresolved = len(rule_set.rules) if rule_set.regex else 0
+        self.buffer = ""
+        self.offset = 0 # Posisi absolut buffer[0]
+        self.scan_from = 0 # Posisi absolut pertama yang belum discan
+        self.done = not self.unresolved
+
+    def feed(self, text, final=False):
+        """Tambah teks (sudah dinormalisasi). Return True jika semua aturan sudah terputuskan."""
+        if self.done: return True
+        rule_set = self.rule_set
+        buf = self.buffer + text
+        limit = len(buf) if final else len(buf) - rule_set.max_keyword_len + 1 # Posisi relatif aman discan
+        start = self.scan_from - self.offset
+        if self.unresolved and limit > start:
+            results, target_ends, rules = self.results, self.target_ends, rule_set.rules
+            prefix_closure, keyword_rules, offset = rule_set.prefix_closure, rule_set.keyword_rules, self.offset
+            for m in rule_set.regex.finditer(buf, start):
+                rel = m.start()
+                if rel >= limit: break
+                pos = offset + rel
+                for kw in prefix_closure[m.group(1)]:
+                    for idx in keyword_rules[kw]:
+                        if results[idx]: continue
+                        rule = rules[idx]
+                        if target_ends[idx] is None:
+                            if kw == rule.target: target_ends[idx] = pos + len(kw)
+                        elif kw == rule.trigger and pos >= target_ends[idx]:
+                            self.unresolved -= 1
+                            if rule.side != 'auto': results[idx] = ('ok', rule.side)
+                            else:
+                                results[idx] = self.PENDING
+                                self.trigger_ends[idx] = pos + len(kw)
+                if not self.unresolved: break # Semua aturan sudah terputuskan, sisa teks tidak perlu discan
+            self.scan_from = offset + limit
+        for idx, end in list(self.trigger_ends.items()) if self.trigger_ends else ():
+            m = ACTION_WORD_RE.match(buf, end - self.offset)
+            if final or (m and m.end() < len(buf)): # \S+ rakus: ada karakter sesudahnya = kata sudah lengkap
+                self.results[idx] = rule_set._resolve_action(rule_set.rules[idx], buf, end - self.offset)
+                del self.trigger_ends[idx]
+        self.done = final or (not self.unresolved and not self.trigger_ends)
+        if not self.done:
+            keep = min(self.scan_from, *self.trigger_ends.values()) if self.trigger_ends else self.scan_from
+            self.buffer, self.offset = buf[keep - self.offset:], keep
+        return self.done
+
+    def results_list(self):
+        """Hasil per aturan seperti SignalRuleSet.match (panggil setelah feed final / done)."""
+        return [(rule, *(self.results[idx] or (('no_target' if self.target_ends[idx] is None else 'no_trigger'), "")))
+                for idx, rule in enumerate(self.rule_set.rules)]
+
+    def finish(self):
+        if not self.done: self.feed("", final=True)
+        return self.results_list()
+
+def scan_email_body(rule_set, subject, chunks):
+    """Cocokkan aturan atas Subjek + potongan body, normalisasi sambil jalan.
+
+    Decode berhenti begitu semua aturan terputuskan (target -> trigger -> aksi),
+    jadi newsletter besar tidak di-decode utuh. Return matches (lihat SignalRuleSet.match).
+    """
+    scanner = rule_set.scanner()
+    normalizer = TextNormalizer()
+    if not scanner.feed(subject.lower() + " "):
+        for chunk in chunks:
+            text = normalizer.feed(chunk)
+            if text and scanner.feed(text): break
+    return scanner.finish()
+
+def compile_signal_rules(settings):
+    """Aturan default (keyword Target/Trigger di menu) + signal_rules dari config."""
+    rules = []
+    if settings.target_keyword and settings.trigger_keyword:
+        rules.append(SignalRule("default", settings.target_keyword, settings.trigger_keyword, "auto", settings))
+    for idx, rule in enumerate(settings.active_signal_rules, 1):
+        overrides = {}
+        if rule.get('pair'): overrides['trading_pair'] = rule['pair'].upper()
+        for qty_key in ('buy_quote_quantity', 'sell_base_quantity'):
+            if rule.get(qty_key) is not None: overrides[qty_key] = float(rule[qty_key])
+        order_settings = dataclasses.replace(settings, **overrides) if overrides else settings
+        rules.append(SignalRule(rule.get('name') or f"aturan-{idx}", rule['target'], rule['trigger'], rule.get('side', 'auto').lower(), order_settings))
+    return SignalRuleSet(rules)
+
+def signal_rule_pairs(settings):
+    """Semua pair yang bisa diorder oleh aturan aktif, termasuk aturan per mailbox (untuk cache filter simbol)."""
+    pairs = [settings.trading_pair]
+    pairs += [rule['pair'].upper() for rule in settings.active_signal_rules if rule.get('pair')]
+    for source in settings.active_mailboxes:
+        pairs.append(source.get('trading_pair', '').upper())
+        pairs += [rule['pair'].upper() for rule in source.get('signal_rules', []) if rule.get('pair')]
+    return [pair for idx, pair in enumerate(pairs) if pair and pair not in pairs[:idx]]
+
+# --- Instrumentasi Latensi Sinyal ---
+LATENCY_STAGES = ( # (nama, keterangan, timestamp awal, timestamp akhir)
+    ("delivery", "Date -> tiba di server", ('sent',), 'received'),
+    ("detect", "tiba -> terdeteksi", ('received', 'sent'), 'detected'),
+    ("fetch", "terdeteksi -> fetch", ('detected',), 'fetched'),
+    ("match", "fetch -> cocok", ('fetched',), 'matched'),
+    ("dispatch", "cocok -> kirim order", ('matched',), 'order_sent'),
+    ("exchange", "kirim -> transactTime", ('order_sent',), 'transact'),
+    ("ack", "kirim -> respons", ('order_sent',), 'order_ack'),
+    ("total", "Date -> selesai", ('sent',), ('order_ack', 'matched')),
+)
+
+def _first_time(trace, keys):
+    for key in (keys if isinstance(keys, tuple) else (keys,)):
+        if trace.get(key) is not None: return trace[key]
+    return None
+
+def percentile(sorted_values, pct):
+    """Persentil nearest-rank dari list yang sudah terurut."""
+    if not sorted_values: return None
+    rank = max(1, int(round(pct / 100 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+class LatencyTracker:
+    """Latensi per tahap dari email dikirim sampai order di-ack Binance.
+
+    Tiap sinyal membawa dict trace berisi timestamp epoch per tahap (sent,
+    received, detected, fetched, matched, order_sent, transact, order_ack).
+    Waktu Date/Received berasal dari jam server lain, jadi tahap delivery/
+    detect/total bisa sedikit miring (bahkan negatif) jika jam tidak sinkron.
+    """
+    MAX_SAMPLES = 10000
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {name: deque(maxlen=self.MAX_SAMPLES) for name, _, _, _ in LATENCY_STAGES}
+
+    def record(self, trace):
+        if not trace: return
+        stages = {}
+        for name, _, start_keys, end_keys in LATENCY_STAGES:
+            start, end = _first_time(trace, start_keys), _first_time(trace, end_keys)
+            if start is not None and end is not None: stages[name] = round((end - start) * 1000, 1)
+        with self.lock:
+            for name, value in stages.items(): self.samples[name].append(value)
+        EVENTS.emit('signal_latency', uid=trace.get('uid'), rule=trace.get('rule'), pair=trace.get('pair'),
+                    mailbox=trace.get('mailbox', ""), stages_ms=stages)
+
+    def percentiles(self):
+        """{tahap: {n, p50, p95, p99}} dalam ms, hanya tahap yang punya sampel."""
+        with self.lock:
+            snapshot = {name: sorted(values) for name, values in self.samples.items()}
+        return {name: {'n': len(values), **{f"p{p}": percentile(values, p) for p in (50, 95, 99)}}
+                for name, values in snapshot.items() if values}
+
+    def summary_lines(self):
+        """Baris tabel p50/p95/p99 per tahap (ms). Kosong jika belum ada sinyal."""
+        stats = self.percentiles()
+        return [f"{name:<9} {desc:<22} n={stats[name]['n']:<5} p50 {stats[name]['p50']:>9.1f} | p95 {stats[name]['p95']:>9.1f} | p99 {stats[name]['p99']:>9.1f}"
+                for name, desc, _, _ in LATENCY_STAGES if name in stats]
+
+LATENCY = LatencyTracker()
+
+def signal_done(trace):
+    """Sinyal tuntas (order selesai / dilewati / dinetting): catat latensi & lepas tahanan state UID-nya."""
+    LATENCY.record(trace)
+    release = trace.pop('release_uid', None) if trace else None
+    if release: release()
+
+def _render_signal_latency(r):
+    stages = r['stages_ms']
+    parts = [f"{name} {stages[name]:.0f}" for name, _, _, _ in LATENCY_STAGES if name in stages and name != 'total']
+    total_desc = f"total {stages['total']:.0f} ms | " if 'total' in stages else ""
+    return f"{DIM}[⏱] Latensi {r['uid']}: {total_desc}{' · '.join(parts)} (ms){RESET}"
+
+CONSOLE_RENDERERS['signal_latency'] = ('info', _render_signal_latency)
+
+# --- Dispatcher Order Asinkron ---
+class OrderDispatcher:
+    """Worker thread untuk eksekusi order Binance di luar loop IMAP.
+
+    Sinyal untuk pair yang sama selalu masuk worker yang sama (urutan terjaga),
+    pair berbeda bisa dieksekusi paralel. Antrean dibatasi agar burst sinyal
+    memberi backpressure alih-alih memakan memori tanpa batas.
+    """
+    def __init__(self, num_workers=2, queue_size=100):
+        self.queues = [queue.Queue(maxsize=queue_size) for _ in range(max(1, num_workers))]
+        self.threads = []
+        for idx, job_queue in enumerate(self.queues):
+            thread = threading.Thread(target=self._worker, args=(job_queue,), name=f"order-worker-{idx}", daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def submit(self, client, settings, side, trace=None):
+        """Masukkan order ke antrean worker milik pair-nya."""
+        pair = settings.trading_pair
+        job_queue = self.queues[zlib.crc32(pair.encode()) % len(self.queues)]
+        job = (client, settings, side, pair, time.time(), trace)
+        try:
+            job_queue.put_nowait(job)
+        except queue.Full:
+            print(f"{YELLOW}[!] Antrean order {pair} penuh. Menunggu slot...{RESET}")
+            job_queue.put(job)
+        EVENTS.emit('order_queued', side=side, pair=pair)
+
+    def beep(self, action_word):
+        """Beep di thread terpisah agar tidak menahan pemanggil."""
+        threading.Thread(target=trigger_beep, args=(action_word,), daemon=True).start()
+
+    def _worker(self, job_queue):
+        while True:
+            job = job_queue.get()
+            try:
+                if job is None: break
+                run_order_job(job)
+            finally:
+                job_queue.task_done()
+
+    def shutdown(self, timeout=15):
+        """Tunggu antrean habis (maks timeout detik / sampai Ctrl+C kedua) lalu hentikan worker."""
+        for job_queue in self.queues:
+            try: job_queue.put(None, timeout=1)
+            except queue.Full: pass
+        deadline = time.time() + timeout
+        for thread in self.threads:
+            while thread.is_alive() and time.time() < deadline and stop_requests < 2: thread.join(0.2)
+        if any(thread.is_alive() for thread in self.threads):
+            print(f"{YELLOW}[!] Antrean order belum habis. Sisa order dibatalkan.{RESET}")
+            for job_queue in self.queues: # Worker berhenti setelah order yang sedang jalan
+                with job_queue.mutex: job_queue.queue.clear()
+                job_queue.put_nowait(None)
+            for thread in self.threads: thread.join(10) # Order yang sudah terkirim ke exchange ditunggu selesai
+
+def run_order_job(job):
+    """Eksekusi satu job order dari antrean dispatcher, catat latensi & event order_done."""
+    client, settings, side, pair, queued_at, trace = job
+    started = time.time()
+    try:
+        ok = execute_binance_order(client, settings, side, trace=trace)
+    except Exception:
+        ok = False
+        traceback.print_exc()
+    finished = time.time()
+    signal_done(trace)
+    EVENTS.emit('order_done', side=side, pair=pair, ok=ok,
+                queue_ms=round((started - queued_at) * 1000, 1), exec_ms=round((finished - started) * 1000, 1))
+    return ok
+
+class AsyncOrderDispatcher:
+    """Padanan OrderDispatcher untuk engine asyncio.
+
+    Satu asyncio.Queue + satu task konsumen per pair (urutan per pair terjaga),
+    order sendiri jalan di thread pool karena klien Binance (requests) blocking.
+    submit() dipanggil dari thread IMAP, beep() menjadwalkan subprocess di loop.
+    """
+    def __init__(self, loop, num_workers=2, queue_size=100):
+        self.loop = loop
+        self.queue_size = queue_size
+        self.executor = ThreadPoolExecutor(max_workers=max(1, num_workers), thread_name_prefix="order-worker")
+        self.queues = {} # pair -> asyncio.Queue
+        self.tasks = set() # Task konsumen + beep yang masih jalan
+        self.aborted = asyncio.Event() # Diset untuk membatalkan antrean saat shutdown
+
+    def _spawn(self, coro):
+        task = self.loop.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _queue_for(self, pair):
+        job_queue = self.queues.get(pair)
+        if job_queue is None:
+            job_queue = self.queues[pair] = asyncio.Queue(maxsize=self.queue_size)
+            self._spawn(self._consume(job_queue))
+        return job_queue
+
+    async def _put(self, job):
+        job_queue = self._queue_for(job[3])
+        if job_queue.full():
+            print(f"{YELLOW}[!] Antrean order {job[3]} penuh. Menunggu slot...{RESET}")
+        await job_queue.put(job)
+
+    def submit(self, client, settings, side, trace=None):
+        """Masukkan order ke antrean pair-nya (thread-safe, backpressure jika penuh)."""
+        pair = settings.trading_pair
+        job = (client, settings, side, pair, time.time(), trace)
+        future = asyncio.run_coroutine_threadsafe(self._put(job), self.loop)
+        while True:
+            try:
+                future.result(timeout=1); break
+            except FuturesTimeoutError:
+                if not running: future.cancel(); return
+            except Exception: return # Loop sudah berhenti
+        EVENTS.emit('order_queued', side=side, pair=pair)
+
+    def beep(self, action_word):
+        """Jadwalkan beep sebagai task di loop (aman dipanggil dari thread lain)."""
+        self.loop.call_soon_threadsafe(self._spawn, trigger_beep_async(action_word))
+
+    async def _consume(self, job_queue):
+        while True:
+            job = await job_queue.get()
+            try:
+                if job is None: break
+                await self.loop.run_in_executor(self.executor, run_order_job, job)
+            finally:
+                job_queue.task_done()
+
+    async def shutdown(self, timeout=15):
+        """Tunggu antrean habis (maks timeout detik / sampai aborted), lalu batalkan sisa task."""
+        joined = asyncio.ensure_future(asyncio.gather(*(job_queue.join() for job_queue in self.queues.values())))
+        aborted = asyncio.ensure_future(self.aborted.wait())
+        done, _ = await asyncio.wait([joined, aborted], timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        if joined not in done:
+            print(f"{YELLOW}[!] Antrean order belum habis. Sisa order dibatalkan.{RESET}")
+        joined.cancel(); aborted.cancel()
+        for task in list(self.tasks): task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# --- Deduplikasi & Netting Sinyal ---
+def signal_content_hash(subject, fingerprint):
+    """Hash isi email (Subjek + sidik jari body utuh, lihat body_fingerprint) untuk deteksi email kembar."""
+    return hashlib.sha1(f"{subject.lower()}\n{fingerprint}".encode('utf-8', 'replace')).hexdigest()
+
+class SignalCoalescer:
+    """Tahap antara pencocokan aturan dan eksekusi order.
+
+    check_duplicate membuang sinyal yang Message-ID-nya, atau isinya (Subjek +
+    body utuh, hanya jika body diambil), sama dengan sinyal (pair & aksi sama)
+    dalam jendela dedupe, termasuk antar mailbox. hold menahan sinyal per pair selama jendela netting; saat
+    jendela habis BUY & SELL saling menghapus dan hanya sisa bersihnya yang
+    dieksekusi (sinyal terbaru dari sisi yang menang).
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seen = {} # (jenis, nilai, pair, aksi) -> epoch terakhir
+        self.pending = {} # pair -> [(aksi, callable, trace)]
+        self.timers = {}
+        self.stats = {'duplicate': 0, 'netted': 0}
+
+    def check_duplicate(self, window, message_id, content_hash, pair, action_word):
+        """Return 'message_id' / 'content' jika duplikat, None jika sinyal baru (lalu dicatat)."""
+        if window <= 0: return None
+        now = time.time()
+        keys = ([('message_id', message_id, pair, action_word)] if message_id else []) + ([('content', content_hash, pair, action_word)] if content_hash else [])
+        with self.lock:
+            self.seen = {key: ts for key, ts in self.seen.items() if now - ts <= window} if len(self.seen) > 1000 else self.seen
+            for key in keys:
+                if now - self.seen.get(key, float('-inf')) <= window:
+                    self.stats['duplicate'] += 1
+                    return key[0]
+            for key in keys: self.seen[key] = now
+        return None
+
+    def hold(self, seconds, pair, action_word, action, trace=None):
+        """Tahan sinyal untuk netting; action() dipanggil jika sinyal ini bagian dari sisa bersih."""
+        with self.lock:
+            self.pending.setdefault(pair, []).append((action_word, action, trace))
+            if pair not in self.timers:
+                timer = threading.Timer(seconds, self._flush, args=(pair,))
+                timer.daemon = True
+                self.timers[pair] = timer
+                timer.start()
+        EVENTS.emit('signal_held', action=action_word, pair=pair, seconds=seconds)
+
+    def _flush(self, pair):
+        with self.lock:
+            signals = self.pending.pop(pair, [])
+            self.timers.pop(pair, None)
+        buys = [s for s in signals if s[0] == 'buy']
+        sells = [s for s in signals if s[0] != 'buy']
+        net = len(buys) - len(sells)
+        winners = buys[len(buys) - net:] if net > 0 else sells[len(sells) + net:] if net < 0 else []
+        cancelled = [s for s in signals if s not in winners]
+        with self.lock: self.stats['netted'] += len(cancelled)
+        if cancelled:
+            EVENTS.emit('signals_netted', pair=pair, buys=len(buys), sells=len(sells), net=net)
+            for _, _, trace in cancelled: signal_done(trace)
+        if not running: return
+        for _, action, _ in winners: action()
+
+    def cancel_pending(self):
+        """Batalkan sinyal yang masih ditahan (listener berhenti). Return jumlahnya."""
+        with self.lock:
+            for timer in self.timers.values(): timer.cancel()
+            count = sum(len(signals) for signals in self.pending.values())
+            self.pending, self.timers = {}, {}
+        return count
+
+SIGNAL_COALESCER = SignalCoalescer()
 
-        # Tandai sudah dibaca
+# --- Fungsi Pemrosesan Email ---
+def trigger_action(action_word, settings, binance_client, dispatcher=None, trace=None):
+    """Jalankan aksi sinyal: beep + order Binance (jika aktif).
+
+    Dengan dispatcher, beep & order jalan di background sehingga loop IMAP
+    langsung lanjut ke email berikutnya. trace (dict timestamp tahap) dicatat
+    ke LATENCY setelah order selesai, atau langsung jika tidak ada order.
+    """
+    execute_binance = settings.execute_binance_orders
+    side = Client.SIDE_BUY if action_word == "buy" else Client.SIDE_SELL
+
+    if dispatcher: dispatcher.beep(action_word)
+    else: trigger_beep(action_word)
+
+    if not execute_binance: signal_done(trace); return
+    if not binance_client:
+        print(f"{CYAN}│{RESET} {YELLOW}[!] Eksekusi aktif, tapi koneksi Binance bermasalah.{RESET}")
+        signal_done(trace); return
+    # Cek Qty > 0 sebelum mencoba eksekusi sell
+    if side == Client.SIDE_SELL and settings.sell_base_quantity <= 0: signal_done(trace); return
+
+    if dispatcher: dispatcher.submit(binance_client, settings, side, trace)
+    else:
+        execute_binance_order(binance_client, settings, side, trace=trace)
+        signal_done(trace)
+
+def process_email_batch(mail, uids, settings, binance_client, uid_state=None, dispatcher=None, rule_set=None, label="", detected_at=None):
+    """Proses sekumpulan email baru berdasarkan UID.
+
+    1x UID FETCH header untuk semua, body hanya diambil (massal) untuk email
+    yang masih punya aturan belum menyala dari Subjek (hanya aturan itu yang
+    discan di body), lalu 1x UID STORE \\Seen di akhir.
+    uid_state (opsional) dimajukan setelah tiap email agar restart tidak
+    mengulang order yang sudah dieksekusi. rule_set (opsional) adalah hasil
+    compile_signal_rules, agar tidak dikompilasi ulang tiap batch. label
+    ditampilkan di kotak email saat beberapa mailbox didengarkan sekaligus.
+    detected_at = waktu UID muncul di SEARCH (awal pengukuran latensi lokal).
+    """
+    global running
+    if not running or not uids: return
+
+    if rule_set is None: rule_set = compile_signal_rules(settings)
+    if detected_at is None: detected_at = time.time()
+    contents = {} # uid -> [subject, sender, part_info, iterator potongan body]
+    traces = {} # uid -> timestamp tiap tahap (lihat LatencyTracker)
+    message_ids = {} # uid -> Message-ID (deduplikasi sinyal)
+    fingerprints = {} # uid -> sidik jari body utuh, hanya jika body diambil (deduplikasi sinyal)
+
+    # Tahap 1: header saja (Subject/From + BODYSTRUCTURE), satu round trip
+    if settings.use_partial_fetch:
+        status, headers = fetch_headers_batch(mail, uids)
+        if status != 'OK':
+            print(f"{RED}[X] Gagal fetch header {len(uids)} email: {status}{RESET}")
+            return
+        fetched_at = time.time()
+        for uid, (subject, sender, part_info, (sent, received), message_id) in headers.items():
+            contents[uid] = [subject, sender, part_info, None]
+            message_ids[uid] = message_id
+            traces[uid] = {'sent': sent, 'received': received, 'detected': detected_at, 'fetched': fetched_at}
+    missing = [uid for uid in uids if uid not in contents]
+    if missing:
+        status, full = fetch_full_batch(mail, missing)
+        if status != 'OK': print(f"{RED}[X] Gagal fetch {len(missing)} email: {status}{RESET}")
+        fetched_at = time.time()
+        for uid, (subject, sender, body, (sent, received), message_id, fingerprint) in full.items():
+            contents[uid] = [subject, sender, None, body]
+            message_ids[uid] = message_id
+            fingerprints[uid] = fingerprint
+            traces[uid] = {'sent': sent, 'received': received, 'detected': detected_at, 'fetched': fetched_at}
+
+    # Fast path: putuskan dari Subject (opsional + From) tanpa menyentuh body
+    subject_results = {}
+    body_rule_sets = {} # aturan yang belum terputuskan dari Subjek -> SignalRuleSet untuk scan body
+    for uid, (subject, sender, part_info, body) in contents.items():
+        if body is None:
+            header_text = subject.lower()
+            if settings.header_match_include_sender: header_text += " " + sender.lower()
+            subject_results[uid] = rule_set.match(header_text)
+
+    processed = []
+    bodies_loaded = False
+    in_order = True # High-water mark hanya maju selama belum ada email yang gagal
+    pending_uid = None
+    for idx, uid in enumerate(uids):
+        if not running: break
+        uid_str = uid.decode('utf-8')
+        if uid not in contents:
+            EVENTS.emit('email_failed', mailbox=label, uid=uid_str, reason='fetch')
+            in_order = False
+            continue
         try:
-            mail.store(email_id, '+FLAGS', '\\Seen')
-            print(f"{CYAN}│{RESET} {DIM}Email ditandai sudah dibaca.{RESET}")
+            subject, sender, part_info, body = contents[uid]
+            EVENTS.emit('email_received', mailbox=label, uid=uid_str, sender=sender, subject=subject)
+
+            matches = subject_results.get(uid, [])
+            fired = [m for m in matches if m[1] == 'ok']
+            subject_rules = {m[0] for m in fired}
+            match_path = 'subject' if fired and len(fired) == len(matches) else None # Semua aturan sudah menyala dari Subjek
+
+            # Tahap 2: body hanya jika masih ada aturan yang belum menyala dari Subject
+            if match_path is None:
+                if body is None:
+                    if not bodies_loaded:
+                        # Ambil body massal untuk semua email tersisa yg Subjeknya belum meyakinkan
+                        pending = {u: contents[u][2] for u in uids[idx:]
+                                   if u in subject_results and not (subject_results[u] and all(m[1] == 'ok' for m in subject_results[u]))}
+                        status, bodies = fetch_bodies_batch(mail, pending, settings)
+                        if status != 'OK': print(f"{CYAN}│{RESET} {RED}Gagal fetch body: {status}{RESET}")
+                        fetched_at = time.time()
+                        for u, (b, fingerprint) in bodies.items():
+                            contents[u][3] = b
+                            fingerprints[u] = fingerprint
+                            traces[u]['fetched'] = fetched_at
+                        bodies_loaded = True
+                    body = contents[uid][3]
+                    if body is None:
+                        EVENTS.emit('email_failed', mailbox=label, uid=uid_str, reason='body')
+                        in_order = False
+                        continue
+                if subject_rules: # Hanya aturan yang belum menyala dari Subjek yang discan di body
+                    rest = tuple(m[0] for m in matches if m[0] not in subject_rules)
+                    if rest not in body_rule_sets: body_rule_sets[rest] = SignalRuleSet(list(rest))
+                    body_matches = scan_email_body(body_rule_sets[rest], subject, body)
+                    body_results = {m[0]: m for m in body_matches}
+                    matches = [m if m[0] in subject_rules else body_results[m[0]] for m in matches]
+                else:
+                    matches = scan_email_body(rule_set, subject, body)
+                fired = [m for m in matches if m[1] == 'ok']
+                match_path = 'body' if len(fired) > len(subject_rules) else ('subject' if fired else 'none')
+            MATCH_PATH_STATS[match_path] += 1
+
+            if fired:
+                matched_at = time.time()
+                content_hash = signal_content_hash(subject, fingerprints[uid]) if uid in fingerprints else None # Jalur Subjek: Message-ID saja
+                for rule, result, action_word in fired:
+                    path_desc = "Subjek" if rule in subject_rules else "Body"
+                    EVENTS.emit('rule_matched', mailbox=label, uid=uid_str, rule=rule.name, multi_rule=len(rule_set.rules) > 1,
+                                target=rule.target_label, trigger=rule.trigger_label, action=action_word, pair=rule.pair, path=path_desc)
+                    duplicate = SIGNAL_COALESCER.check_duplicate(settings.signal_dedupe_seconds, message_ids.get(uid),
+                                                                 content_hash, rule.pair, action_word)
+                    if duplicate:
+                        EVENTS.emit('signal_duplicate', mailbox=label, uid=uid_str, action=action_word, pair=rule.pair,
+                                    reason=duplicate, window=settings.signal_dedupe_seconds)
+                        continue
+                    trace = dict(traces[uid], matched=matched_at, uid=uid_str, rule=rule.name, pair=rule.pair, mailbox=label)
+                    if uid_state is not None and in_order: trace['release_uid'] = hold_uid_state(uid_state, uid) # Lepas saat order selesai
+                    action = functools.partial(trigger_action, action_word, rule.order_settings, binance_client, dispatcher, trace)
+                    net_seconds = settings.signal_net_seconds
+                    if net_seconds > 0: SIGNAL_COALESCER.hold(net_seconds, rule.pair, action_word, action, trace)
+                    else: action()
+            elif not matches:
+                EVENTS.emit('signal_unmatched', mailbox=label, uid=uid_str, result='no_rules')
+            else:
+                # Tampilkan aturan yang paling jauh progresnya
+                rule, result, action_word = max(matches, key=lambda m: RESULT_PROGRESS[m[1]])
+                EVENTS.emit('signal_unmatched', mailbox=label, uid=uid_str, result=result, rule=rule.name, rules=len(matches),
+                            target=rule.target_label, trigger=rule.trigger_label, action_word=action_word)
+            processed.append(uid)
+            if uid_state is not None and in_order:
+                if fired: save_uid_state(uid_state, uid) # Simpan segera (tertahan selama order-nya masih antre)
+                else: pending_uid = uid # Cukup disimpan sekali di akhir batch
+            EVENTS.emit('email_done', mailbox=label, uid=uid_str, path=match_path) # Footer akhir
+        except (imaplib.IMAP4.abort, OSError):
+            raise # Koneksi putus, biarkan listener reconnect
         except Exception as e:
-            print(f"{CYAN}│{RESET} {RED}[X] Gagal tandai dibaca: {e}{RESET}")
+            EVENTS.emit('email_failed', mailbox=label, uid=uid_str, reason='error', error=repr(e))
+            traceback.print_exc()
+            in_order = False
 
-        print(f"{CYAN}╰{'─' * (get_terminal_width() - 1)}{RESET}") # Footer akhir
+    if uid_state is not None and pending_uid: save_uid_state(uid_state, pending_uid)
 
+    # Tandai sudah dibaca sekaligus
+    try:
+        status = mark_seen_batch(mail, processed)
+        if status == 'OK':
+            if processed: EVENTS.emit('emails_seen', mailbox=label, count=len(processed))
+        else: print(f"{RED}[X] Gagal tandai dibaca: {status}{RESET}")
+    except (imaplib.IMAP4.abort, OSError):
+        raise
     except Exception as e:
-        print(f"{log_prefix} {RED}{BOLD}FATAL Error proses email:{RESET}")
-        traceback.print_exc()
+        print(f"{RED}[X] Gagal tandai dibaca: {e}{RESET}")
 
 # --- Fungsi Listening Utama ---
 # (start_listening perlu penyesuaian pesan log dan waiting indicator)
-def start_listening(settings):
-    global running
-    running = True
-    mail = None
-    binance_client = None
-    last_check_time = time.time()
-    consecutive_errors = 0
-    max_errors = 5
+MAILBOX_OVERRIDE_KEYS = ("email_address", "app_password", "imap_server", "imap_port", "imap_use_ssl", "check_interval_seconds", "use_imap_idle",
+                         "use_partial_fetch", "body_fetch_max_bytes", "header_match_include_sender", *SEARCH_FILTER_KEYS,
+                         "target_keyword", "trigger_keyword", "signal_rules",
+                         "trading_pair", "buy_quote_quantity", "sell_base_quantity")
+
+def is_valid_mailbox(mailbox):
+    """Cek struktur satu entri mailboxes di config."""
+    if not isinstance(mailbox, dict): return False
+    if not all(isinstance(mailbox.get(k), str) and mailbox[k].strip() for k in ('email_address', 'app_password')): return False
+    if not all(isinstance(mailbox.get(k, ''), str) for k in ('folder', 'imap_server', 'trading_pair')): return False
+    if not isinstance(mailbox.get('imap_port', 0), int) or not isinstance(mailbox.get('imap_use_ssl', True), bool): return False
+    if not is_valid_search_filter(mailbox): return False
+    if not isinstance(mailbox.get('signal_rules', []), list) or not all(is_valid_signal_rule(r) for r in mailbox.get('signal_rules', [])): return False
+    return True
+
+def build_mailbox_configs(settings):
+    """Mailbox utama (dari menu) + mailboxes dari config -> [(nama, folder, settings_mailbox)].
+
+    settings_mailbox = settings global yang ditimpa override milik mailbox
+    tersebut (kredensial, server, keyword/aturan), sehingga fungsi
+    pemrosesan yang sama bisa dipakai tanpa perubahan.
+    """
+    configs = []
+    if settings.email_address and settings.app_password:
+        configs.append((settings.email_address, "inbox", settings))
+    for idx, mailbox in enumerate(settings.active_mailboxes, 1):
+        name = mailbox.get('name') or mailbox['email_address']
+        overrides = {k: mailbox[k] for k in MAILBOX_OVERRIDE_KEYS if k in mailbox}
+        checked = validate_settings(overrides) # Validasi yang sama dengan config utama
+        invalid = [k for k in overrides if checked[k] != overrides[k]]
+        if invalid:
+            print(f"{YELLOW}[!] Override {', '.join(invalid)} di mailbox '{name}' tidak valid & diabaikan (pakai nilai utama).{RESET}")
+            for k in invalid: del overrides[k]
+        if 'target_keyword' in mailbox or 'trigger_keyword' in mailbox or 'signal_rules' in mailbox:
+            overrides.setdefault('signal_rules', []) # Aturan mailbox tidak mewarisi aturan tambahan global
+        configs.append((name, mailbox.get('folder') or "inbox", dataclasses.replace(settings, **overrides)))
+    return configs
+
+class MailboxListener:
+    """Loop listen satu mailbox: koneksi, IDLE/polling, proses email & backoff sendiri.
+
+    Beberapa MailboxListener bisa jalan paralel (satu thread per mailbox)
+    dengan dispatcher order & sesi Binance yang sama.
+    """
     wait_time = 2
     long_wait = 60
-
-    # --- Setup Binance (jika aktif) ---
-    execute_binance = settings.get("execute_binance_orders", False)
-    if execute_binance:
-        if not BINANCE_AVAILABLE:
-            print(f"{RED}{BOLD}[X] FATAL: Eksekusi Binance aktif tapi library tidak ada!{RESET}")
-            print(f"{DIM}   (Install: pip install python-binance requests){RESET}")
-            running = False; return
-        print_separator('─', CYAN)
-        print_centered("Inisialisasi Binance", CYAN, BOLD)
-        binance_client = get_binance_client(settings)
-        if not binance_client:
-            print(f"{YELLOW}[!] Gagal koneksi awal Binance. Eksekusi order tidak akan jalan.{RESET}")
-            print(f"{YELLOW}    Program lanjut untuk Email saja.{RESET}")
-        print_separator('─', CYAN)
-        time.sleep(1) # Jeda sedikit
-
-    elif BINANCE_AVAILABLE: # Beri info jika library ada tapi fitur nonaktif
-         print_separator('─', YELLOW)
-         print_centered("Eksekusi Binance: NONAKTIF", YELLOW, BOLD)
-         print(f"{DIM}   (Mode Email Listener Only. Aktifkan di Pengaturan jika perlu){RESET}")
-         print_separator('─', YELLOW)
-         time.sleep(1)
-
-    # --- Loop Utama ---
-    print(f"\n{GREEN}{BOLD}Memulai listener... (Ctrl+C untuk berhenti){RESET}")
     wait_indicator_chars = ['∙', '·', '˙', ' '] # Karakter indikator tunggu
-    indicator_idx = 0
 
-    while running:
+    def __init__(self, name, folder, settings, binance_session=None, dispatcher=None, show_name=False):
+        self.name = name
+        self.folder = folder
+        self.settings = settings
+        self.binance_session = binance_session
+        self.dispatcher = dispatcher
+        self.tag = f"{MAGENTA}[{name}]{RESET} " if show_name else "" # Prefix log saat multi-mailbox
+        self.label = name if show_name else "" # Nama mailbox di event (kosong jika cuma satu)
+        self.rule_set = compile_signal_rules(settings) # Dikompilasi sekali untuk seluruh sesi
+        self.mail = None
+        self.consecutive_errors = 0
+        self.stopped = False # Berhenti permanen (mis. otentikasi gagal), mailbox lain tetap jalan
+        self.last_check_time = time.time()
+        self.indicator_idx = 0
+        self.show_indicator = True # Engine asyncio memakai spinner bersama
+        self.search_filter = "" # Kriteria SEARCH tambahan, diisi _prepare() sesuai kapabilitas server
+        self.capabilities = None # Kapabilitas server koneksi saat ini (untuk menyusun ulang filter saat config dimuat ulang)
+        self.next_config = None # (settings, rule_set) dari ConfigReloader, dipasang di awal _check_mail berikutnya
+        self.uid_state = None # Dipertahankan antar reconnect: order yang masih antre tetap tercatat di 'inflight'
+
+    def _select_folder(self):
+        folder = self.folder if self.folder.startswith('"') or ' ' not in self.folder else f'"{self.folder}"'
+        rv, data = self.mail.select(folder)
+        if rv != 'OK': raise imaplib.IMAP4.error(f"Folder '{self.folder}' tidak bisa dibuka: {data}")
+
+    def connect(self):
+        settings = self.settings
+        print(f"\n{self.tag}{CYAN}[...] Menghubungkan ke IMAP {imap_address(settings)}...{RESET}")
         try:
-            # --- Koneksi IMAP ---
-            if not mail or mail.state != 'SELECTED':
-                print(f"\n{CYAN}[...] Menghubungkan ke IMAP {settings['imap_server']}...{RESET}")
-                try:
-                    mail = imaplib.IMAP4_SSL(settings['imap_server'], timeout=20) # Timeout lebih pendek
-                    rv, desc = mail.login(settings['email_address'], settings['app_password'])
-                    if rv != 'OK': raise imaplib.IMAP4.error(f"Login failed: {desc}")
-                    mail.select("inbox")
-                    print(f"{GREEN}[OK] Terhubung & Login ke {settings['email_address']}. Mendengarkan...{RESET}")
-                    consecutive_errors = 0; wait_time = 2 # Reset error & wait time
-                except (imaplib.IMAP4.error, OSError, socket.error) as login_err:
-                    print(f"{RED}{BOLD}[X] Gagal koneksi/login IMAP!{RESET}")
-                    print(f"{RED}    └─ {login_err}{RESET}")
-                    if "authentication failed" in str(login_err).lower():
-                         print(f"{YELLOW}       ↳ Periksa Email/App Password & Izin IMAP.{RESET}")
-                         running = False # Berhenti jika otentikasi gagal
-                    else:
-                        print(f"{YELLOW}       ↳ Periksa server IMAP & koneksi internet.{RESET}")
-                        consecutive_errors += 1
-                    mail = None # Pastikan state bersih
-                    # Jangan langsung break, biarkan loop luar handle backoff/exit
-
-            # --- Loop Cek Email & Koneksi ---
-            if mail and mail.state == 'SELECTED':
-                while running:
-                    current_time = time.time()
-                    if current_time - last_check_time < settings['check_interval_seconds']:
-                        time.sleep(0.5)
-                        continue
+            self.mail = imap_connect(settings) # Timeout lebih pendek
+            rv, desc = self.mail.login(settings.email_address, settings.app_password)
+            if rv != 'OK': raise imaplib.IMAP4.error(f"Login failed: {desc}")
+            self._select_folder()
+            EVENTS.emit('imap_connected', mailbox=self.label, email=settings.email_address, server=imap_address(settings), folder=self.folder)
+            self.consecutive_errors = 0 # Reset error & wait time
+        except (imaplib.IMAP4.error, OSError, socket.error) as login_err:
+            print(f"{self.tag}{RED}{BOLD}[X] Gagal koneksi/login IMAP!{RESET}")
+            print(f"{RED}    └─ {login_err}{RESET}")
+            if "authentication failed" in str(login_err).lower():
+                 print(f"{YELLOW}       ↳ Periksa Email/App Password & Izin IMAP.{RESET}")
+                 self.stopped = True # Berhenti jika otentikasi gagal
+            else:
+                print(f"{YELLOW}       ↳ Periksa server IMAP & koneksi internet.{RESET}")
+                self.consecutive_errors += 1
+            self.mail = None # Pastikan state bersih
 
-                    # NOOP Check
-                    try:
-                        status, _ = mail.noop()
-                        if status != 'OK': raise imaplib.IMAP4.abort("NOOP Failed")
-                    except (imaplib.IMAP4.abort, imaplib.IMAP4.readonly, BrokenPipeError, OSError) as noop_err:
-                        print(f"\n{YELLOW}[!] Koneksi IMAP terputus ({type(noop_err).__name__}). Reconnecting...{RESET}")
-                        try: mail.logout()
-                        except Exception: pass
-                        mail = None; consecutive_errors += 1
-                        break # Keluar loop inner, reconnect di loop luar
-
-                    # Binance Ping Check (lebih jarang)
-                    if binance_client and current_time - getattr(binance_client, '_last_ping', 0) > 60:
-                         try:
-                             binance_client.ping()
-                             setattr(binance_client, '_last_ping', current_time)
-                         except Exception:
-                             print(f"\n{YELLOW}[!] Ping Binance gagal. Mencoba reconnect Binance...{RESET}")
-                             binance_client = get_binance_client(settings) # Coba buat ulang
-                             setattr(binance_client, '_last_ping', current_time) # Update waktu coba
-
-                    # Cek Email UNSEEN
-                    status, messages = mail.search(None, '(UNSEEN)')
-                    if status != 'OK':
-                         print(f"\n{RED}[X] Gagal cari email UNSEEN: {status}. Reconnecting...{RESET}")
-                         try: mail.close(); mail.logout()
-                         except Exception: pass
-                         mail = None; consecutive_errors += 1
-                         break # Reconnect
-
-                    email_ids = messages[0].split()
-                    if email_ids:
-                        num = len(email_ids)
-                        print(f"\n{GREEN}{BOLD}[!] {num} email baru ditemukan!{RESET}")
-                        for i, eid in enumerate(email_ids):
-                            if not running: break
-                            # print(f"{DIM}--- Proses email {i+1}/{num} ---{RESET}") # Opsi: lebih detail
-                            process_email(mail, eid, settings, binance_client)
-                        if not running: break
-                        print(f"{GREEN}[OK] Selesai proses {num} email. Mendengarkan lagi...{RESET}")
-                    else:
-                        # Tampilkan indikator tunggu
-                        indicator_idx = (indicator_idx + 1) % len(wait_indicator_chars)
-                        wait_char = wait_indicator_chars[indicator_idx]
-                        print(f"{BLUE}[{wait_char}] Menunggu email baru... {DIM}(Interval: {settings['check_interval_seconds']}s){RESET}   ", end='\r')
-
-                    last_check_time = current_time
-                    if not running: break # Cek lagi sebelum tidur
-
-                # Keluar loop inner (jika running=False atau ada error)
-                if mail and mail.state == 'SELECTED': # Coba close jika state masih selected
-                   try: mail.close()
-                   except Exception: pass
-
-        # --- Exception Handling Loop Luar ---
-        except (imaplib.IMAP4.error, imaplib.IMAP4.abort, socket.error, OSError) as e:
-             print(f"\n{RED}{BOLD}[X] Error IMAP/Network di loop utama: {e}{RESET}")
-             consecutive_errors += 1
-             # Jika error login sudah ditangani di atas, ini lebih ke koneksi
-        except Exception as e:
-             print(f"\n{RED}{BOLD}[X] Error tak terduga di loop utama:{RESET}")
-             traceback.print_exc()
-             consecutive_errors += 1
+    def _drop_connection(self, close=False):
+        try:
+            if close: self.mail.close()
+            self.mail.logout()
+        except Exception: pass
+        self.mail = None; self.consecutive_errors += 1
+
+    def _prepare(self):
+        """Muat state UID & cek dukungan IDLE setelah SELECT. Return (uid_state, use_idle).
+
+        State UID hanya dibaca dari disk di koneksi pertama (atau jika
+        UIDVALIDITY berubah); reconnect memakai state di memori, sehingga
+        pending_uids milik order yang masih jalan tidak diulang.
+        """
+        settings, mail = self.settings, self.mail
+        state_key, uidvalidity = f"{settings.email_address}|{imap_address(settings)}|{self.folder}", get_uidvalidity(mail)
+        uid_state = self.uid_state
+        if uid_state is None or uid_state['key'] != state_key or uid_state['uidvalidity'] != uidvalidity:
+            uid_state = self.uid_state = load_uid_state(state_key, uidvalidity)
+            if uid_state['last_uid']:
+                print(f"{self.tag}{DIM}[i] Lanjut dari UID {uid_state['last_uid']} (email lama tidak discan ulang).{RESET}")
+        capabilities = self.capabilities = imap_capabilities(mail)
+        use_idle = settings.use_imap_idle and 'IDLE' in capabilities
+        if use_idle:
+            print(f"{self.tag}{GREEN}[OK] Server mendukung IDLE. Mode push aktif.{RESET}")
+        elif settings.use_imap_idle:
+            print(f"{self.tag}{YELLOW}[i] Server tidak mendukung IDLE. Kembali ke mode polling.{RESET}")
+        self.search_filter, raw_ignored = build_search_filter(settings, capabilities)
+        if raw_ignored:
+            print(f"{self.tag}{YELLOW}[!] Server bukan Gmail (tanpa X-GM-EXT-1). 'imap_search_gmail_raw' diabaikan.{RESET}")
+        if self.search_filter:
+            print(f"{self.tag}{DIM}[i] Filter SEARCH server: {self.search_filter} (email lain dibiarkan belum dibaca).{RESET}")
+        return uid_state, use_idle
+
+    def _noop(self):
+        """NOOP untuk mode polling. Return False jika koneksi putus (sudah di-drop)."""
+        try:
+            status, _ = self.mail.noop()
+            if status != 'OK': raise imaplib.IMAP4.abort("NOOP Failed")
+        except (imaplib.IMAP4.abort, imaplib.IMAP4.readonly, BrokenPipeError, OSError) as noop_err:
+            print(f"\n{self.tag}{YELLOW}[!] Koneksi IMAP terputus ({type(noop_err).__name__}). Reconnecting...{RESET}")
+            self._drop_connection()
+            return False
+        return True
 
-        finally:
-            if mail and mail.state != 'LOGOUT': # Logout jika belum
-                try: mail.logout()
-                except Exception: pass
-            mail = None # Pastikan reconnect
+    def _apply_config(self):
+        """Pasang config hasil muat ulang (jika ada) di thread listener, di antara dua batch email."""
+        config = self.next_config
+        if config is None or config[0] is self.settings: return
+        self.settings, self.rule_set = config
+        if self.capabilities is not None:
+            self.search_filter, _ = build_search_filter(self.settings, self.capabilities)
+
+    def _check_mail(self, uid_state, use_idle):
+        """Satu putaran SEARCH + proses email baru. Return False jika perlu reconnect / berhenti."""
+        self._apply_config()
+        settings, mail = self.settings, self.mail
+        # Cek Email UNSEEN (pakai UID agar stabil walau nomor urut bergeser)
+        # Hanya UID setelah high-water mark: resume O(email baru); filter server menyaring email non-sinyal
+        status, messages = mail.uid('SEARCH', None, build_search_criteria(uid_state['last_uid'], self.search_filter))
+        detected_at = time.time()
+        if status != 'OK':
+             print(f"\n{self.tag}{RED}[X] Gagal cari email UNSEEN: {status}. Reconnecting...{RESET}")
+             self._drop_connection(close=True)
+             return False
+
+        # 'UID n:*' selalu memuat UID terbesar walau < n, saring ulang di sini
+        email_ids = [uid for uid in messages[0].split() if int(uid) > uid_state['last_uid']]
+        with STATE_LOCK: # UID yang order-nya masih jalan di proses ini tidak pernah diulang
+            retry = [uid for uid in uid_state['retry'] if uid not in uid_state['inflight']]
+            uid_state['retry'] = []
+        if retry:
+            print(f"{self.tag}{YELLOW}[i] Mengulang {len(retry)} email yang order-nya belum sempat jalan saat listener berhenti.{RESET}")
+            email_ids = sorted(set(email_ids) | {str(uid).encode() for uid in retry}, key=int)
+        if email_ids:
+            num = len(email_ids)
+            EVENTS.emit('new_mail', mailbox=self.label, count=num)
+            binance_client = self.binance_session.client if self.binance_session else None
+            process_email_batch(mail, email_ids, settings, binance_client, uid_state, self.dispatcher, self.rule_set, self.label, detected_at)
+            if not running: return False
+            EVENTS.emit('batch_done', mailbox=self.label, count=num, stats=format_match_stats())
+        elif self.show_indicator and not EVENTS.quiet:
+            # Tampilkan indikator tunggu
+            self.indicator_idx = (self.indicator_idx + 1) % len(self.wait_indicator_chars)
+            wait_char = self.wait_indicator_chars[self.indicator_idx]
+            wait_mode = "IDLE" if use_idle else f"Interval: {settings.check_interval_seconds}s"
+            print(f"{self.tag}{BLUE}[{wait_char}] Menunggu email baru... {DIM}({wait_mode}){RESET}   ", end='\r')
+        return True
 
-            if not running: break # Keluar jika dihentikan
+    def _idle_lost(self, idle_err):
+        print(f"\n{self.tag}{YELLOW}[!] Koneksi IMAP terputus saat IDLE ({type(idle_err).__name__}). Reconnecting...{RESET}")
+        self._drop_connection()
+
+    def listen(self):
+        """Loop cek email selama koneksi SELECTED. Kembali jika koneksi putus atau listener dihenti."""
+        uid_state, use_idle = self._prepare()
+
+        while running:
+            current_time = time.time()
+            if not use_idle and current_time - self.last_check_time < self.settings.check_interval_seconds:
+                time.sleep(0.5)
+                continue
+
+            # NOOP Check (mode IDLE sudah menjaga koneksi tetap hidup)
+            if not use_idle and not self._noop(): return # Reconnect di loop luar
+            if not self._check_mail(uid_state, use_idle): return # Reconnect / berhenti
+
+            self.last_check_time = current_time
+            if not running: return # Cek lagi sebelum tidur
+
+            # Mode IDLE: tunggu push dari server (keepalive Binance jalan di thread sendiri)
+            if use_idle:
+                try:
+                    imap_idle_wait(self.mail, IDLE_REFRESH_SECONDS)
+                except (imaplib.IMAP4.abort, BrokenPipeError, OSError) as idle_err:
+                    self._idle_lost(idle_err)
+                    return # Reconnect
+                except imaplib.IMAP4.error as idle_err:
+                    print(f"\n{self.tag}{YELLOW}[!] {idle_err}. Kembali ke mode polling.{RESET}")
+                    use_idle = False
+
+    def run(self):
+        """Loop luar: (re)connect, listen, backoff eksponensial per mailbox."""
+        while running and not self.stopped:
+            try:
+                # --- Koneksi IMAP ---
+                if not self.mail or self.mail.state != 'SELECTED':
+                    self.connect()
+
+                # --- Loop Cek Email & Koneksi ---
+                if self.mail and self.mail.state == 'SELECTED':
+                    self.listen()
+                    # Keluar loop inner (jika running=False atau ada error)
+                    if self.mail and self.mail.state == 'SELECTED': # Coba close jika state masih selected
+                       try: self.mail.close()
+                       except Exception: pass
+
+            # --- Exception Handling Loop Luar ---
+            except (imaplib.IMAP4.error, imaplib.IMAP4.abort, socket.error, OSError) as e:
+                 print(f"\n{self.tag}{RED}{BOLD}[X] Error IMAP/Network di loop utama: {e}{RESET}")
+                 self.consecutive_errors += 1
+            except Exception as e:
+                 print(f"\n{self.tag}{RED}{BOLD}[X] Error tak terduga di loop utama:{RESET}")
+                 traceback.print_exc()
+                 self.consecutive_errors += 1
+
+            finally:
+                if self.mail and self.mail.state != 'LOGOUT': # Logout jika belum
+                    try: self.mail.logout()
+                    except Exception: pass
+                self.mail = None # Pastikan reconnect
+
+            if not running or self.stopped: break # Keluar jika dihentikan
 
             # Backoff logic
-            if consecutive_errors > 0:
-                current_wait = wait_time * (2**(consecutive_errors-1)) # Exponential backoff
-                current_wait = min(current_wait, long_wait) # Batasi maks wait time
-                print(f"{YELLOW}[!] Terjadi error ({consecutive_errors}x). Mencoba lagi dalam {current_wait} detik...{RESET}")
+            if self.consecutive_errors > 0:
+                current_wait = self.wait_time * (2**(self.consecutive_errors-1)) # Exponential backoff
+                current_wait = min(current_wait, self.long_wait) # Batasi maks wait time
+                print(f"{self.tag}{YELLOW}[!] Terjadi error ({self.consecutive_errors}x). Mencoba lagi dalam {current_wait} detik...{RESET}")
                 sleep_start = time.time()
                 while time.time() - sleep_start < current_wait:
                      if not running: break # Bisa diinterupsi saat tidur
                      time.sleep(1)
-                if not running: break
             else:
                  time.sleep(0.5) # Jeda normal antar loop utama jika tidak error
 
-    print(f"\n{YELLOW}{BOLD}[INFO] Listener dihentikan.{RESET}")
+# --- Muat Ulang Konfigurasi (Hot Reload) ---
+class ConfigReloader:
+    """Pantau config.json selama listener jalan (mtime tiap config_reload_seconds, atau SIGHUP).
+
+    Config baru divalidasi & aturan sinyal dikompilasi di thread ini, lalu
+    dipasang ke tiap listener sebagai satu tuple (next_config) yang diambil
+    listener di antara dua batch: koneksi IMAP & Binance tidak diputus.
+    Kunci yang butuh koneksi/worker baru tetap memakai nilai lama sampai restart.
+    """
+    RESTART_KEYS = ("binance_api_key", "binance_api_secret", "binance_api_url", "execute_binance_orders", "order_workers",
+                    "order_queue_size", "binance_pool_size", "binance_keepalive_seconds", "event_log_file", "config_reload_seconds")
+    CONNECTION_KEYS = ("email_address", "app_password", "imap_server", "imap_port", "imap_use_ssl", "use_imap_idle")
+
+    def __init__(self, settings, listeners, binance_session=None):
+        self.settings = settings
+        self.listeners = listeners
+        self.binance_session = binance_session
+        self.interval = settings.config_reload_seconds
+        self.stamp = self._stamp()
+        self.requested = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def _stamp():
+        try:
+            st = os.stat(CONFIG_FILE)
+            return (st.st_mtime_ns, st.st_size)
+        except OSError:
+            return None
+
+    def request(self):
+        """Minta muat ulang segera (dipanggil handler SIGHUP; aman karena hanya set Event)."""
+        self.requested.set()
+
+    def start(self):
+        self.thread = threading.Thread(target=self._watch_loop, name="config-reload", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.requested.set()
+        if self.thread: self.thread.join(2)
+
+    def _watch_loop(self):
+        while not self.stop_event.is_set():
+            forced = self.requested.wait(self.interval or None)
+            if self.stop_event.is_set(): break
+            self.requested.clear()
+            stamp = self._stamp()
+            if forced or (stamp is not None and stamp != self.stamp):
+                self.stamp = stamp
+                try:
+                    self.reload("sighup" if forced else "mtime")
+                except Exception as e:
+                    EVENTS.emit('config_reload_failed', error=f"{type(e).__name__}: {e}")
+
+    def reload(self, reason="manual"):
+        """Baca, validasi & pasang config baru. Return daftar kunci yang berubah."""
+        try:
+            with open(CONFIG_FILE, 'r') as f:
+                loaded_settings = json.load(f)
+            if not isinstance(loaded_settings, dict): raise ValueError("isi config bukan objek JSON")
+        except (OSError, ValueError) as e: # Termasuk file yang sedang setengah ditulis editor
+            EVENTS.emit('config_reload_failed', error=str(e))
+            return []
+        new_settings = Settings.from_dict(loaded_settings)
+        changed = [k for k in DEFAULT_SETTINGS if getattr(new_settings, k) != getattr(self.settings, k)]
+        if not changed: return []
+        restart_needed = [k for k in changed if k in self.RESTART_KEYS]
+        effective = dataclasses.replace(new_settings, **{k: getattr(self.settings, k) for k in restart_needed})
+
+        # Susun & kompilasi semua dulu, baru dipasang: config tidak pernah terpasang setengah
+        configs = {(name, folder): mailbox_settings for name, folder, mailbox_settings in build_mailbox_configs(effective)}
+        updates = []
+        for listener in self.listeners:
+            mailbox_settings = configs.pop((listener.name, listener.folder), None)
+            if mailbox_settings is None or any(getattr(mailbox_settings, k) != getattr(listener.settings, k) for k in self.CONNECTION_KEYS):
+                restart_needed.append(f"mailbox {listener.name}") # Dihapus / kredensial & server berubah
+                continue
+            updates.append((listener, (mailbox_settings, compile_signal_rules(mailbox_settings))))
+        restart_needed += [f"mailbox baru {name}" for name, _ in configs]
+
+        for listener, config in updates: listener.next_config = config
+        previous_pairs = signal_rule_pairs(self.settings)
+        self.settings = effective
+        EVENTS.quiet = effective.quiet_console
+        EVENTS.emit('config_reloaded', reason=reason, changed=changed, restart_needed=restart_needed)
+        session = self.binance_session
+        if session:
+            session.settings = effective
+            if session.client and signal_rule_pairs(effective) != previous_pairs: # Siapkan filter pair baru sekarang, bukan saat order pertama
+                try: session._maintain_symbol_filters(session.client)
+                except Exception as e: print(f"{YELLOW}[!] Gagal menyiapkan filter simbol setelah muat ulang: {e}{RESET}")
+        return changed
+
+def setup_binance_session(settings):
+    """Inisialisasi sesi Binance untuk listener. Return (ok, binance_session); ok False jika fatal."""
+    if not settings.execute_binance_orders:
+        if BINANCE_AVAILABLE and not DAEMON_MODE: # Beri info jika library ada (sudah dimuat menu) tapi fitur nonaktif
+             print_separator('─', YELLOW)
+             print_centered("Eksekusi Binance: NONAKTIF", YELLOW, BOLD)
+             print(f"{DIM}   (Mode Email Listener Only. Aktifkan di Pengaturan jika perlu){RESET}")
+             print_separator('─', YELLOW)
+             time.sleep(1)
+        return True, None
+    if not load_binance():
+        print(f"{RED}{BOLD}[X] FATAL: Eksekusi Binance aktif tapi library tidak ada!{RESET}")
+        print(f"{DIM}   (Install: pip install python-binance requests){RESET}")
+        return False, None
+    print_separator('─', CYAN)
+    print_centered("Inisialisasi Binance", CYAN, BOLD)
+    binance_session = BinanceSession(settings)
+    if not binance_session.connect():
+        print(f"{YELLOW}[!] Gagal koneksi awal Binance. Eksekusi order tidak akan jalan.{RESET}")
+        print(f"{YELLOW}    Program lanjut untuk Email saja (reconnect dicoba di background).{RESET}")
+    binance_session.start_keepalive()
+    print_separator('─', CYAN)
+    if not DAEMON_MODE: time.sleep(1) # Jeda sedikit (menu interaktif)
+    return True, binance_session
+
+def print_rule_summary(listeners):
+    for listener in listeners:
+        if len(listener.rule_set.rules) > 1:
+            print(f"{listener.tag}{DIM}[i] {len(listener.rule_set.rules)} aturan sinyal aktif: {', '.join(f'{r.name} ({r.pair})' for r in listener.rule_set.rules)}{RESET}")
+
+def cancel_held_signals():
+    held = SIGNAL_COALESCER.cancel_pending()
+    if held: print(f"{YELLOW}[!] {held} sinyal yang masih ditahan untuk netting dibatalkan.{RESET}")
+
+def startup_fields():
+    """Field event 'listener_started' untuk mode daemon: waktu sejak proses mulai sampai listener jalan."""
+    return {'startup_ms': round((time.perf_counter() - STARTED_AT) * 1000, 1)} if DAEMON_MODE else {}
+
+def finish_listening(binance_session):
+    """Tutup sesi Binance, cetak ringkasan latensi & tutup log event."""
+    if binance_session:
+        binance_session.stop()
+        print(f"{DIM}[i] {binance_session.stats.summary()}{RESET}")
+        print(f"{DIM}[i] {BINANCE_RATE_LIMITER.summary()}{RESET}")
+    latency_lines = LATENCY.summary_lines()
+    if latency_lines:
+        print(f"{CYAN}{BOLD}[i] Ringkasan latensi sinyal (ms):{RESET}")
+        for line in latency_lines: print(f"{DIM}    {line}{RESET}")
+    EVENTS.emit('listener_stopped', stats=format_match_stats(), match_paths=dict(MATCH_PATH_STATS), latency_ms=LATENCY.percentiles())
+    EVENTS.close()
+
+def start_listening(settings):
+    global running, listening, stop_requests
+    running = True
+    dispatcher = None
+
+    mailbox_configs = build_mailbox_configs(settings)
+    if not mailbox_configs:
+        print(f"{RED}[X] Tidak ada mailbox yang dikonfigurasi (Email/App Password kosong).{RESET}")
+        return
+
+    # --- Setup Binance (jika aktif) ---
+    execute_binance = settings.execute_binance_orders
+    ok, binance_session = setup_binance_session(settings)
+    if not ok: running = False; return
+    if binance_session:
+        dispatcher = OrderDispatcher(settings.order_workers, settings.order_queue_size)
+
+    EVENTS.configure(settings.event_log_file, settings.quiet_console)
+    multi = len(mailbox_configs) > 1
+    listeners = [MailboxListener(name, folder, mailbox_settings, binance_session, dispatcher, show_name=multi)
+                 for name, folder, mailbox_settings in mailbox_configs]
+    print_rule_summary(listeners)
+    reloader = ConfigReloader(settings, listeners, binance_session)
+    reloader.start()
+    sighup = getattr(signal, 'SIGHUP', None) # Tidak ada di Windows
+    previous_sighup = signal.signal(sighup, lambda sig, frame: reloader.request()) if sighup else None
+
+    # --- Loop Utama ---
+    listening, stop_requests = True, 0 # Ctrl+C kini hanya menurunkan 'running' (lihat signal_handler)
+    EVENTS.emit('listener_started', mailboxes=len(listeners), execute_binance=execute_binance, **startup_fields())
+    try:
+        if multi:
+            # Satu thread per mailbox; thread utama hanya menunggu (dan menerima Ctrl+C)
+            threads = [threading.Thread(target=listener.run, name=f"mailbox-{listener.name}", daemon=True) for listener in listeners]
+            for thread in threads: thread.start()
+            while running and any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+            for thread in threads: thread.join(5)
+        else:
+            listeners[0].run()
+    finally: # Juga saat error tak terduga: tuntaskan antrean, state & log sebelum kembali
+        running = False
+        reloader.stop()
+        if sighup: signal.signal(sighup, previous_sighup)
+        cancel_held_signals()
+        if dispatcher:
+            print(f"{DIM}[i] Menunggu order yang masih antre... {DIM}(Ctrl+C lagi untuk batal){RESET}")
+            dispatcher.shutdown()
+        finish_listening(binance_session)
+        listening = False
+
+# --- Engine Listener asyncio ---
+class AsyncMailboxListener(MailboxListener):
+    """MailboxListener untuk engine asyncio.
+
+    Menunggu (IDLE, interval polling, backoff) dilakukan di loop sehingga bisa
+    dibatalkan seketika; perintah imaplib tetap blocking, jadi dijalankan di
+    satu thread khusus per mailbox (urutan perintah per koneksi terjaga).
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.show_indicator = False # Indikator digambar oleh task UI engine
+        self.state = "connecting" # connecting / checking / idle / polling / backoff
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"imap-{self.name}")
+
+    async def _call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    def _abort_socket(self):
+        """Putuskan socket agar perintah imaplib yang sedang jalan di thread langsung gagal."""
+        mail = self.mail
+        if mail is None or getattr(mail, 'sock', None) is None: return
+        try: mail.sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+
+    def _logout(self):
+        if self.mail and self.mail.state != 'LOGOUT':
+            try: self.mail.logout()
+            except Exception: pass
+        self.mail = None
+
+    async def listen_async(self):
+        """Padanan listen(): loop cek email selama koneksi SELECTED."""
+        uid_state, use_idle = await self._call(self._prepare)
+
+        while running:
+            if not use_idle:
+                remaining = self.settings.check_interval_seconds - (time.time() - self.last_check_time)
+                if remaining > 0:
+                    self.state = "polling"
+                    await asyncio.sleep(remaining)
+                    continue
+                if not await self._call(self._noop): return
+
+            current_time = time.time()
+            self.state = "checking"
+            if not await self._call(self._check_mail, uid_state, use_idle): return
+            self.last_check_time = current_time
+            if not running: return
+
+            if use_idle:
+                self.state = "idle"
+                try:
+                    await imap_idle_wait_async(self.mail, IDLE_REFRESH_SECONDS, self._call)
+                except (imaplib.IMAP4.abort, BrokenPipeError, OSError) as idle_err:
+                    await self._call(self._idle_lost, idle_err)
+                    return # Reconnect
+                except imaplib.IMAP4.error as idle_err:
+                    print(f"\n{self.tag}{YELLOW}[!] {idle_err}. Kembali ke mode polling.{RESET}")
+                    use_idle = False
+
+    async def run_async(self):
+        """Padanan run(): (re)connect, listen, backoff. Pembatalan task menutup koneksi seketika."""
+        try:
+            while running and not self.stopped:
+                try:
+                    if not self.mail or self.mail.state != 'SELECTED':
+                        self.state = "connecting"
+                        await self._call(self.connect)
+                    if self.mail and self.mail.state == 'SELECTED':
+                        await self.listen_async()
+                        if self.mail and self.mail.state == 'SELECTED':
+                           try: await self._call(self.mail.close)
+                           except Exception: pass
+                except (imaplib.IMAP4.error, imaplib.IMAP4.abort, socket.error, OSError) as e:
+                     print(f"\n{self.tag}{RED}{BOLD}[X] Error IMAP/Network di loop utama: {e}{RESET}")
+                     self.consecutive_errors += 1
+                except Exception:
+                     print(f"\n{self.tag}{RED}{BOLD}[X] Error tak terduga di loop utama:{RESET}")
+                     traceback.print_exc()
+                     self.consecutive_errors += 1
+                await self._call(self._logout) # Pastikan reconnect
+
+                if not running or self.stopped: break
+
+                if self.consecutive_errors > 0:
+                    current_wait = min(self.wait_time * (2**(self.consecutive_errors-1)), self.long_wait)
+                    print(f"{self.tag}{YELLOW}[!] Terjadi error ({self.consecutive_errors}x). Mencoba lagi dalam {current_wait} detik...{RESET}")
+                    self.state = "backoff"
+                    await asyncio.sleep(current_wait)
+                else:
+                    await asyncio.sleep(0.5)
+        except asyncio.CancelledError:
+            self._abort_socket()
+            raise
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+class AsyncListenerEngine:
+    """Engine listener asyncio: IMAP, order, beep & UI sebagai task di satu loop.
+
+    Ctrl+C ditangani loop (add_signal_handler): task mailbox dibatalkan seketika,
+    order yang sudah antre diberi waktu selesai. Ctrl+C kedua membatalkan antrean.
+    """
+    ui_interval = 0.5
+
+    def __init__(self, settings, mailbox_configs, binance_session=None):
+        self.settings = settings
+        self.mailbox_configs = mailbox_configs
+        self.binance_session = binance_session
+        self.dispatcher = None
+        self.listeners = []
+        self.stop_requests = 0
+
+    def request_stop(self):
+        global running
+        self.stop_requests += 1
+        if self.stop_requests == 1:
+            print(f"\n{YELLOW}{BOLD}[WARN] Ctrl+C terdeteksi. Menghentikan listener...{RESET}")
+            running = False
+            self.stopping.set()
+        elif self.dispatcher:
+            print(f"\n{YELLOW}[!] Ctrl+C lagi: antrean order dibatalkan.{RESET}")
+            self.dispatcher.aborted.set()
+
+    def _install_sigint(self, loop):
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.request_stop)
+        except (NotImplementedError, RuntimeError): # Windows / bukan thread utama
+            signal.signal(signal.SIGINT, lambda sig, frame: loop.call_soon_threadsafe(self.request_stop))
+
+    async def _ui(self):
+        """Spinner tunggu bersama untuk semua mailbox (hanya saat semua sedang menunggu)."""
+        idx = 0
+        chars = MailboxListener.wait_indicator_chars
+        while True:
+            await asyncio.sleep(self.ui_interval)
+            if EVENTS.quiet or any(listener.state not in ("idle", "polling") for listener in self.listeners): continue
+            idx = (idx + 1) % len(chars)
+            modes = ", ".join(f"{listener.label + ': ' if listener.label else ''}{'IDLE' if listener.state == 'idle' else 'Polling'}"
+                              for listener in self.listeners)
+            print(f"{BLUE}[{chars[idx]}] Menunggu email baru... {DIM}(asyncio | {modes}){RESET}   ", end='\r')
+
+    async def run(self):
+        global running
+        loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        self._install_sigint(loop)
+        settings = self.settings
+        self.dispatcher = AsyncOrderDispatcher(loop, settings.order_workers, settings.order_queue_size)
+        multi = len(self.mailbox_configs) > 1
+        self.listeners = [AsyncMailboxListener(name, folder, mailbox_settings, self.binance_session, self.dispatcher, show_name=multi)
+                          for name, folder, mailbox_settings in self.mailbox_configs]
+        print_rule_summary(self.listeners)
+        reloader = ConfigReloader(settings, self.listeners, self.binance_session)
+        reloader.start()
+        try: loop.add_signal_handler(signal.SIGHUP, reloader.request) # Dilepas saat loop ditutup
+        except (AttributeError, NotImplementedError, RuntimeError): pass # Tanpa SIGHUP: cek mtime saja
+
+        EVENTS.emit('listener_started', mailboxes=len(self.listeners), execute_binance=settings.execute_binance_orders, engine="asyncio", **startup_fields())
+        tasks = [loop.create_task(listener.run_async(), name=f"mailbox-{listener.name}") for listener in self.listeners]
+        ui_task = loop.create_task(self._ui(), name="ui")
+        stop_task = loop.create_task(self.stopping.wait())
+        all_done = loop.create_task(asyncio.wait(tasks))
+        await asyncio.wait([stop_task, all_done], return_when=asyncio.FIRST_COMPLETED)
+
+        running = False
+        reloader.stop()
+        for task in tasks + [ui_task, stop_task, all_done]: task.cancel()
+        await asyncio.gather(*tasks, ui_task, stop_task, all_done, return_exceptions=True)
+
+        cancel_held_signals()
+        if self.dispatcher.queues:
+            print(f"{DIM}[i] Menunggu order yang masih antre... {DIM}(Ctrl+C lagi untuk batal){RESET}")
+        await self.dispatcher.shutdown()
+
+def start_listening_async(settings):
+    """Padanan start_listening() dengan engine asyncio."""
+    global running
+    running = True
+    mailbox_configs = build_mailbox_configs(settings)
+    if not mailbox_configs:
+        print(f"{RED}[X] Tidak ada mailbox yang dikonfigurasi (Email/App Password kosong).{RESET}")
+        return
+    ok, binance_session = setup_binance_session(settings)
+    if not ok: running = False; return
+
+    EVENTS.configure(settings.event_log_file, settings.quiet_console)
+    engine = AsyncListenerEngine(settings, mailbox_configs, binance_session)
+    previous_handler = signal.getsignal(signal.SIGINT)
+    try:
+        asyncio.run(engine.run())
+    finally:
+        signal.signal(signal.SIGINT, previous_handler) # Loop ditutup -> handler loop ikut dilepas
+        finish_listening(binance_session) # Juga saat engine error: ringkasan latensi & flush log event
 
 
 # --- Fungsi Menu Pengaturan (MODIFIED for Termux) ---
@@ -580,29 +3104,39 @@ def show_settings(settings):
 
         print(f"\n{BOLD}{CYAN} E M A I L {RESET}")
         print(f"{DIM}─────────────────────────────{RESET}")
-        print(f" {CYAN}1. Alamat Email{RESET}   : {settings['email_address'] or f'{DIM}[Kosong]{RESET}'}")
-        app_pass_disp = f"{GREEN}Terisi{RESET}" if settings['app_password'] else f"{RED}Kosong{RESET}"
+        print(f" {CYAN}1. Alamat Email{RESET}   : {settings.email_address or f'{DIM}[Kosong]{RESET}'}")
+        app_pass_disp = f"{GREEN}Terisi{RESET}" if settings.app_password else f"{RED}Kosong{RESET}"
         print(f" {CYAN}2. App Password{RESET}   : {app_pass_disp} {DIM}(Input tersembunyi saat edit){RESET}")
-        print(f" {CYAN}3. Server IMAP{RESET}    : {settings['imap_server']}")
-        print(f" {CYAN}4. Interval Cek{RESET}   : {settings['check_interval_seconds']} detik")
-        print(f" {CYAN}5. Keyword Target{RESET} : '{settings['target_keyword']}'")
-        print(f" {CYAN}6. Keyword Trigger{RESET}: '{settings['trigger_keyword']}'")
+        print(f" {CYAN}3. Server IMAP{RESET}    : {imap_address(settings)}{'' if settings.imap_use_ssl else f' {YELLOW}(tanpa SSL){RESET}'}")
+        print(f" {CYAN}4. Interval Cek{RESET}   : {settings.check_interval_seconds} detik")
+        print(f" {CYAN}5. Keyword Target{RESET} : '{settings.target_keyword}'")
+        print(f" {CYAN}6. Keyword Trigger{RESET}: '{settings.trigger_keyword}'")
+        print(f" {DIM}   Aturan tambahan : {len(settings.active_signal_rules)} (edit 'signal_rules' di {CONFIG_FILE}){RESET}")
+        dedupe_desc = f"{settings.signal_dedupe_seconds:g} detik" if settings.signal_dedupe_seconds else "nonaktif"
+        net_desc = f"{settings.signal_net_seconds:g} detik" if settings.signal_net_seconds else "nonaktif"
+        print(f" {DIM}   Dedupe / Netting: {dedupe_desc} / {net_desc} (edit di {CONFIG_FILE}){RESET}")
+        search_filter, _ = build_search_filter(settings, ('X-GM-EXT-1',)) # Tampilkan semua, termasuk X-GM-RAW
+        print(f" {DIM}   Filter SEARCH   : {search_filter or 'nonaktif (semua UNSEEN)'} (edit 'imap_search_*' di {CONFIG_FILE}){RESET}")
+        idle_status = f"{GREEN}Aktif{RESET}" if settings.use_imap_idle else f"{YELLOW}Nonaktif{RESET}"
+        print(f" {CYAN}7. Mode Push IDLE{RESET} : {idle_status} {DIM}(Fallback ke polling jika server tidak mendukung){RESET}")
 
         print(f"\n{BOLD}{CYAN} B I N A N C E {RESET}")
         print(f"{DIM}─────────────────────────────{RESET}")
         if BINANCE_AVAILABLE:
             print(f" {DIM}Library Status{RESET}   : {GREEN}Terinstall{RESET}")
-            api_key_disp = f"{GREEN}Terisi{RESET}" if settings['binance_api_key'] else f"{RED}Kosong{RESET}"
-            api_sec_disp = f"{GREEN}Terisi{RESET}" if settings['binance_api_secret'] else f"{RED}Kosong{RESET}"
-            print(f" {CYAN}7. API Key{RESET}        : {api_key_disp} {DIM}(Hidden Input){RESET}")
-            print(f" {CYAN}8. API Secret{RESET}     : {api_sec_disp} {DIM}(Hidden Input){RESET}")
-            print(f" {CYAN}9. Trading Pair{RESET}   : {settings['trading_pair'] or f'{DIM}[Kosong]{RESET}'}")
-            buy_qty_valid = settings.get('buy_quote_quantity', 0) > 0
-            sell_qty_valid = settings.get('sell_base_quantity', 0) >= 0
-            print(f" {CYAN}10. Buy Quote Qty{RESET} : {settings['buy_quote_quantity']} {GREEN if buy_qty_valid else RED}[{'+' if buy_qty_valid else '!'}] {DIM}(USDT){RESET}")
-            print(f" {CYAN}11. Sell Base Qty{RESET} : {settings['sell_base_quantity']} {GREEN if sell_qty_valid else RED}[{'+' if sell_qty_valid else '!'}] {DIM}(BTC/Base){RESET}")
-            exec_status = f"{GREEN}{BOLD}Aktif{RESET}" if settings['execute_binance_orders'] else f"{YELLOW}Nonaktif{RESET}"
-            print(f" {CYAN}12. Eksekusi Order{RESET}  : {exec_status}")
+            api_key_disp = f"{GREEN}Terisi{RESET}" if settings.binance_api_key else f"{RED}Kosong{RESET}"
+            api_sec_disp = f"{GREEN}Terisi{RESET}" if settings.binance_api_secret else f"{RED}Kosong{RESET}"
+            print(f" {CYAN}8. API Key{RESET}        : {api_key_disp} {DIM}(Hidden Input){RESET}")
+            print(f" {CYAN}9. API Secret{RESET}     : {api_sec_disp} {DIM}(Hidden Input){RESET}")
+            print(f" {CYAN}10. Trading Pair{RESET}  : {settings.trading_pair or f'{DIM}[Kosong]{RESET}'}")
+            buy_qty_valid = settings.buy_quote_quantity > 0
+            sell_qty_valid = settings.sell_base_quantity >= 0
+            print(f" {CYAN}11. Buy Quote Qty{RESET} : {settings.buy_quote_quantity} {GREEN if buy_qty_valid else RED}[{'+' if buy_qty_valid else '!'}] {DIM}(USDT){RESET}")
+            print(f" {CYAN}12. Sell Base Qty{RESET} : {settings.sell_base_quantity} {GREEN if sell_qty_valid else RED}[{'+' if sell_qty_valid else '!'}] {DIM}(BTC/Base){RESET}")
+            exec_status = f"{GREEN}{BOLD}Aktif{RESET}" if settings.execute_binance_orders else f"{YELLOW}Nonaktif{RESET}"
+            print(f" {CYAN}13. Eksekusi Order{RESET}  : {exec_status}")
+            if settings.binance_api_url:
+                print(f" {DIM}Endpoint API{RESET}     : {YELLOW}{settings.binance_api_url}{RESET} {DIM}(bukan Binance asli, lihat config.json){RESET}")
         else:
              print(f" {DIM}Library Status{RESET}   : {RED}Tidak Terinstall{RESET}")
              print(f" {DIM}(Install: pip install python-binance requests){RESET}")
@@ -636,66 +3170,75 @@ def show_settings(settings):
         if choice == 'edit':
             print(f"\n{BOLD}{MAGENTA}--- Edit Pengaturan ---{RESET}")
             print(f"{DIM}(Kosongkan input untuk skip){RESET}")
+            values = settings.to_dict() # Settings immutable: edit salinan dict, divalidasi saat disimpan
 
             # Edit Email (tetap pakai input, getpass untuk password)
             print(f"\n{CYAN}--- Email ---{RESET}")
-            if val := input(f" 1. Email [{settings['email_address']}]: ").strip(): settings['email_address'] = val
+            if val := input(f" 1. Email [{values['email_address']}]: ").strip(): values['email_address'] = val
             print(f" 2. App Password (input tersembunyi): ", end='', flush=True)
             try: pwd = getpass.getpass("")
             except Exception: pwd = input(" App Password [***]: ").strip()
-            if pwd: settings['app_password'] = pwd; print(f"{GREEN}OK{RESET}")
+            if pwd: values['app_password'] = pwd; print(f"{GREEN}OK{RESET}")
             else: print(f"{DIM}Skip{RESET}")
-            if val := input(f" 3. IMAP Server [{settings['imap_server']}]: ").strip(): settings['imap_server'] = val
+            if val := input(f" 3. IMAP Server [{values['imap_server']}]: ").strip(): values['imap_server'] = val
             while True:
-                val_str = input(f" 4. Interval (detik) [{settings['check_interval_seconds']}], min 5: ").strip()
+                val_str = input(f" 4. Interval (detik) [{values['check_interval_seconds']}], min 5: ").strip()
                 if not val_str: break
                 try:
                     iv = int(val_str)
-                    if iv >= 5: settings['check_interval_seconds'] = iv; break
+                    if iv >= 5: values['check_interval_seconds'] = iv; break
                     else: print(f"{RED}[!] Min 5 detik.{RESET}")
                 except ValueError: print(f"{RED}[!] Angka bulat.{RESET}")
-            if val := input(f" 5. Keyword Target [{settings['target_keyword']}]: ").strip(): settings['target_keyword'] = val
-            if val := input(f" 6. Keyword Trigger [{settings['trigger_keyword']}]: ").strip(): settings['trigger_keyword'] = val
+            if val := input(f" 5. Keyword Target [{values['target_keyword']}]: ").strip(): values['target_keyword'] = val
+            if val := input(f" 6. Keyword Trigger [{values['trigger_keyword']}]: ").strip(): values['trigger_keyword'] = val
+            while True: # IDLE Toggle
+                 curr = values['use_imap_idle']
+                 prompt = f"{GREEN}Aktif{RESET}" if curr else f"{YELLOW}Nonaktif{RESET}"
+                 val_str = input(f" 7. Mode Push IDLE? ({prompt}) [y/n]: ").lower().strip()
+                 if not val_str: break
+                 if val_str == 'y': values['use_imap_idle'] = True; break
+                 elif val_str == 'n': values['use_imap_idle'] = False; break
+                 else: print(f"{RED}[!] y/n saja.{RESET}")
 
             # Edit Binance (tetap pakai input, getpass untuk secret)
             print(f"\n{CYAN}--- Binance ---{RESET}")
             if not BINANCE_AVAILABLE: print(f"{YELLOW}(Library tidak ada){RESET}")
-            if val := input(f" 7. API Key [***]: ").strip(): settings['binance_api_key'] = val
-            print(f" 8. API Secret (input tersembunyi): ", end='', flush=True)
+            if val := input(f" 8. API Key [***]: ").strip(): values['binance_api_key'] = val
+            print(f" 9. API Secret (input tersembunyi): ", end='', flush=True)
             try: sec = getpass.getpass("")
             except Exception: sec = input(" API Secret [***]: ").strip()
-            if sec: settings['binance_api_secret'] = sec; print(f"{GREEN}OK{RESET}")
+            if sec: values['binance_api_secret'] = sec; print(f"{GREEN}OK{RESET}")
             else: print(f"{DIM}Skip{RESET}")
-            if val := input(f" 9. Trading Pair [{settings['trading_pair']}]: ").strip().upper(): settings['trading_pair'] = val
+            if val := input(f"10. Trading Pair [{values['trading_pair']}]: ").strip().upper(): values['trading_pair'] = val
             while True: # Buy Qty
-                 val_str = input(f"10. Buy Quote Qty [{settings['buy_quote_quantity']}], > 0: ").strip()
+                 val_str = input(f"11. Buy Quote Qty [{values['buy_quote_quantity']}], > 0: ").strip()
                  if not val_str: break
                  try:
                      qty = float(val_str)
-                     if qty > 0: settings['buy_quote_quantity'] = qty; break
+                     if qty > 0: values['buy_quote_quantity'] = qty; break
                      else: print(f"{RED}[!] Harus > 0.{RESET}")
                  except ValueError: print(f"{RED}[!] Angka desimal.{RESET}")
             while True: # Sell Qty
-                 val_str = input(f"11. Sell Base Qty [{settings['sell_base_quantity']}], >= 0: ").strip()
+                 val_str = input(f"12. Sell Base Qty [{values['sell_base_quantity']}], >= 0: ").strip()
                  if not val_str: break
                  try:
                      qty = float(val_str)
-                     if qty >= 0: settings['sell_base_quantity'] = qty; break
+                     if qty >= 0: values['sell_base_quantity'] = qty; break
                      else: print(f"{RED}[!] Harus >= 0.{RESET}")
                  except ValueError: print(f"{RED}[!] Angka desimal.{RESET}")
             while True: # Execute Toggle
-                 curr = settings['execute_binance_orders']
+                 curr = values['execute_binance_orders']
                  prompt = f"{GREEN}Aktif{RESET}" if curr else f"{YELLOW}Nonaktif{RESET}"
-                 val_str = input(f"12. Eksekusi Order? ({prompt}) [y/n]: ").lower().strip()
+                 val_str = input(f"13. Eksekusi Order? ({prompt}) [y/n]: ").lower().strip()
                  if not val_str: break
                  if val_str == 'y':
-                     if BINANCE_AVAILABLE: settings['execute_binance_orders'] = True; break
+                     if BINANCE_AVAILABLE: values['execute_binance_orders'] = True; break
                      else: print(f"{RED}[!] Library Binance tidak ada!{RESET}"); break
-                 elif val_str == 'n': settings['execute_binance_orders'] = False; break
+                 elif val_str == 'n': values['execute_binance_orders'] = False; break
                  else: print(f"{RED}[!] y/n saja.{RESET}")
 
             # Simpan otomatis setelah edit selesai
-            save_settings(settings)
+            settings = save_settings(values)
             print(f"\n{GREEN}{BOLD}[OK] Pengaturan disimpan!{RESET}")
             input(f"{DIM}Tekan Enter untuk kembali...{RESET}")
             # Loop akan kembali ke awal show_settings untuk menampilkan nilai baru
@@ -706,9 +3249,26 @@ def show_settings(settings):
             time.sleep(1.5)
             break # Keluar dari loop pengaturan
 
+def start_errors(settings):
+    """Daftar alasan listener belum bisa dimulai (kosong = siap). Memuat python-binance hanya jika eksekusi aktif."""
+    errors = []
+    if (not settings.email_address or not settings.app_password) and not settings.active_mailboxes:
+        errors.append("Email/App Password belum lengkap.")
+    if settings.execute_binance_orders:
+        if not load_binance(): errors.append("Library Binance tidak ada (Nonaktifkan eksekusi atau install).")
+        else:
+            if not settings.binance_api_key: errors.append("Binance API Key kosong.")
+            if not settings.binance_api_secret: errors.append("Binance API Secret kosong.")
+            if not settings.trading_pair: errors.append("Binance Trading Pair kosong.")
+            if settings.buy_quote_quantity <= 0: errors.append("Binance Buy Qty harus > 0.")
+            # Tidak perlu error jika sell qty 0, itu valid
+            # if settings.sell_base_quantity <= 0: errors.append("Binance Sell Qty harus > 0.")
+    return errors
+
 # --- Fungsi Menu Utama (MODIFIED for Termux) ---
 def main_menu():
     settings = load_settings() # Muat sekali di awal
+    load_inquirer(); load_binance() # Menu butuh keduanya (status library ditampilkan)
 
     while True:
         clear_screen()
@@ -719,27 +3279,29 @@ def main_menu():
         print(f"{DIM}─────────────────────────────{RESET}")
 
         # Email Status
-        email_ok = bool(settings.get('email_address'))
-        pass_ok = bool(settings.get('app_password'))
+        email_ok = bool(settings.email_address)
+        pass_ok = bool(settings.app_password)
         print(f" {CYAN}Email:{RESET}")
         print(f"   ├─ Config: [{GREEN if email_ok else RED}{'✓' if email_ok else 'X'}{RESET}] Email | [{GREEN if pass_ok else RED}{'✓' if pass_ok else 'X'}{RESET}] App Pass")
-        print(f"   └─ Server: {settings.get('imap_server', '?')}")
+        print(f"   ├─ Server: {imap_address(settings)} | Mode: {'IDLE (push)' if settings.use_imap_idle else 'Polling'}")
+        print(f"   └─ Mailbox tambahan: {len(settings.active_mailboxes)} {DIM}('mailboxes' di {CONFIG_FILE}){RESET}")
 
         # Binance Status
         print(f" {CYAN}Binance:{RESET}")
         if BINANCE_AVAILABLE:
             lib_status = f"{GREEN}✓ Terinstall{RESET}"
-            api_ok = bool(settings.get('binance_api_key'))
-            sec_ok = bool(settings.get('binance_api_secret'))
-            pair_ok = bool(settings.get('trading_pair'))
-            buy_qty_ok = settings.get('buy_quote_quantity', 0) > 0
-            sell_qty_ok = settings.get('sell_base_quantity', 0) >= 0 # Boleh 0
-            exec_active = settings.get("execute_binance_orders", False)
+            api_ok = bool(settings.binance_api_key)
+            sec_ok = bool(settings.binance_api_secret)
+            pair_ok = bool(settings.trading_pair)
+            buy_qty_ok = settings.buy_quote_quantity > 0
+            sell_qty_ok = settings.sell_base_quantity >= 0 # Boleh 0
+            exec_active = settings.execute_binance_orders
             exec_status = f"{GREEN}{BOLD}AKTIF{RESET}" if exec_active else f"{YELLOW}NONAKTIF{RESET}"
 
             print(f"   ├─ Library : {lib_status}")
-            print(f"   ├─ Akun    : API [{GREEN if api_ok else RED}{'✓' if api_ok else 'X'}{RESET}] | Secret [{GREEN if sec_ok else RED}{'✓' if sec_ok else 'X'}{RESET}] | Pair [{GREEN if pair_ok else RED}{settings.get('trading_pair', 'X')}{RESET}]")
+            print(f"   ├─ Akun    : API [{GREEN if api_ok else RED}{'✓' if api_ok else 'X'}{RESET}] | Secret [{GREEN if sec_ok else RED}{'✓' if sec_ok else 'X'}{RESET}] | Pair [{GREEN if pair_ok else RED}{settings.trading_pair}{RESET}]")
             print(f"   ├─ Qty     : Buy [{GREEN if buy_qty_ok else RED}{'✓' if buy_qty_ok else '!'}{RESET}] | Sell [{GREEN if sell_qty_ok else RED}{'✓' if sell_qty_ok else '!'}{RESET}]")
+            print(f"   ├─ Waktu   : {BINANCE_TIME_SYNC.status_text()}")
             print(f"   └─ Eksekusi: {exec_status}")
         else:
             lib_status = f"{RED}X Tidak Terinstall{RESET}"
@@ -755,11 +3317,12 @@ def main_menu():
             # Opsi Mulai
             start_label = f"▶️  Mulai Listener"
             start_mode = ""
-            if BINANCE_AVAILABLE and settings.get("execute_binance_orders"):
+            if BINANCE_AVAILABLE and settings.execute_binance_orders:
                 start_mode = f" {DIM}(Email & {BOLD}Binance{DIM}){RESET}"
             else:
                 start_mode = f" {DIM}(Email Only){RESET}"
             choices.append((start_label + start_mode, 'start'))
+            choices.append((f"⚡ Mulai Listener {DIM}(engine asyncio){RESET}", 'start_async'))
             # Opsi Pengaturan
             choices.append(('⚙️  Pengaturan', 'settings'))
             # Opsi Keluar
@@ -772,32 +3335,23 @@ def main_menu():
             except Exception as e: print(f"{RED}Menu error: {e}{RESET}"); choice_key = 'exit'
             except KeyboardInterrupt: print(f"\n{YELLOW}Keluar...{RESET}"); choice_key = 'exit'; time.sleep(1)
         else: # Fallback
+            print(f"\n{DIM}(Library 'inquirer' tidak ada, menu pakai input teks. Install: pip install inquirer){RESET}")
             print(f"\n{menu_prompt}")
             print(f" 1. Mulai Listener")
             print(f" 2. Pengaturan")
             print(f" 3. Keluar")
+            print(f" 4. Mulai Listener {DIM}(engine asyncio){RESET}")
             print_separator(color=MAGENTA)
-            choice_input = input("Pilihan (1/2/3): ").strip()
-            choice_map = {'1': 'start', '2': 'settings', '3': 'exit'}
+            choice_input = input("Pilihan (1/2/3/4): ").strip()
+            choice_map = {'1': 'start', '2': 'settings', '3': 'exit', '4': 'start_async'}
             choice_key = choice_map.get(choice_input, 'invalid')
 
         # --- Proses Pilihan ---
-        if choice_key == 'start':
+        if choice_key in ('start', 'start_async'):
             print_separator()
             # Validasi sebelum memulai (sedikit lebih ringkas)
-            errors = []
-            if not settings.get('email_address') or not settings.get('app_password'):
-                errors.append("Email/App Password belum lengkap.")
-            execute_binance = settings.get("execute_binance_orders", False)
-            if execute_binance:
-                if not BINANCE_AVAILABLE: errors.append("Library Binance tidak ada (Nonaktifkan eksekusi atau install).")
-                else:
-                    if not settings.get('binance_api_key'): errors.append("Binance API Key kosong.")
-                    if not settings.get('binance_api_secret'): errors.append("Binance API Secret kosong.")
-                    if not settings.get('trading_pair'): errors.append("Binance Trading Pair kosong.")
-                    if settings.get('buy_quote_quantity', 0) <= 0: errors.append("Binance Buy Qty harus > 0.")
-                    # Tidak perlu error jika sell qty 0, itu valid
-                    # if settings.get('sell_base_quantity', 0) <= 0: errors.append("Binance Sell Qty harus > 0.")
+            errors = start_errors(settings)
+            execute_binance = settings.execute_binance_orders
 
             if errors:
                 print(f"\n{BOLD}{RED}--- TIDAK BISA MEMULAI ---{RESET}")
@@ -807,8 +3361,11 @@ def main_menu():
             else:
                 clear_screen()
                 mode = "Email & Binance Order" if execute_binance and BINANCE_AVAILABLE else "Email Listener Only"
+                if choice_key == 'start_async': mode += " (asyncio)"
                 print_header(f"Memulai Mode: {mode}")
-                start_listening(settings)
+                if choice_key == 'start_async': start_listening_async(settings)
+                else: start_listening(settings)
+                settings = load_settings() # config.json mungkin diubah (hot reload) selama listener jalan
                 # Setelah listener berhenti (Ctrl+C atau error fatal), kembali ke menu
                 print(f"\n{YELLOW}[INFO] Kembali ke Menu Utama...{RESET}")
                 time.sleep(2)
@@ -825,10 +3382,45 @@ def main_menu():
             print(f"{RED}[!] Pilihan tidak valid.{RESET}")
             time.sleep(1)
 
+# --- Mode Daemon (tanpa menu) ---
+def run_daemon(engine="thread"):
+    """Jalankan listener langsung dari config.json, untuk supervisor (systemd, runit, Termux:Boot).
+
+    Tanpa menu, clear screen, maupun jeda tampilan; inquirer tidak di-import dan
+    python-binance hanya jika eksekusi order aktif. Return kode keluar proses.
+    """
+    global DAEMON_MODE
+    DAEMON_MODE = True
+    if hasattr(signal, 'SIGTERM'): # Stop dari supervisor (SIGTERM) diperlakukan sama dengan Ctrl+C
+        signal.signal(signal.SIGTERM, lambda sig, frame: signal.raise_signal(signal.SIGINT))
+    settings = load_settings()
+    errors = start_errors(settings)
+    if errors:
+        for err in errors: print(f"{RED}[X] {err}{RESET}")
+        print(f"{YELLOW}[!] Perbaiki '{CONFIG_FILE}' (atau lewat menu Pengaturan) lalu jalankan ulang.{RESET}")
+        return 2
+    mode = "Email & Binance Order" if settings.execute_binance_orders else "Email Listener Only"
+    print(f"{CYAN}[i] Mode daemon: {mode}, engine {engine}, config '{CONFIG_FILE}'.{RESET}")
+    if engine == "asyncio": start_listening_async(settings)
+    else: start_listening(settings)
+    return 0
+
+def parse_args(argv=None):
+    import argparse # Hanya dipakai di entry point
+    parser = argparse.ArgumentParser(description="Exora AI - Email & Binance Listener. Tanpa argumen: menu interaktif.")
+    parser.add_argument('command', nargs='?', choices=['menu', 'run'], default='menu',
+                        help="'run' = langsung mendengarkan tanpa menu (mode daemon)")
+    parser.add_argument('--daemon', action='store_true', help="sama dengan perintah 'run'")
+    parser.add_argument('--engine', choices=['thread', 'asyncio'], default='thread', help="engine listener untuk mode daemon")
+    parser.add_argument('--config', default=CONFIG_FILE, help=f"file konfigurasi (default: {CONFIG_FILE})")
+    return parser.parse_args(argv)
+
 # --- Entry Point ---
 if __name__ == "__main__":
-    if sys.version_info < (3, 6):
-        print("Error: Butuh Python 3.6+"); sys.exit(1)
+    args = parse_args()
+    CONFIG_FILE = args.config
+    if args.daemon or args.command == 'run':
+        sys.exit(run_daemon(args.engine))
     try:
         main_menu()
     except KeyboardInterrupt: